@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 import os
 from contextlib import contextmanager
-from pathlib import Path
 from typing import Generator
 
 from dotenv import load_dotenv
@@ -17,8 +16,10 @@ DATABASE_URL = os.getenv(
 
 print(f"[DB] DATABASE_URL={DATABASE_URL}")
 
-# For SQL Server via pyodbc (sync engine)
-engine = create_engine(DATABASE_URL, echo=False, future=True)
+# For SQL Server via pyodbc (sync engine); fast_executemany sends bulk parameter
+# sets (ERP staging inserts) in one round trip instead of one per row
+_engine_kwargs = {"fast_executemany": True} if DATABASE_URL.startswith("mssql+pyodbc") else {}
+engine = create_engine(DATABASE_URL, echo=False, future=True, **_engine_kwargs)
 
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False, future=True)
 Base = declarative_base()
@@ -46,8 +47,33 @@ def get_session():
     finally:
         session.close()
 
+def _add_missing_columns():
+    """
+    create_all() never alters existing tables. Add new *nullable* model columns
+    and any missing model indexes to tables that already exist, so upgrades need
+    no manual DDL.
+    """
+    from sqlalchemy import inspect, text
+    insp = inspect(engine)
+    existing_tables = set(insp.get_table_names())
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            have = {c["name"] for c in insp.get_columns(table.name)}
+            for col in table.columns:
+                if col.name in have or not col.nullable:
+                    continue
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD {col.name} {col_type}"))
+                print(f"[DB] added column {table.name}.{col.name} {col_type}")
+            # new indexes on existing tables (create_all skips them too)
+            for idx in table.indexes:
+                idx.create(bind=conn, checkfirst=True)
+
 def init_db():
     """Create all tables if they do not exist."""
     from app import models  # import models to register metadata
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
     print("[DB] create_all() completed (SQL Server)")
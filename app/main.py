@@ -72,9 +72,21 @@ def startup():
         ensure("mashinibg",    "OnlineMashini", "https://www.onlinemashini.bg")
         ensure("praktis",      "Praktis",       "https://praktis.bg")
 
+        # GTIN-14 for products imported before the column existed (or under older rules)
+        from app.services.gtin import backfill_gtin14
+        filled = backfill_gtin14(session)
+        if filled:
+            print(f"[DB] gtin14 backfilled for {filled} products")
+
     # 4) START EMAIL SCHEDULER LOOP (new)
     asyncio.get_event_loop().create_task(r_email.email_scheduler_loop())
 
+@app.on_event("shutdown")
+def shutdown():
+    # Stop scraper parse workers (process pool)
+    from app.scrapers.parsing import pool as parse_pool
+    parse_pool.shutdown()
+
 @app.get("/", response_class=HTMLResponse)
 def root():
     return """<html><head><meta http-equiv="refresh" content="0; url=/app/index.html" /></head>
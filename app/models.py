@@ -37,6 +37,8 @@ class Product(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     sku: Mapped[str] = mapped_column(String(64), index=True, unique=True)
     barcode: Mapped[str | None] = mapped_column(String(64), index=True, nullable=True)
+    # NEW: barcode normalised to GTIN-14 (app.services.gtin.to_gtin14); one value per article
+    gtin14: Mapped[str | None] = mapped_column(String(14), index=True, nullable=True)
     item_number: Mapped[str | None] = mapped_column(String(64), index=True, nullable=True)
     brand: Mapped[str | None] = mapped_column(String(128), index=True, nullable=True)
     name: Mapped[str] = mapped_column(Text)   # UTF-8: Cyrillic-safe
@@ -44,6 +46,10 @@ class Product(Base):
     price_promo: Mapped[float | None] = mapped_column(Float, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    # NEW: hash of the last ERP row applied (app.services.erp_upsert); unchanged rows are skipped
+    erp_hash: Mapped[str | None] = mapped_column(String(40), nullable=True)
+    # NEW: last time Zeron was asked for this SKU (incremental refresh order + checkpoint)
+    erp_refreshed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True, index=True)
 
     # --- NEW: FK to Group (exact column name requested: groupid)
     groupid: Mapped[int | None] = mapped_column(
@@ -70,6 +76,8 @@ class Match(Base):
     site_id: Mapped[int] = mapped_column(Integer, ForeignKey("competitor_sites.id"))
     competitor_sku: Mapped[str | None] = mapped_column(String(128), nullable=True, index=True)
     competitor_barcode: Mapped[str | None] = mapped_column(String(128), nullable=True, index=True)
+    # NEW: canonical competitor PDP URL (learned from search/scrape); lets scrapers skip the search page
+    pdp_url: Mapped[str | None] = mapped_column(Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
     updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
 
@@ -97,6 +105,68 @@ class PriceSnapshot(Base):
     # NEW: Praktiker (and future) item label text
     competitor_label: Mapped[str | None] = mapped_column(String(128), nullable=True)
 
+    __table_args__ = (
+        # latest snapshot per key = one index seek (page lookups, write-on-change checks)
+        Index("ix_snap_site_sku_ts", "site_id", "competitor_sku", "ts"),
+        Index("ix_snap_site_bar_ts", "site_id", "competitor_barcode", "ts"),
+    )
+
+
+# Our own (Praktis) price history: append-only, one row per ERP price change
+class ProductPriceHistory(Base):
+    __tablename__ = "product_price_history"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id", ondelete="CASCADE"))
+    ts: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    price_regular: Mapped[float | None] = mapped_column(Float, nullable=True)
+    price_promo: Mapped[float | None] = mapped_column(Float, nullable=True)
+    # values before this change (None for the first row of a product)
+    prev_price_regular: Mapped[float | None] = mapped_column(Float, nullable=True)
+    prev_price_promo: Mapped[float | None] = mapped_column(Float, nullable=True)
+
+    __table_args__ = (
+        Index("ix_pph_product_ts", "product_id", "ts"),
+    )
+
+
+# Competitor catalogue harvested from category listings (one row per competitor product URL)
+class CompetitorCatalogItem(Base):
+    __tablename__ = "competitor_catalog"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    site_id: Mapped[int] = mapped_column(Integer, ForeignKey("competitor_sites.id"))
+    competitor_sku: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    url: Mapped[str] = mapped_column(String(450))  # 450 chars keeps the unique index under SQL Server's key limit
+    name: Mapped[str | None] = mapped_column(Text, nullable=True)
+    regular_price: Mapped[float | None] = mapped_column(Float, nullable=True)
+    promo_price: Mapped[float | None] = mapped_column(Float, nullable=True)
+    label: Mapped[str | None] = mapped_column(String(128), nullable=True)
+    category_url: Mapped[str | None] = mapped_column(Text, nullable=True)
+    seen_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = (
+        UniqueConstraint("site_id", "url", name="uq_catalog_site_url"),
+        Index("ix_catalog_site_sku", "site_id", "competitor_sku"),
+    )
+
+
+# Auto-match outcomes per (product, site, search method): drives retry backoff for "not found"
+class MatchAttempt(Base):
+    __tablename__ = "match_attempts"
+    id: Mapped[int] = mapped_column(Integer, primary_key=True)
+    product_id: Mapped[int] = mapped_column(Integer, ForeignKey("products.id", ondelete="CASCADE"))
+    site_id: Mapped[int] = mapped_column(Integer, ForeignKey("competitor_sites.id"))
+    method: Mapped[str] = mapped_column(String(32))              # barcode | item_number
+    query: Mapped[str | None] = mapped_column(String(256), nullable=True)  # searched value; a change resets backoff
+    outcome: Mapped[str] = mapped_column(String(16))             # found | not_found
+    failures: Mapped[int] = mapped_column(Integer, default=0)    # consecutive not_found for this query
+    attempted_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow)
+    next_attempt_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("product_id", "site_id", "method", name="uq_match_attempt"),
+        Index("ix_match_attempts_site_next", "site_id", "next_attempt_at"),
+    )
+
 
 class Tag(Base):
     __tablename__ = "tags"
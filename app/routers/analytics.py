@@ -11,7 +11,7 @@ from sqlalchemy import select
 from app.db import get_session
 from app.models import Product, CompetitorSite, Match, PriceSnapshot
 from app.schemas import AnalyticsHistoryOut, AnalyticsSeriesOut, AnalyticsPointOut
-from app.services.comparison import get_history_for_product
+from app.services.comparison import get_history_for_product, get_own_price_history
 
 router = APIRouter()
 
@@ -26,7 +26,8 @@ _COLORS = {
 @router.get("/analytics/history", response_model=AnalyticsHistoryOut)
 def api_analytics_history(product_sku: str = Query(..., min_length=1)):
     """
-    Returns time-ordered (asc) series by site for the last 6 months.
+    Returns time-ordered (asc) series by site for the last 6 months, plus our
+    own "praktis" series from product_price_history (ERP price changes).
     Each point includes:
       - regular_price, promo_price, effective_price (promo or regular)
       - label (snapshot.competitor_label)
@@ -39,6 +40,23 @@ def api_analytics_history(product_sku: str = Query(..., min_length=1)):
         series: List[AnalyticsSeriesOut] = []
         sites = {s.code: s for s in session.execute(select(CompetitorSite)).scalars().all()}
 
+        own = get_own_price_history(session, prod.id)
+        if own:
+            series.append(AnalyticsSeriesOut(
+                site_code="praktis",
+                site_name="Praktis",
+                color=_COLORS["praktis"],
+                points=[
+                    AnalyticsPointOut(
+                        ts=h.ts,
+                        regular_price=h.price_regular,
+                        promo_price=h.price_promo,
+                        effective_price=h.price_promo if h.price_promo is not None else h.price_regular,
+                    )
+                    for h in own
+                ],
+            ))
+
         for code, snaps in hist.items():
             site = sites.get(code)
             if not site:
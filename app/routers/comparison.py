@@ -70,6 +70,24 @@ async def scrape_all_nightly(
     """
     return await svc.scrape_all(session=db)
 
+# ----------------------- NEW: category-listing crawl -----------------------
+@router.post("/compare/crawl/listings")
+async def crawl_listings(
+    site_code: str = Query(..., description="Single site code to crawl"),
+    category_url: list[str] | None = Query(None, description="Category URLs; default: the site's configured list"),
+    max_pages: int = Query(50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    """
+    Walk the site's category listings, store every card in the competitor catalogue
+    and refresh snapshots of all matches resolved by SKU or URL.
+    """
+    from app.registry import registry, register_default_scrapers
+    from app.services.catalog import crawl_listings as _crawl
+
+    register_default_scrapers()
+    return await _crawl(db, registry.get(site_code), category_urls=category_url, max_pages=max_pages)
+
 # ----------------------- Price history for charts (preserved) -----------------------
 @router.get("/compare/history")
 def price_history(
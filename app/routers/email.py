@@ -21,7 +21,8 @@ from openpyxl.utils import get_column_letter
 from app.db import get_session
 from app.models import (
     EmailRule, EmailWeeklySchedule, PriceSubset,
-    Product, Group, CompetitorSite, PriceSnapshot  # ← added CompetitorSite, PriceSnapshot
+    Product, Group, CompetitorSite, PriceSnapshot,  # ← added CompetitorSite, PriceSnapshot
+    ProductPriceHistory,
 )
 from app.schemas import EmailRuleIn, EmailRuleOut, WeeklySchedule
 
@@ -359,16 +360,19 @@ def _apply_category_via_products(session, rows: List[Dict[str, Any]], category_i
     keep = {sku for sku, gid in sku2gid.items() if gid in gids}
     return [r for r in rows if r.get("product_sku") in keep]
 
-def _apply_changed_24h(session, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+def _apply_changed_24h(session, rows: List[Dict[str, Any]], hours: int = 24) -> List[Dict[str, Any]]:
+    """Keep rows whose product (our) price changed in the last `hours` (product_price_history)."""
     if not rows:
         return rows
-    cutoff = datetime.utcnow() - timedelta(hours=24)
-    skus = list({r.get("product_sku") for r in rows if r.get("product_sku")})
-    if not skus:
-        return []
-    q = select(Product.sku, Product.updated_at).where(Product.sku.in_(skus))
-    found = dict(session.execute(q).all())
-    recent = {sku for sku, upd in found.items() if upd and upd >= cutoff}
+    cutoff = datetime.utcnow() - timedelta(hours=hours)
+    # range seek on product_price_history.ts; the set is small compared to the rows
+    q = (
+        select(Product.sku)
+        .join(ProductPriceHistory, ProductPriceHistory.product_id == Product.id)
+        .where(ProductPriceHistory.ts >= cutoff)
+        .distinct()
+    )
+    recent = {sku for (sku,) in session.execute(q).all()}
     return [r for r in rows if r.get("product_sku") in recent]
 # -----------------------------------------------------------------------------
 
@@ -518,7 +522,7 @@ def _build_and_send(rule: EmailRule) -> Dict[str, Any]:
         # --- price direction any|better|worse
         rows = _apply_price_direction(rows, getattr(rule, "price_direction", "any"))
 
-        # --- changed in last 24h (our product updated_at)
+        # --- our price changed in last 24h (product_price_history)
         if getattr(rule, "changed_24h", False):
             with get_session() as _ses_ch:
                 rows = _apply_changed_24h(_ses_ch, rows)
@@ -2,20 +2,31 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
 
-import io
 import os
 import logging
-from datetime import datetime
-from typing import Dict, List, Optional
+from datetime import datetime, timedelta
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+import asyncio
 
-import requests
-import xmltodict
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from sqlalchemy import select
-from openpyxl import load_workbook
+from sqlalchemy import select, func, or_, and_, case
 
 from app.db import get_session
-from app.models import Product, Group
+from app.models import Product
+from app.services.zeron_cache import cache as zeron_cache
+from app.services.sku_file import EXCEL_EXTENSIONS, CSV_EXTENSIONS
+from app.services.erp_importer import (
+    ErpImporter,
+    ImportResult,
+    ZeronApiSource,
+    ExcelSkuSource,
+    XmlUploadSource,
+    ZeronUnavailable,
+    add_delta_listener,
+    changed_summary,
+)
 
 # NOTE:
 # main.py mounts this router with:
@@ -27,421 +38,80 @@ from app.models import Product, Group
 router = APIRouter()
 logger = logging.getLogger(__name__)
 
-# =============================================================================
-# Zeron connection config
-# =============================================================================
-
-ZERON_URL = os.getenv(
-    "ZERON_URL",
-    "https://sysserver.praktis.bg:37005/ZeronServerService/DataExchange",
-)
-ZERON_DATABASE = os.getenv("ZERON_DB", "zdbMegadom")
-ZERON_USERCODE = os.getenv("ZERON_USERCODE", "1831")
-ZERON_USERPASS = os.getenv("ZERON_USERPASS", "angelbangel33")
-ZERON_STOREHOUSE = os.getenv("ZERON_STOREHOUSE", "1001")
-
-ZERON_MAX_PER_REQUEST = int(os.getenv("ZERON_MAX_PER_REQUEST", "200"))
-ZERON_TIMEOUT = int(os.getenv("ZERON_TIMEOUT", "60"))
-ZERON_VERIFY_SSL = os.getenv("ZERON_SSL_VERIFY", "1").lower() in ("1", "true", "yes", "on")
-
-
-# =============================================================================
-# Helpers: Excel parsing (find SKU column by header name)
-# =============================================================================
-
-def _normalize_header(value: str) -> str:
-    if value is None:
-        return ""
-    s = str(value).strip().lower()
-    while "  " in s:
-        s = s.replace("  ", " ")
-    return s
-
-
-# Names / fragments for the SKU column header
-SKU_HEADER_KEYWORDS = (
-    # Bulgarian variants
-    "код",              # "Код"
-    "ску",              # "Ску"
-    "код на zeron",
-    "код в zeron",
-    "код zeron",
-    "ков зерон",        # typo: "Ков Зерон"
-    # English variants
-    "sku",
-    "skus",
-    "codes",
-)
-
-
-def _is_sku_header_cell(text: str) -> bool:
-    if not text:
-        return False
-    norm = _normalize_header(text)
-
-    # exact simple names
-    if norm in ("код", "ску", "sku", "skus", "codes"):
-        return True
-
-    for kw in SKU_HEADER_KEYWORDS:
-        if kw in norm:
-            return True
-    return False
-
-
-def _normalize_sku_cell(value) -> Optional[str]:
-    if value is None:
-        return None
-    # Numeric cells (e.g. 35566672 or 35566672.0)
-    if isinstance(value, (int, float)):
-        if isinstance(value, float) and value.is_integer():
-            return str(int(value))
-        return str(value).strip()
-    s = str(value).strip()
-    if not s:
-        return None
-    # Excel-ish "35566672.0"
-    if s.endswith(".0") and s[:-2].isdigit():
-        return s[:-2]
-    return s
-
-
-def extract_skus_from_excel(data: bytes) -> List[str]:
-    """
-    Reads an Excel file and returns a list of SKUs based on header names.
-
-    Recognised header names / patterns (case-insensitive):
-      - Код, Ску
-      - Код на Zeron, Код в Zeron, Код Zeron, Ков Зерон
-      - Sku, skus, codes
-    """
-    f = io.BytesIO(data)
-    wb = load_workbook(f, read_only=True, data_only=True)
-    skus: List[str] = []
-    seen: set[str] = set()
-
-    for sheet in wb.worksheets:
-        sku_col_idx: Optional[int] = None
-        header_row_idx: Optional[int] = None
-
-        # Search header row (first 20 rows max)
-        for row in sheet.iter_rows(min_row=1, max_row=min(sheet.max_row, 20)):
-            for cell in row:
-                text = str(cell.value).strip() if cell.value is not None else ""
-                if _is_sku_header_cell(text):
-                    sku_col_idx = cell.column  # 1-based index
-                    header_row_idx = cell.row
-                    break
-            if sku_col_idx is not None:
-                break
-
-        if sku_col_idx is None or header_row_idx is None:
-            continue  # sheet without recognised header
-
-        # Data rows
-        for row in sheet.iter_rows(min_row=header_row_idx + 1, max_row=sheet.max_row):
-            cell = row[sku_col_idx - 1]  # openpyxl columns are 1-based
-            sku = _normalize_sku_cell(cell.value)
-            if not sku:
-                continue
-            if sku in seen:
-                continue
-            seen.add(sku)
-            skus.append(sku)
-
-    if not skus:
-        raise ValueError(
-            "Не успях да намеря колона със SKU. Очаквам заглавие като "
-            '"Код", "Код в Zeron", "Код на Зерон", "Sku", "Skus", "Codes" и т.н.'
-        )
-    return skus
-
+# delta of the last refresh_all (SKUs created / changed), see GET /erp/refresh_all/last
+LAST_REFRESH: Dict[str, object] = {}
 
-# =============================================================================
-# Common helper (taken from your code – ONLY used for price logic)
-# =============================================================================
+# delta events of the latest imports (any source), see GET /erp/deltas
+RECENT_DELTAS: Deque[Dict[str, object]] = deque(maxlen=20)
 
-class Common:
-    @staticmethod
-    def process_string(s):
-        return (str(s).strip() if s is not None else "")
 
-    @staticmethod
-    def calculate_discounted_price(price: float, discount: float) -> float:
-        return price * (100.0 - discount) / 100.0
+def _on_delta(result: ImportResult) -> None:
+    if result.changed_skus:
+        RECENT_DELTAS.append({
+            "source": result.source, "finished_at": result.finished_at,
+            "created": result.created, "updated": result.updated,
+            "price_changes": result.price_changes, "changed_skus": sorted(result.changed_skus),
+        })
 
-    @classmethod
-    def process_entry(cls, entry, all_entries):
-        if 'Discount' in entry:
-            entry['DiscountedPrice'] = cls.calculate_discounted_price(float(entry['Price']), float(entry['Discount']))
-        else:
-            # Find the maximum price for the same InvCode to determine the base price
-            inv_code = entry['InvCode']
-            base_price = max(float(e['Price']) for e in all_entries if e['InvCode'] == inv_code)
 
-            discounted_price = float(entry['Price'])  # The current price is the discounted price
+add_delta_listener(_on_delta)
 
-            if base_price > discounted_price:
-                discount_percentage = round(((base_price - discounted_price) / base_price) * 100)
-                entry['Discount'] = discount_percentage  # Store discount percentage
-
-            entry['DiscountedPrice'] = discounted_price  # Store the actual discounted price
-            entry['Price'] = str(base_price)  # Ensure that the base price is stored correctly
+# incremental refresh job (POST /erp/refresh_incremental): progress + task handle
+REFRESH_PROGRESS: Dict[str, object] = {"state": "idle"}
+_REFRESH_TASK: Optional[asyncio.Task] = None
+_REFRESH_STOP: Dict[str, bool] = {"stop": False}
 
+# SKUs per window; each window is fetched, upserted and checkpointed on its own
+ERP_REFRESH_WINDOW = int(os.getenv("ERP_REFRESH_WINDOW", "2000"))
+# products refreshed more recently than this are not due (also what makes a crashed run resumable)
+ERP_REFRESH_MAX_AGE_H = float(os.getenv("ERP_REFRESH_MAX_AGE_H", "20"))
+# continuous mode: pause between passes when nothing is due
+ERP_REFRESH_IDLE_S = int(os.getenv("ERP_REFRESH_IDLE_S", "300"))
+# a pass gives up after this many windows in a row without any Zeron answer
+ERP_REFRESH_MAX_FAILED_WINDOWS = int(os.getenv("ERP_REFRESH_MAX_FAILED_WINDOWS", "3"))
 
 # =============================================================================
-# Helpers: Zeron XML generation + parsing + YOUR selection logic
+# Helpers: incremental refresh windows
 # =============================================================================
 
-def _build_zeron_payload(skus: List[str]) -> str:
-    rows = "".join(f"<Row><InvCode>{sku}</InvCode></Row>" for sku in skus)
-    xml = f"""
-<Data>
-  <Destination>
-    <Database>{ZERON_DATABASE}</Database>
-    <UserCode>{ZERON_USERCODE}</UserCode>
-    <UserPass>{ZERON_USERPASS}</UserPass>
-    <Operation>
-      <OperName>GetPriceCheckerData</OperName>
-      <Parameters>
-        <InvList>
-          {rows}
-        </InvList>
-        <StoreHouse>{ZERON_STOREHOUSE}</StoreHouse>
-      </Parameters>
-    </Operation>
-  </Destination>
-</Data>
-""".strip()
-    # compact payload
-    return xml.replace("\n", "").replace("  ", "")
-
-
-def _parse_zeron_response(xml_text: str) -> Dict[str, dict]:
-    """
-    Parse Zeron XML into a dict keyed by InvCode (sku), but the selection
-    of which row to use per SKU uses EXACTLY your if/else logic.
-    """
-    # Your code uses xmltodict, so we'll do the same
-    new_data = xmltodict.parse(xml_text)
-
-    selected_tables = []
-    inv_codes: Dict[str, List[dict]] = {}
-
-    # ---- YOUR LOGIC START (copied as-is, only "url / headers / data" part omitted) ----
-    # Check if 'Table' key exists in response
-    if new_data['Response']['Destination']['Operation']['DataSet'] is not None:
-        logger.info("Successfully received Zeron data.")
-
-        tables = new_data['Response']['Destination']['Operation']['DataSet']['Table']
-        if not isinstance(tables, list):
-            tables = [tables]
-
-        # Group entries by InvCode
-        for table in tables:
-            entry = dict(table)
-            entry["Storehouse"] = ZERON_STOREHOUSE
-            inv_code = entry.get('InvCode')
-            entry['CurrencyCode'] = Common.process_string(entry['CurrencyCode'])
-
-            if inv_code:
-                # Separating the repeating inv_codes
-                if inv_code not in inv_codes:
-                    inv_codes[inv_code] = []
-                inv_codes[inv_code].append(entry)
-    else:
-        logger.error("Zeron data response has empty DataSet.")
-
-    # Process each group of entries with the same InvCode
-    for inv_code, entries in inv_codes.items():
-        allow_better_prices_0_entries = [entry for entry in entries if entry['AllowBetterPrices'] == '0']
-
-        if allow_better_prices_0_entries:
-            for entry in allow_better_prices_0_entries:
-                Common.process_entry(entry, entries)
-            # If we have entries with AllowBetterPrices 0, select the one with the lowest PriceGroupCode
-            allow_better_prices_0_entries.sort(key=lambda x: int(x['PriceGroupCode']))
-            selected_tables.append(allow_better_prices_0_entries[0])
-        else:
-            allow_better_prices_2_entries = [entry for entry in entries if entry['AllowBetterPrices'] == '2']
-
-            if allow_better_prices_2_entries:
-                # If we have entries with AllowBetterPrices 2, filter by PriceGroupType 10 and 20, choose the lowest price
-                allow_better_prices_2_filtered = [
-                    entry for entry in entries if entry['PriceGroupType'] in ['10', '20']
-                ]
-                if allow_better_prices_2_filtered:
-                    for entry in allow_better_prices_2_filtered:
-                        Common.process_entry(entry, entries)
-                    allow_better_prices_2_filtered.sort(key=lambda x: float(x['DiscountedPrice']))
-                    selected_tables.append(allow_better_prices_2_filtered[0])
-            else:
-                allow_better_prices_3_entries = [entry for entry in entries if entry['AllowBetterPrices'] == '3']
-
-                if allow_better_prices_3_entries:
-                    # If we have entries with AllowBetterPrices 3, filter by PriceGroupType 20 and 30, choose the lowest price
-                    allow_better_prices_3_filtered = [
-                        entry for entry in entries if entry['PriceGroupType'] in ['20', '30']
-                    ]
-                    if allow_better_prices_3_filtered:
-                        for entry in allow_better_prices_3_filtered:
-                            Common.process_entry(entry, entries)
-                        allow_better_prices_3_filtered.sort(key=lambda x: float(x['DiscountedPrice']))
-                        selected_tables.append(allow_better_prices_3_filtered[0])
-                else:
-                    allow_better_prices_1_entries = [entry for entry in entries if entry['AllowBetterPrices'] == '1']
-
-                if allow_better_prices_1_entries:
-                    # Only calculate discounts for PriceGroupType != '10'
-                    for entry in allow_better_prices_1_entries:
-                        if entry['PriceGroupType'] != '10':
-                            Common.process_entry(entry, entries)
-                        else:
-                            # keep the price as-is and zero out any discount
-                            entry['DiscountedPrice'] = float(entry['Price'])
-                            entry['Discount'] = 0
-
-                    # now pick the one with the lowest discounted price
-                    allow_better_prices_1_entries.sort(
-                        key=lambda x: float(x['DiscountedPrice'])
-                    )
-                    selected_tables.append(allow_better_prices_1_entries[0])
-    # ---- YOUR LOGIC END ----
-
-    # Now we have selected_tables: one chosen row per InvCode.
-    # Convert to the dict format used by upsert_products_from_erp()
-    result: Dict[str, dict] = {}
-
-    for entry in selected_tables:
-        inv_code = entry.get("InvCode")
-        if not inv_code:
-            continue
+def _due_filter(cutoff: datetime):
+    return or_(Product.erp_refreshed_at.is_(None), Product.erp_refreshed_at < cutoff)
 
-        price_raw = entry.get("Price")
-        try:
-            price = float(str(price_raw).replace(",", ".")) if price_raw else None
-        except Exception:
-            price = None
 
-        group_raw = entry.get("GroupID")
-        try:
-            groupid = int(group_raw) if group_raw else None
-        except Exception:
-            groupid = None
-
-        result[inv_code] = {
-            "sku": inv_code,
-            "barcode": entry.get("Barcode"),
-            "name": entry.get("InvName"),
-            "measure": entry.get("Measure"),
-            "price_group_type": entry.get("PriceGroupType"),
-            "price_group_code": entry.get("PriceGroupCode"),
-            "price": price,
-            "currency_code": entry.get("CurrencyCode"),
-            "from_date": entry.get("FromDate"),
-            "allow_better_prices": entry.get("AllowBetterPrices"),
-            "in_brochure": entry.get("InBroschure"),
-            "on_stock": entry.get("OnStock"),
-            "blocked_delivery": entry.get("BlockedDelivery"),
-            "groupid": groupid,
-            "brand": entry.get("Trademark"),
-            "item_number": entry.get("SuppItemCode"),
-        }
+def _count_due(cutoff: datetime) -> int:
+    with get_session() as session:
+        return session.execute(select(func.count(Product.id)).where(_due_filter(cutoff))).scalar_one()
 
-    return result
 
-
-def fetch_zeron_for_skus(all_skus: List[str]) -> Dict[str, dict]:
-    """
-    Call Zeron in chunks and return merged result mapping sku -> info,
-    after applying your selection logic.
-    """
-    skus = [s for s in all_skus if s]
-    merged: Dict[str, dict] = {}
-    if not skus:
-        return merged
-
-    for i in range(0, len(skus), ZERON_MAX_PER_REQUEST):
-        chunk = skus[i:i + ZERON_MAX_PER_REQUEST]
-        payload = _build_zeron_payload(chunk)
-        r = requests.post(
-            ZERON_URL,
-            data=payload.encode("utf-8"),
-            headers={"Content-Type": "application/xml"},
-            timeout=ZERON_TIMEOUT,
-            verify=ZERON_VERIFY_SSL,
-        )
-        r.raise_for_status()
-        part = _parse_zeron_response(r.text)
-        merged.update(part)
-    return merged
+def _after_cursor(cursor: Optional[tuple]):
+    """Keyset condition: rows ordered after `cursor` = (erp_refreshed_at, id) of the last row read."""
+    last_ts, last_id = cursor
+    if last_ts is None:
+        return or_(Product.erp_refreshed_at.is_not(None),
+                   and_(Product.erp_refreshed_at.is_(None), Product.id > last_id))
+    return or_(Product.erp_refreshed_at > last_ts,
+               and_(Product.erp_refreshed_at == last_ts, Product.id > last_id))
 
 
-# =============================================================================
-# Helpers: DB upsert
-# =============================================================================
-
-def upsert_products_from_erp(data: Dict[str, dict]) -> Dict[str, int]:
+def _next_window(cutoff: datetime, size: int, cursor: Optional[tuple]) -> Tuple[List[tuple], Optional[tuple]]:
     """
-    Insert / update Product rows from ERP data.
-    Returns stats: created / updated.
+    (id, sku) of the next `size` due products, refreshed longest ago first
+    (never refreshed first), and the cursor to continue after them. Rows the
+    pass could not refresh stay behind the cursor and are due again next pass.
     """
-    if not data:
-        return {"created": 0, "updated": 0}
-
-    skus = list(data.keys())
-    created = 0
-    updated = 0
-
+    q = select(Product.id, Product.sku, Product.erp_refreshed_at).where(_due_filter(cutoff))
+    if cursor is not None:
+        q = q.where(_after_cursor(cursor))
+    q = q.order_by(
+        case((Product.erp_refreshed_at.is_(None), 0), else_=1),  # NULLS FIRST on every dialect
+        Product.erp_refreshed_at, Product.id,
+    ).limit(size)
     with get_session() as session:
-        # existing products
-        existing = {
-            p.sku: p
-            for p in session.execute(
-                select(Product).where(Product.sku.in_(skus))
-            ).scalars()
-        }
-
-        # **new**: load valid group ids so we don't violate the FK
-        valid_group_ids = {
-            gid for (gid,) in session.execute(select(Group.id)).all()
-        }
-
-        for sku, info in data.items():
-            p = existing.get(sku)
-            if p is None:
-                p = Product(sku=sku)
-                session.add(p)
-                existing[sku] = p
-                created += 1
-            else:
-                updated += 1
-
-            # Map ERP fields to Product columns
-            if info.get("barcode") is not None:
-                p.barcode = info["barcode"] or p.barcode
-            if info.get("item_number") is not None:
-                p.item_number = info["item_number"] or p.item_number
-            if info.get("brand") is not None:
-                p.brand = info["brand"] or p.brand
-            if info.get("name") is not None:
-                p.name = info["name"] or p.name
-
-            # price_regular from ERP (selected row)
-            if "price" in info:
-                p.price_regular = info["price"]
-
-            # groupid is FK to groups; **only set if it exists in groups.id**
-            groupid = info.get("groupid")
-            if groupid and groupid in valid_group_ids:
-                p.groupid = groupid
-            # else: leave p.groupid as-is to avoid FK violation
-
-            p.updated_at = datetime.utcnow()
-
-        session.commit()
-
-    return {"created": created, "updated": updated}
+        found = session.execute(q).all()
+    if not found:
+        return [], cursor
+    last = found[-1]
+    return [(pid, sku) for pid, sku, _ in found if sku], (last.erp_refreshed_at, last.id)
 
 
 # =============================================================================
@@ -456,81 +126,68 @@ async def ingest_xml(xml_file: UploadFile = File(...)):
 
     Frontend (current erp.html) sends field name: "xml_file"
     to /api/erp/ingest_xml.
-    """
-    try:
-        raw = await xml_file.read()
-    except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Не мога да прочета файла: {e}")
-
-    # try UTF-8, fallback to Windows-1251
-    try:
-        text = raw.decode("utf-8")
-    except UnicodeDecodeError:
-        text = raw.decode("cp1251", errors="ignore")
 
+    The file is streamed (iterparse) from the upload's temp file and upserted
+    in chunks of ERP_UPSERT_CHUNK articles, so memory stays flat for
+    multi-hundred-MB exports.
+    """
+    source = XmlUploadSource(xml_file.file)
+    importer = ErpImporter()
     try:
-        data = _parse_zeron_response(text)
-        stats = upsert_products_from_erp(data)
+        result = await importer.run(source)
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Грешен XML или неочакван формат: {e}")
+        if source.stream is None:
+            raise HTTPException(status_code=400, detail=f"Не мога да прочета файла: {e}")
+        # batches before the error are already committed
+        raise HTTPException(
+            status_code=400,
+            detail=f"Грешен XML или неочакван формат: {e} (импортирани преди грешката: {importer.stats['rows']})",
+        )
 
-    return {
-        "ok": True,
-        "rows_in_xml": len(data),
-        "created": stats["created"],
-        "updated": stats["updated"],
-    }
+    return {"rows_in_xml": result.rows, **result.as_dict()}
 
 
 @router.post("/erp/import_excel")
-async def import_erp_excel(file: UploadFile = File(...)):
+async def import_erp_excel(file: UploadFile = File(...), force_refresh: bool = False):
     """
     NEW behaviour: upload Excel with SKUs; call Zeron and upsert into products.
 
-    Excel може да има допълнителни колони – търсим колоната с име:
+    Excel / CSV може да има допълнителни колони – търсим колоната с име:
       „Код“, „Код в Zeron“, „Код на Зерон“, „Sku“, „Skus“, „Codes“, „Ков Зерон“ и т.н.
 
+    ?force_refresh=true asks Zeron for every SKU (ignores zeron_cache).
+
     Final path (with main.py prefix) is:
       POST /api/erp/import_excel
     """
     fname = (file.filename or "").lower()
-    if not fname.endswith((".xlsx", ".xls")):
-        raise HTTPException(status_code=400, detail="Моля, качете Excel файл (.xlsx или .xls).")
-
-    content = await file.read()
+    if not fname.endswith(EXCEL_EXTENSIONS + CSV_EXTENSIONS):
+        raise HTTPException(status_code=400, detail="Моля, качете Excel (.xlsx, .xls) или CSV файл (.csv, .tsv, .txt).")
 
+    # the SKU column is streamed from the spooled upload, off the event loop
+    source = ExcelSkuSource(file.file, fname, force_refresh)
     try:
-        skus = extract_skus_from_excel(content)
+        result = await ErpImporter().run(source)
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except ZeronUnavailable as e:
+        raise HTTPException(status_code=500, detail=f"Грешка при заявка към Zeron: {e}")
     except Exception as e:
-        raise HTTPException(status_code=400, detail=f"Грешка при четене на Excel: {e}")
-
-    try:
-        erp_data = fetch_zeron_for_skus(skus)
-        stats = upsert_products_from_erp(erp_data)
-    except Exception as e:
+        if not source.skus:
+            raise HTTPException(status_code=400, detail=f"Грешка при четене на Excel: {e}")
         raise HTTPException(status_code=500, detail=f"Грешка при заявка към Zeron: {e}")
 
-    missing = sorted(set(skus) - set(erp_data.keys()))
-
-    return {
-        "ok": True,
-        "skus_in_file": len(skus),
-        "skus_unique": len(set(skus)),
-        "skus_with_data": len(erp_data),
-        "created": stats["created"],
-        "updated": stats["updated"],
-        "missing_in_erp": missing,
-    }
+    return result.as_dict()
 
 
 @router.post("/erp/refresh_all")
-async def erp_refresh_all_products():
+async def erp_refresh_all_products(force_refresh: bool = False):
     """
     Endpoint intended to be called by external cronjob (no async loop inside app).
 
     Fetches ALL product.sku from DB, calls Zeron, and updates them.
+    SKUs fetched in the last ZERON_CACHE_TTL seconds come from zeron_cache
+    unless ?force_refresh=true.
 
     Final path (with main.py prefix) is:
       POST /api/erp/refresh_all
@@ -547,18 +204,176 @@ async def erp_refresh_all_products():
             "skus_with_data": 0,
             "created": 0,
             "updated": 0,
+            "unchanged": 0,
+            **changed_summary([]),
         }
 
+    source = ZeronApiSource(all_skus, force_refresh)
     try:
-        erp_data = fetch_zeron_for_skus(all_skus)
-        stats = upsert_products_from_erp(erp_data)
+        result = await ErpImporter().run(source)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Грешка при заявка към Zeron: {e}")
 
+    changed = sorted(result.changed_skus)
+    LAST_REFRESH.clear()
+    LAST_REFRESH.update(finished_at=result.finished_at, changed_skus=changed)
+
     return {
         "ok": True,
         "total_skus": len(all_skus),
-        "skus_with_data": len(erp_data),
-        "created": stats["created"],
-        "updated": stats["updated"],
+        "skus_with_data": result.details["skus_with_data"],
+        "created": result.created,
+        "updated": result.updated,
+        "unchanged": result.unchanged,
+        **changed_summary(changed),
+        "failed_skus": len(result.details["failed_skus"]),
+        "zeron": result.details["zeron"],
     }
+
+
+@router.get("/erp/refresh_all/last")
+async def erp_refresh_last():
+    """Delta of the last /erp/refresh_all in this process: SKUs created or changed."""
+    return LAST_REFRESH or {"finished_at": None, "changed_skus": []}
+
+
+async def _refresh_pass(window: int, max_age_h: float, force_refresh: bool) -> None:
+    """
+    One incremental pass over the products due for a refresh, oldest first.
+    Each window is fetched, upserted and stamped (erp_refreshed_at) before the
+    next one is read, so a crash loses at most one window and the next run
+    continues with what is still due. Windows are read with a keyset cursor,
+    so SKUs of failed Zeron chunks stay behind it for the rest of the pass and
+    are due again next pass.
+    """
+    started = datetime.utcnow()
+    cutoff = started - timedelta(hours=max(0.0, max_age_h))
+    due = await asyncio.to_thread(_count_due, cutoff)
+    p = REFRESH_PROGRESS
+    p.update(
+        state="running", pass_started_at=started.isoformat(), cutoff=cutoff.isoformat(), due_at_start=due,
+        windows=0, processed=0, with_data=0, created=0, updated=0, unchanged=0,
+        failed_skus=0, changed_skus=0, last_window_at=None, error=None,
+    )
+    cursor: Optional[tuple] = None
+    changed: List[str] = []
+    failed_windows = 0
+    while not _REFRESH_STOP["stop"]:
+        rows, next_cursor = await asyncio.to_thread(_next_window, cutoff, window, cursor)
+        if next_cursor == cursor:
+            break
+        cursor = next_cursor
+        if not rows:
+            continue
+        source = ZeronApiSource([sku for _, sku in rows], force_refresh)
+        try:
+            result = await ErpImporter().run(source)
+        except ZeronUnavailable:
+            failed_windows += 1
+            if failed_windows >= ERP_REFRESH_MAX_FAILED_WINDOWS:
+                raise
+            p["failed_skus"] += len(rows)
+            continue
+        failed_windows = 0
+        failed = set(result.details["failed_skus"])
+
+        changed.extend(result.changed_skus)
+        p["windows"] += 1
+        p["processed"] += len(rows) - len(failed)
+        p["with_data"] += result.details["skus_with_data"]
+        p["failed_skus"] += len(failed)
+        p["created"] += result.created
+        p["updated"] += result.updated
+        p["unchanged"] += result.unchanged
+        p["changed_skus"] = len(changed)
+        p["last_window_at"] = datetime.utcnow().isoformat()
+
+    LAST_REFRESH.clear()
+    LAST_REFRESH.update(finished_at=datetime.utcnow().isoformat(), changed_skus=sorted(set(changed)))
+    logger.info("erp refresh pass: %s", {k: p.get(k) for k in ("windows", "processed", "created", "updated", "failed_skus")})
+
+
+async def _refresh_job(window: int, max_age_h: float, continuous: bool, force_refresh: bool) -> None:
+    p = REFRESH_PROGRESS
+    p.update(started_at=datetime.utcnow().isoformat(), finished_at=None, passes=0, continuous=continuous)
+    try:
+        while True:
+            await _refresh_pass(window, max_age_h, force_refresh)
+            p["passes"] += 1
+            if not continuous or _REFRESH_STOP["stop"]:
+                break
+            p["state"] = "idle_wait"
+            for _ in range(ERP_REFRESH_IDLE_S):
+                if _REFRESH_STOP["stop"]:
+                    break
+                await asyncio.sleep(1)
+            if _REFRESH_STOP["stop"]:
+                break
+        p["state"] = "stopped" if _REFRESH_STOP["stop"] else "done"
+    except Exception as e:
+        logger.exception("erp refresh job failed")
+        p.update(state="failed", error=str(e))
+    finally:
+        p["finished_at"] = datetime.utcnow().isoformat()
+
+
+@router.post("/erp/refresh_incremental")
+async def erp_refresh_incremental(
+    window: int = ERP_REFRESH_WINDOW,
+    max_age_h: float = ERP_REFRESH_MAX_AGE_H,
+    continuous: bool = False,
+    force_refresh: bool = False,
+):
+    """
+    Start the incremental refresh in the background and return right away.
+
+    Products not refreshed in the last `max_age_h` hours (never refreshed
+    first) are fetched from Zeron in windows of `window` SKUs; every window is
+    upserted and checkpointed (products.erp_refreshed_at) on its own. After a
+    crash or restart, calling this again continues with what is still due.
+    `continuous=true` keeps running passes (ERP_REFRESH_IDLE_S apart) until
+    /erp/refresh_incremental/stop. max_age_h=0 refreshes everything once.
+
+    Progress: GET /api/erp/refresh_incremental/progress
+    """
+    global _REFRESH_TASK
+    if _REFRESH_TASK is not None and not _REFRESH_TASK.done():
+        raise HTTPException(status_code=409, detail="Обновяването от ERP вече върви.")
+    _REFRESH_STOP["stop"] = False
+    REFRESH_PROGRESS.clear()
+    REFRESH_PROGRESS.update(state="starting", window=max(1, window), max_age_h=max_age_h)
+    _REFRESH_TASK = asyncio.create_task(_refresh_job(max(1, window), max_age_h, continuous, force_refresh))
+    return {"ok": True, "progress": dict(REFRESH_PROGRESS)}
+
+
+@router.get("/erp/refresh_incremental/progress")
+async def erp_refresh_incremental_progress():
+    """State and counters of the incremental refresh (current or last run in this process)."""
+    return dict(REFRESH_PROGRESS)
+
+
+@router.post("/erp/refresh_incremental/stop")
+async def erp_refresh_incremental_stop():
+    """Stop after the current window (already processed windows stay checkpointed)."""
+    running = _REFRESH_TASK is not None and not _REFRESH_TASK.done()
+    _REFRESH_STOP["stop"] = True
+    return {"ok": True, "was_running": running}
+
+
+@router.get("/erp/deltas")
+async def erp_recent_deltas():
+    """Delta events of the latest imports in this process (newest last): source + SKUs created / changed."""
+    return list(RECENT_DELTAS)
+
+
+@router.get("/erp/zeron_cache")
+async def erp_zeron_cache_stats():
+    """Zeron cache size and hit rate (since process start)."""
+    return await asyncio.to_thread(zeron_cache.stats)
+
+
+@router.delete("/erp/zeron_cache")
+async def erp_zeron_cache_clear():
+    """Drop all cached Zeron records: the next import asks Zeron for everything."""
+    removed = await asyncio.to_thread(zeron_cache.clear)
+    return {"ok": True, "removed": removed}
@@ -1,18 +1,25 @@
 # -*- coding: utf-8 -*-
 from typing import List, Optional
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
+import asyncio
+import os
 import time
 
 from app.db import get_session
-from app.schemas import MatchOut, MatchCreate
+from app.schemas import MatchOut, MatchCreate, MatchSuggestionOut, MatchSuggestionConfirm
 from app.services.matching import (
     list_matches,
     create_or_update_match,
     auto_match_for_site,
     get_matches_for_product_ids,  # NEW
     auto_match_for_products,      # NEW
+    AUTO_PROGRESS,
+    get_site,
+    confirm_suggestion,
+    UnresolvableSuggestion,
 )
+from app.services import fuzzy_match
 from app.registry import registry
 
 router = APIRouter()
@@ -106,42 +113,112 @@ class AutoMatchSiteResult(BaseModel):
     elapsed_ms: float
 
 
+# Max lookups in flight across all sites during /matches/auto_all (each site keeps its own limiter too)
+AUTO_ALL_GLOBAL_PAR = int(os.getenv("AUTO_ALL_GLOBAL_PAR", "24"))
+
+
 @router.post("/matches/auto_all", response_model=List[AutoMatchSiteResult])
 async def api_auto_match_all(
     # Optional per-site limit; None or 0 => no limit (same as /matches/auto)
     limit: int | None = Query(None, ge=0, le=100000),
 ):
+    """
+    Auto-match every competitor site concurrently: one task and one DB session per
+    site, lookups capped globally by AUTO_ALL_GLOBAL_PAR. Wall time ~ slowest site.
+    Live per-site counters: GET /matches/auto_all/progress.
+    """
     from sqlalchemy import select
     from app.models import CompetitorSite  # local import to avoid changing top-level imports
 
-    results: List[AutoMatchSiteResult] = []
-
     # Load all competitor sites once
     with get_session() as session:
         sites = session.execute(select(CompetitorSite)).scalars().all()
+        site_codes = [s.code for s in sites]
 
-    for site in sites:
-        # skip Praktis (our own store) if present
-        if site.code == "praktis":
-            continue
+    global_sem = asyncio.Semaphore(max(1, AUTO_ALL_GLOBAL_PAR))
 
+    async def run_site(code: str) -> Optional[AutoMatchSiteResult]:
         try:
-            scraper = registry.get(site.code)
-        except KeyError:
-            print(f"[AUTO_ALL] No scraper registered for site_code={site.code}, skipping")
-            continue
+            scraper = registry.get(code)
+        except ValueError:
+            print(f"[AUTO_ALL] No scraper registered for site_code={code}, skipping")
+            AUTO_PROGRESS[code] = {"state": "skipped", "error": "no scraper registered"}
+            return None
 
         t0 = time.perf_counter()
-        with get_session() as session:
-            attempted, found = await auto_match_for_site(session, scraper, limit=limit)
+        try:
+            with get_session() as session:
+                attempted, found = await auto_match_for_site(session, scraper, limit=limit, global_sem=global_sem)
+        except Exception as e:
+            print(f"[AUTO_ALL] site={code} failed: {e}")
+            AUTO_PROGRESS.setdefault(code, {}).update(state="failed", error=str(e))
+            attempted, found = 0, 0
         elapsed_ms = (time.perf_counter() - t0) * 1000.0
 
-        print(f"[AUTO_ALL] site={site.code} attempted={attempted} found={found} elapsed_ms={elapsed_ms:.1f}")
-        results.append(AutoMatchSiteResult(
-            site_code=site.code,
+        print(f"[AUTO_ALL] site={code} attempted={attempted} found={found} elapsed_ms={elapsed_ms:.1f}")
+        return AutoMatchSiteResult(
+            site_code=code,
             attempted=attempted,
             found=found,
             elapsed_ms=round(elapsed_ms, 2),
-        ))
+        )
+
+    # skip Praktis (our own store) if present
+    codes = [c for c in site_codes if c != "praktis"]
+    for c in codes:
+        AUTO_PROGRESS[c] = {"state": "queued"}
+    results = await asyncio.gather(*(run_site(c) for c in codes))
+    return [r for r in results if r is not None]
+
+
+@router.get("/matches/auto_all/progress")
+async def api_auto_match_progress():
+    """Per-site auto-match counters (state, attempted, found, backed_off, elapsed_s)."""
+    return {code: dict(p) for code, p in AUTO_PROGRESS.items()}
+
 
-    return results
+# Offline fuzzy matching: name-similarity suggestions from names we already hold (no network)
+class FuzzySuggestRequest(BaseModel):
+    site_code: str
+    product_ids: Optional[List[int]] = None   # None => all unmatched products of the site
+    top_k: int = 3
+    min_score: float = 0.45
+
+
+@router.post("/matches/fuzzy/suggest", response_model=List[MatchSuggestionOut])
+async def api_fuzzy_suggest(payload: FuzzySuggestRequest):
+    def run():
+        with get_session() as session:
+            site = get_site(session, payload.site_code)
+            return fuzzy_match.suggest(
+                session, site.id,
+                top=max(1, min(20, payload.top_k)),
+                min_score=payload.min_score,
+                product_ids=payload.product_ids,
+            )
+
+    t0 = time.perf_counter()
+    try:
+        # CPU-bound (sparse matrix products): keep it off the event loop
+        items = await asyncio.to_thread(run)
+    except fuzzy_match.FuzzyUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    print(f"[FUZZY] site={payload.site_code} suggestions={len(items)} elapsed_ms={(time.perf_counter() - t0) * 1000.0:.1f}")
+    return [MatchSuggestionOut.model_validate(i) for i in items]
+
+
+@router.post("/matches/fuzzy/confirm", response_model=MatchOut)
+async def api_fuzzy_confirm(payload: MatchSuggestionConfirm):
+    try:
+        scraper = registry.get(payload.site_code)
+    except ValueError:
+        scraper = None
+    with get_session() as session:
+        try:
+            return confirm_suggestion(session, payload, scraper)
+        except UnresolvableSuggestion as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        except ValueError as e:
+            raise HTTPException(status_code=404, detail=str(e))
@@ -7,6 +7,7 @@ from app.services.matching import list_products_simple
 from sqlalchemy import select, func, or_, exists, and_
 from app.models import Product
 from app.models import Product, ProductTag, Match, CompetitorSite
+from app.services.gtin import gtin_index, gtin_query
 
 
 router = APIRouter()
@@ -28,12 +29,17 @@ async def api_list_products(
 
         if q:
             like = f"%{q}%"
-            stmt = stmt.where(
-                (Product.sku.ilike(like)) |
-                (Product.name.ilike(like)) |
-                (Product.barcode.ilike(like)) |
-                (Product.item_number.ilike(like))
-            )
+            # a barcode in any spelling (EAN-8/UPC-A/EAN-13/GTIN-14, leading zeros) hits via GTIN-14;
+            # only when q is exactly a valid barcode, never for free text with digits in it
+            gtin = gtin_query(q)
+            gtin_ids = gtin_index.product_ids(s, gtin) if gtin else []
+            stmt = stmt.where(or_(
+                Product.sku.ilike(like),
+                Product.name.ilike(like),
+                Product.barcode.ilike(like),
+                Product.item_number.ilike(like),
+                *([Product.id.in_(gtin_ids)] if gtin_ids else []),
+            ))
 
         if brand:
             norm = brand.lower().replace(" ", "").replace(".", "")
@@ -99,11 +105,14 @@ async def api_count_products(
         # text search over SKU / Barcode / Name
         if q:
             like = f"%{q.strip()}%"
+            gtin = gtin_query(q)
+            gtin_ids = gtin_index.product_ids(session, gtin) if gtin else []
             from_stmt = from_stmt.where(
                 or_(
                     Product.sku.ilike(like),
                     Product.barcode.ilike(like),
                     Product.name.ilike(like),
+                    *([Product.id.in_(gtin_ids)] if gtin_ids else []),
                 )
             )
 
@@ -1,10 +1,11 @@
 # -*- coding: utf-8 -*-
-from typing import List
+from typing import Dict, List
 from fastapi import APIRouter
 from sqlalchemy import select
 from app.db import get_session
 from app import models
 from app.schemas import SiteOut, SiteCreate
+from app.registry import registry
 
 router = APIRouter()
 
@@ -22,3 +23,8 @@ async def add_site(payload: SiteCreate):
         session.commit()
         session.refresh(site)
         return SiteOut.model_validate(site)
+
+@router.get("/sites/scraper_stats")
+async def scraper_stats() -> Dict[str, dict]:
+    """Runtime counters per registered scraper (e.g. PDP fetches made/avoided)."""
+    return {code: scraper.stats() for code, scraper in registry.items()}
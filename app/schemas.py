@@ -73,6 +73,26 @@ class MatchOut(BaseModel):
     competitor_name: Optional[str] = None
     competitor_url: Optional[str] = None
 
+# Offline fuzzy matching (suggestions to confirm)
+class MatchSuggestionOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+    product_id: int
+    product_sku: str
+    product_name: str
+    competitor_sku: Optional[str] = None
+    competitor_barcode: Optional[str] = None
+    competitor_name: str
+    competitor_url: Optional[str] = None
+    source: str
+    score: float
+
+class MatchSuggestionConfirm(BaseModel):
+    product_id: int
+    site_code: str
+    competitor_sku: Optional[str] = None
+    competitor_barcode: Optional[str] = None
+    competitor_url: Optional[str] = None
+
 # Comparison
 class ComparisonRowOut(BaseModel):
     product_sku: str
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from __future__ import annotations
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from dataclasses import dataclass
 
 @dataclass
@@ -23,12 +23,23 @@ class CompetitorDetail:
 
 class BaseScraper:
     site_code: str = ""
+    # category pages walked by crawl_listing() (configured per site via env)
+    listing_urls: List[str] = []
     async def search_by_barcode(self, barcode: Optional[str]) -> Optional[SearchResult]:
         return None
     async def fetch_product_by_match(self, match) -> Optional[CompetitorDetail]:
         raise NotImplementedError
     async def search_by_item_number(self, item_number: Optional[str], brand: Optional[str] = None) -> Optional[SearchResult]:
         return None
+    def is_pdp_url(self, url: Optional[str]) -> bool:
+        """True when `url` is a product page worth storing on Match.pdp_url."""
+        return False
+    async def crawl_listing(self, category_url: str, max_pages: int = 50) -> List[CompetitorDetail]:
+        """Every priced card on a category listing (all pages); not supported by default."""
+        return []
+    def stats(self) -> Dict[str, object]:
+        """Per-site runtime counters (request savings etc.); empty by default."""
+        return {}
 
 class ScraperRegistry:
     def __init__(self):
@@ -40,3 +51,5 @@ class ScraperRegistry:
         if site_code not in self._reg:
             raise ValueError(f"No scraper registered for {site_code}")
         return self._reg[site_code]
+    def items(self):
+        return list(self._reg.items())
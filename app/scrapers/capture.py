@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Raw-HTML capture store for competitor pages.
+
+- Capture mode (SCRAPE_CAPTURE=1): every page fetched by a scraper is stored
+  content-addressed (sha256) and compressed (zstd if installed, else gzip)
+  under SCRAPE_CAPTURE_DIR, indexed by (site, url, ts) in a small SQLite file.
+- Replay mode: scrapers read pages from the store instead of the network, so a
+  parser fix can be re-applied to already-captured pages.
+
+CLI:
+  python -m app.scrapers.capture stats
+  python -m app.scrapers.capture reparse --site praktiker [--limit 500] [--dry-run]
+"""
+from __future__ import annotations
+
+import os
+import gzip
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Iterator, Optional
+
+try:  # optional, better ratio + speed than gzip
+    import zstandard as _zstd
+except ImportError:  # pragma: no cover - depends on environment
+    _zstd = None
+
+CAPTURE_ENABLED = os.getenv("SCRAPE_CAPTURE", "0").lower() in ("1", "true", "yes", "on")
+CAPTURE_DIR = Path(os.getenv(
+    "SCRAPE_CAPTURE_DIR",
+    str(Path(__file__).resolve().parent.parent.parent / "captures"),
+))
+
+
+class CaptureMiss(LookupError):
+    """Raised in replay mode when a URL has no stored page."""
+
+
+@dataclass
+class CapturedPage:
+    site: str
+    kind: str
+    url: str
+    ts: datetime
+    sha: str
+    codec: str
+
+
+class CaptureStore:
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._ready = False
+
+    # ---- storage helpers ----
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.root / "index.sqlite3"), timeout=30)
+
+    def _ensure(self):
+        if self._ready:
+            return
+        (self.root / "blobs").mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS captures ("
+                " id INTEGER PRIMARY KEY,"
+                " site TEXT NOT NULL, kind TEXT NOT NULL, url TEXT NOT NULL,"
+                " ts TEXT NOT NULL, sha TEXT NOT NULL, codec TEXT NOT NULL)"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS ix_captures_site_url_ts ON captures(site, url, ts)")
+            con.execute("CREATE INDEX IF NOT EXISTS ix_captures_site_kind_ts ON captures(site, kind, ts)")
+        self._ready = True
+
+    def _blob_path(self, sha: str, codec: str) -> Path:
+        ext = "zst" if codec == "zstd" else "gz"
+        return self.root / "blobs" / sha[:2] / f"{sha}.html.{ext}"
+
+    @staticmethod
+    def _compress(raw: bytes) -> tuple[bytes, str]:
+        if _zstd is not None:
+            return _zstd.ZstdCompressor(level=9).compress(raw), "zstd"
+        return gzip.compress(raw, compresslevel=6), "gzip"
+
+    @staticmethod
+    def _decompress(data: bytes, codec: str) -> bytes:
+        if codec == "zstd":
+            if _zstd is None:
+                raise RuntimeError("zstandard is required to read zstd captures")
+            return _zstd.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    # ---- public API ----
+    def put(self, site: str, url: str, html: str, kind: str = "search") -> str:
+        raw = html.encode("utf-8")
+        sha = hashlib.sha256(raw).hexdigest()
+        with self._lock:
+            self._ensure()
+            with self._connect() as con:
+                row = con.execute("SELECT codec FROM captures WHERE sha = ? LIMIT 1", (sha,)).fetchone()
+                if row is None or not self._blob_path(sha, row[0]).exists():
+                    data, codec = self._compress(raw)
+                    path = self._blob_path(sha, codec)
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp = path.with_suffix(path.suffix + ".tmp")
+                    tmp.write_bytes(data)
+                    os.replace(tmp, path)
+                else:
+                    codec = row[0]
+                con.execute(
+                    "INSERT INTO captures(site, kind, url, ts, sha, codec) VALUES (?, ?, ?, ?, ?, ?)",
+                    (site, kind, url, datetime.utcnow().isoformat(), sha, codec),
+                )
+        return sha
+
+    def read(self, page: CapturedPage) -> str:
+        data = self._blob_path(page.sha, page.codec).read_bytes()
+        return self._decompress(data, page.codec).decode("utf-8")
+
+    def latest(self, site: str, url: str) -> Optional[CapturedPage]:
+        with self._lock:
+            self._ensure()
+            with self._connect() as con:
+                row = con.execute(
+                    "SELECT site, kind, url, ts, sha, codec FROM captures"
+                    " WHERE site = ? AND url = ? ORDER BY ts DESC LIMIT 1",
+                    (site, url),
+                ).fetchone()
+        return self._row(row) if row else None
+
+    def iter_pages(self, site: Optional[str] = None, kind: Optional[str] = None,
+                   since: Optional[datetime] = None) -> Iterator[CapturedPage]:
+        sql = "SELECT site, kind, url, ts, sha, codec FROM captures WHERE 1=1"
+        args: list = []
+        if site:
+            sql += " AND site = ?"; args.append(site)
+        if kind:
+            sql += " AND kind = ?"; args.append(kind)
+        if since:
+            sql += " AND ts >= ?"; args.append(since.isoformat())
+        sql += " ORDER BY ts ASC"
+        with self._lock:
+            self._ensure()
+            with self._connect() as con:
+                rows = con.execute(sql, args).fetchall()
+        for row in rows:
+            yield self._row(row)
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._ensure()
+            with self._connect() as con:
+                rows = con.execute(
+                    "SELECT site, kind, COUNT(*), COUNT(DISTINCT url), COUNT(DISTINCT sha)"
+                    " FROM captures GROUP BY site, kind ORDER BY site, kind"
+                ).fetchall()
+        return {
+            f"{site}/{kind}": {"captures": n, "urls": urls, "blobs": blobs}
+            for site, kind, n, urls, blobs in rows
+        }
+
+    @staticmethod
+    def _row(row) -> CapturedPage:
+        site, kind, url, ts, sha, codec = row
+        return CapturedPage(site=site, kind=kind, url=url, ts=datetime.fromisoformat(ts), sha=sha, codec=codec)
+
+
+store = CaptureStore(CAPTURE_DIR)
+
+_replay_lock = threading.Lock()
+_replaying = 0
+
+
+def record(site: str, url: str, html: Optional[str], kind: str = "search"):
+    """Store a fetched page when capture mode is on. Never raises."""
+    if not CAPTURE_ENABLED or not html or _replaying:
+        return
+    try:
+        store.put(site, url, html, kind)
+    except Exception as e:
+        print(f"[CAPTURE] store failed site={site} url={url}: {e}")
+
+
+def replay(site: str, url: str) -> Optional[str]:
+    """
+    In replay mode return the latest stored page for (site, url) or raise CaptureMiss.
+    Outside replay mode return None (caller goes to the network).
+    """
+    if not _replaying:
+        return None
+    page = store.latest(site, url)
+    if page is None:
+        raise CaptureMiss(f"{site}: no capture for {url}")
+    return store.read(page)
+
+
+def replaying() -> bool:
+    """True inside replay_mode(): no network, so scrapers skip jitter and rate limiting."""
+    return _replaying > 0
+
+
+@contextmanager
+def replay_mode():
+    global _replaying
+    with _replay_lock:
+        _replaying += 1
+    try:
+        yield store
+    finally:
+        with _replay_lock:
+            _replaying -= 1
+
+
+# ---- CLI ---------------------------------------------------------------------
+async def reparse(site_code: str, limit: int = 2000, dry_run: bool = False) -> dict:
+    """
+    Re-run the site's scraper over stored pages (no network) and regenerate
+    snapshots through the normal write-on-change path.
+    """
+    from sqlalchemy import select
+    from app.db import get_session
+    from app.models import CompetitorSite, Match, Product
+    from app.registry import registry, register_default_scrapers
+    from app.services.comparison import scrape_and_snapshot
+
+    register_default_scrapers()
+    scraper = registry.get(site_code)  # replay_mode(): no jitter / rate limiting
+
+    with replay_mode():
+        if not dry_run:
+            with get_session() as session:
+                written = await scrape_and_snapshot(session, scraper, limit=limit)
+            return {"site": site_code, "written": written}
+
+        parsed = missing = 0
+        with get_session() as session:
+            rows = session.execute(
+                select(Match, Product)
+                .join(Product, Product.id == Match.product_id)
+                .join(CompetitorSite, CompetitorSite.id == Match.site_id)
+                .where(CompetitorSite.code == site_code)
+                .order_by(Match.id.asc())
+                .limit(int(limit))
+            ).all()
+        for m, p in rows:
+            try:
+                detail = await scraper.fetch_product_by_match(m, p)
+            except CaptureMiss:
+                missing += 1
+                continue
+            except Exception as e:
+                print(f"[REPARSE] match={m.id} error: {e}")
+                continue
+            parsed += 1
+            print(f"[REPARSE] match={m.id} {detail}")
+        return {"site": site_code, "parsed": parsed, "missing": missing}
+
+
+def main(argv=None):
+    import argparse
+    import asyncio
+    import json
+
+    ap = argparse.ArgumentParser(prog="python -m app.scrapers.capture")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="show capture counts per site/kind")
+    rp = sub.add_parser("reparse", help="re-run parsers over stored pages and regenerate snapshots")
+    rp.add_argument("--site", required=True)
+    rp.add_argument("--limit", type=int, default=2000)
+    rp.add_argument("--dry-run", action="store_true", help="print parsed details, do not write snapshots")
+    args = ap.parse_args(argv)
+
+    if args.cmd == "stats":
+        print(json.dumps(store.stats(), indent=2))
+    elif args.cmd == "reparse":
+        res = asyncio.run(reparse(args.site, limit=args.limit, dry_run=args.dry_run))
+        print(json.dumps(res, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -15,9 +15,14 @@ from __future__ import annotations
 import re
 import time
 import random
+import os
+import json
+import queue
 import asyncio
 import threading
-from typing import Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Optional, Tuple
 
 import httpx
 from httpx import Limits, Timeout
@@ -27,8 +32,13 @@ import cloudscraper
 from urllib.parse import quote as url_quote
 
 from app.scrapers.base import BaseScraper, SearchResult, CompetitorDetail
+from app.scrapers import capture
+from app.scrapers.parsing import parse
+from app.scrapers.singleflight import SingleFlight
 
 MASHINIBG_SEARCH_URL = "https://www.onlinemashini.bg/search/{}"
+# Category pages for listing crawls (comma-separated)
+MASHINIBG_CATEGORY_URLS = [u.strip() for u in os.getenv("MASHINIBG_CATEGORY_URLS", "").split(",") if u.strip()]
 
 # Gentle defaults; site is sensitive
 CONCURRENCY = 4
@@ -89,39 +99,213 @@ class _TokenBucket:
             self.last = now
             self.tokens = max(0.0, self.tokens - n)
 
-# ---- cloudscraper fallback first, httpx second -------------------------------
-_scraper_lock = threading.Lock()
-_scraper_session = None
+# ---- cloudscraper session pool first, httpx second ---------------------------
+# N pre-warmed cloudscraper sessions on a dedicated thread pool (not the loop's
+# default executor). Each session keeps its own cookie jar, persisted per slot
+# so Cloudflare clearance survives restarts. Unhealthy / old sessions are recycled.
+CLOUDSCRAPER_SESSIONS = int(os.getenv("MASHINIBG_SESSIONS", str(CONCURRENCY)))
+CLOUDSCRAPER_TIMEOUT = 17
+SESSION_MAX_AGE = int(os.getenv("MASHINIBG_SESSION_MAX_AGE", "1800"))   # seconds
+SESSION_MAX_FAILURES = 2
+COOKIE_DIR = Path(os.getenv(
+    "MASHINIBG_COOKIE_DIR",
+    str(Path(__file__).resolve().parent.parent.parent / ".cookies"),
+))
+_HOME_URL = "https://www.onlinemashini.bg"
+# Cloudflare challenge / block statuses: the session is burnt, do not reuse it
+_CHALLENGE_STATUSES = (403, 429, 503)
+
+class _PooledSession:
+    def __init__(self, slot: int):
+        self.slot = slot
+        self.created = time.monotonic()
+        self.failures = 0
+        self.session = cloudscraper.create_scraper()
+        self.session.headers.update(_headers())
+        self._load_cookies()
+
+    @property
+    def _cookie_file(self) -> Path:
+        return COOKIE_DIR / f"mashinibg_{self.slot}.json"
+
+    def _load_cookies(self):
+        try:
+            data = json.loads(self._cookie_file.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        # clearance cookies are bound to the UA they were issued for
+        if data.get("ua"):
+            self.session.headers["User-Agent"] = data["ua"]
+        for name, value in (data.get("cookies") or {}).items():
+            self.session.cookies.set(name, value)
+
+    def save_cookies(self):
+        try:
+            COOKIE_DIR.mkdir(parents=True, exist_ok=True)
+            self._cookie_file.write_text(json.dumps({
+                "ua": self.session.headers.get("User-Agent"),
+                "cookies": self.session.cookies.get_dict(),
+            }), encoding="utf-8")
+        except Exception:
+            pass
+
+    def warm(self) -> bool:
+        try:
+            r = self.session.get(_HOME_URL, timeout=CLOUDSCRAPER_TIMEOUT)
+            ok = r.status_code < 400
+        except Exception:
+            ok = False
+        if ok:
+            self.save_cookies()
+        return ok
+
+    def healthy(self) -> bool:
+        return (self.failures < SESSION_MAX_FAILURES
+                and (time.monotonic() - self.created) < SESSION_MAX_AGE)
+
+    def close(self):
+        try:
+            self.session.close()
+        except Exception:
+            pass
+
+class _SessionPool:
+    def __init__(self, size: int):
+        self.size = max(1, size)
+        self._idle: "queue.LifoQueue[_PooledSession]" = queue.LifoQueue()
+        self._free_slots: "queue.Queue[int]" = queue.Queue()
+        for slot in range(self.size):
+            self._free_slots.put(slot)
+        self._warm_started = False  # set on first fetch; warming is scheduled once
+        self._lock = threading.Lock()
+        self.stats = {"fetches": 0, "errors": 0, "recycled": 0, "created": 0, "warm_failures": 0}
+
+    def _create(self, slot: int) -> _PooledSession:
+        ps = _PooledSession(slot)
+        if not ps.warm():
+            # challenge / network error on the home page: never pool it (callers fall back to httpx)
+            ps.close()
+            with self._lock:
+                self.stats["warm_failures"] += 1
+            raise RuntimeError(f"mashinibg: session warm-up failed (slot {slot})")
+        with self._lock:
+            self.stats["created"] += 1
+        return ps
+
+    def _acquire(self) -> _PooledSession:
+        # idle session first, then a free slot, else wait for a release;
+        # idle sessions can age out while they wait, so check before handing one out
+        while True:
+            try:
+                ps = self._idle.get_nowait()
+            except queue.Empty:
+                ps = None
+            if ps is None:
+                try:
+                    slot = self._free_slots.get_nowait()
+                except queue.Empty:
+                    try:
+                        ps = self._idle.get(timeout=1.0)
+                    except queue.Empty:
+                        continue
+                else:
+                    try:
+                        return self._create(slot)
+                    except Exception:
+                        self._free_slots.put(slot)
+                        raise
+            if ps.healthy():
+                return ps
+            self._recycle(ps)
+
+    def _recycle(self, ps: _PooledSession):
+        with self._lock:
+            self.stats["recycled"] += 1
+        ps.close()
+        self._free_slots.put(ps.slot)
+
+    def _release(self, ps: _PooledSession):
+        if ps.healthy():
+            self._idle.put(ps)
+            return
+        self._recycle(ps)
+
+    def warm_one(self):
+        """Pre-create one session into the idle queue (scheduled once per slot)."""
+        try:
+            slot = self._free_slots.get_nowait()
+        except queue.Empty:
+            return
+        try:
+            self._idle.put(self._create(slot))
+        except Exception:
+            self._free_slots.put(slot)
+
+    def fetch(self, url: str) -> str:
+        ps = self._acquire()
+        try:
+            r = ps.session.get(url, timeout=CLOUDSCRAPER_TIMEOUT)
+            if r.status_code in _CHALLENGE_STATUSES:
+                ps.failures = SESSION_MAX_FAILURES
+            r.raise_for_status()
+            if ps.failures:
+                ps.failures = 0
+            if r.cookies:
+                ps.save_cookies()
+            with self._lock:
+                self.stats["fetches"] += 1
+            return r.text
+        except Exception:
+            ps.failures += 1
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        finally:
+            self._release(ps)
+
+_session_pool = _SessionPool(CLOUDSCRAPER_SESSIONS)
+_cs_executor = ThreadPoolExecutor(max_workers=_session_pool.size, thread_name_prefix="mashinibg-cs")
 
 def _cloudscraper_fetch(url: str) -> str:
-    global _scraper_session
-    with _scraper_lock:
-        if _scraper_session is None:
-            s = cloudscraper.create_scraper()
-            s.headers.update(_headers())
-            try:
-                s.get("https://www.onlinemashini.bg", timeout=17)
-            except Exception:
-                pass
-            _scraper_session = s
-        s = _scraper_session
-    r = s.get(url, timeout=17)
-    r.raise_for_status()
-    return r.text
+    return _session_pool.fetch(url)
+
+# shared httpx fallback client (one per event loop)
+_fallback_client: Optional[httpx.AsyncClient] = None
+_fallback_loop = None
+
+def _get_fallback_client() -> httpx.AsyncClient:
+    global _fallback_client, _fallback_loop
+    loop = asyncio.get_running_loop()
+    if _fallback_client is None or _fallback_loop is not loop or _fallback_client.is_closed:
+        _fallback_client = _make_client()
+        _fallback_loop = loop
+    return _fallback_client
 
 @retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(0.8, 2.2))
 async def _get_html(url: str) -> str:
     loop = asyncio.get_running_loop()
-    # Try cloudscraper in a thread first
+    if not _session_pool._warm_started:
+        _session_pool._warm_started = True
+        for _ in range(_session_pool.size):
+            loop.run_in_executor(_cs_executor, _session_pool.warm_one)
+    # Try a pooled cloudscraper session on the dedicated executor first
     try:
-        return await loop.run_in_executor(None, _cloudscraper_fetch, url)
+        return await loop.run_in_executor(_cs_executor, _cloudscraper_fetch, url)
     except Exception:
         pass
     # Fallback to httpx
-    async with _make_client() as client:
-        r = await client.get(url, headers=_headers())
-        r.raise_for_status()
-        return r.text
+    r = await _get_fallback_client().get(url, headers=_headers())
+    r.raise_for_status()
+    return r.text
+
+async def _fetch_html(url: str, kind: str = "search") -> str:
+    """Network fetch with capture/replay (see app.scrapers.capture)."""
+    stored = capture.replay("mashinibg", url)
+    if stored is not None:
+        return stored
+    html = await _get_html(url)
+    capture.record("mashinibg", url, html, kind)
+    return html
 
 # ---- utils -------------------------------------------------------------------
 _NUM_RE = r"(?:\d{1,3}(?:[ \u00A0.,]\d{3})+|\d+)"
@@ -158,7 +342,9 @@ def _parse_search_card(html: str) -> Tuple[Optional[dict], Optional[str]]:
     card = tree.css_first("div.product-box-h.cat.rounded.col-md-12.product_container.mb-2")
     if not card:
         return None, None
+    return _parse_card(card)
 
+def _parse_card(card) -> Tuple[Optional[dict], Optional[str]]:
     # --- Name + PDP link
     desc = card.css_first("div.col-8.col-md-8.full.description.pr-md-4")
     name = "N/A"
@@ -215,6 +401,20 @@ def _parse_search_card(html: str) -> Tuple[Optional[dict], Optional[str]]:
         }
     return data, pdp_link
 
+def _parse_listing_page(html: str) -> dict:
+    """Category listing -> {"items": [card data dicts], "next": next page URL or None}."""
+    tree = HTMLParser(html)
+    items = []
+    for card in tree.css("div.product-box-h.cat.rounded.col-md-12.product_container.mb-2"):
+        data, _ = _parse_card(card)
+        if data and data.get("url"):
+            items.append(data)
+    nxt = tree.css_first("link[rel='next'], a[rel='next'], ul.pagination a.next")
+    href = nxt.attributes.get("href") if nxt else None
+    if href and not href.startswith("http"):
+        href = "https://www.onlinemashini.bg" + href
+    return {"items": items, "next": href or None}
+
 def _parse_pdp(html: str) -> Tuple[Optional[str], Optional[float], Optional[float]]:
     tree = HTMLParser(html)
     name = None
@@ -239,6 +439,22 @@ class MashiniBgScraper(BaseScraper):
         self.site_code = "mashinibg"
         self._bucket = _TokenBucket(REQUESTS_PER_SECOND, BURST)
         self._sem = asyncio.Semaphore(CONCURRENCY)
+        self.listing_urls = list(MASHINIBG_CATEGORY_URLS)
+        self._flight = SingleFlight(self.site_code)
+
+    def stats(self) -> dict:
+        return {"singleflight": self._flight.stats()}
+
+    async def _throttled(self, url: str, kind: str) -> str:
+        async with self._sem:
+            if not capture.replaying():  # stored pages: nothing to be polite to
+                await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
+                await self._bucket.take()
+            return await _fetch_html(url, kind)
+
+    async def _page(self, url: str, kind: str = "search") -> str:
+        """Rate-limited fetch; concurrent callers for the same (kind, url) share one request."""
+        return await self._flight.do((kind, url), self._throttled, url, kind)
 
     # Used by auto-match (barcode → a potential SKU we can store)
     async def search_by_item_number(self, item_number: Optional[str], brand: Optional[str] = None) -> Optional[SearchResult]:
@@ -246,11 +462,8 @@ class MashiniBgScraper(BaseScraper):
             return None
         query = item_number if not brand else f"{item_number} {brand}"
         url = MASHINIBG_SEARCH_URL.format(url_quote(str(query), safe=""))
-        async with self._sem:
-            await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
-            await self._bucket.take()
-            html = await _get_html(url)
-        data, pdp_link = _parse_search_card(html)
+        html = await self._page(url)
+        data, pdp_link = await parse(_parse_search_card, html)
         if not data and not pdp_link:
             return None
         return SearchResult(
@@ -264,11 +477,8 @@ class MashiniBgScraper(BaseScraper):
         if not barcode:
             return None
         search_url = MASHINIBG_SEARCH_URL.format(url_quote(str(barcode), safe=""))
-        async with self._sem:
-            await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
-            await self._bucket.take()
-            html = await _get_html(search_url)
-        data, pdp_link = _parse_search_card(html)
+        html = await self._page(search_url)
+        data, pdp_link = await parse(_parse_search_card, html)
         if not data and not pdp_link:
             return None
         return SearchResult(
@@ -278,6 +488,10 @@ class MashiniBgScraper(BaseScraper):
             name=(data or {}).get("name"),
         )
 
+    def is_pdp_url(self, url: Optional[str]) -> bool:
+        # Stored for catalogue resolution; scraping stays search-first (the label icon is only on the grid card)
+        return bool(url) and "onlinemashini.bg" in url and "/search/" not in url
+
     def _choose_query(self, match) -> tuple[str, str]:
         sku = (match.competitor_sku or "").strip() or None
         bar = (match.competitor_barcode or "").strip() or None
@@ -315,12 +529,9 @@ class MashiniBgScraper(BaseScraper):
 
         # Search page
         search_url = MASHINIBG_SEARCH_URL.format(url_quote(str(query), safe=""))
-        async with self._sem:
-            await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
-            await self._bucket.take()
-            html = await _get_html(search_url)
+        html = await self._page(search_url)
 
-        parsed, pdp_link = _parse_search_card(html)
+        parsed, pdp_link = await parse(_parse_search_card, html)
         name = (parsed or {}).get("name")
         regular = (parsed or {}).get("regular_price")
         promo = (parsed or {}).get("promo_price")
@@ -329,11 +540,8 @@ class MashiniBgScraper(BaseScraper):
 
         # PDP fallback if prices missing (label is only on the grid icon, so we keep what we have)
         if (regular is None and promo is None) and pdp_link:
-            async with self._sem:
-                await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
-                await self._bucket.take()
-                html2 = await _get_html(pdp_link)
-            n2, r2, p2 = _parse_pdp(html2)
+            html2 = await self._page(pdp_link, "pdp")
+            n2, r2, p2 = await parse(_parse_pdp, html2)
             if n2: name = n2
             if r2 is not None: regular = r2
             if p2 is not None: promo = p2
@@ -351,3 +559,25 @@ class MashiniBgScraper(BaseScraper):
             promo_price=promo,
             label=label_text,  # <<< NEW (goes into PriceSnapshot.competitor_label via your save code)
         )
+
+    async def crawl_listing(self, category_url: str, max_pages: int = 50) -> List[CompetitorDetail]:
+        """Walk a category (following "next" links); every priced card becomes a CompetitorDetail."""
+        out: List[CompetitorDetail] = []
+        url: Optional[str] = category_url
+        seen = set()
+        for _ in range(max(1, int(max_pages))):
+            if not url or url in seen:
+                break
+            seen.add(url)
+            html = await self._page(url, "listing")
+            page = await parse(_parse_listing_page, html)
+            for it in page["items"]:
+                out.append(CompetitorDetail(
+                    url=it["url"],
+                    name=it["name"],
+                    regular_price=it["regular_price"],
+                    promo_price=it["promo_price"],
+                    label=it["label"],
+                ))
+            url = page["next"]
+        return out
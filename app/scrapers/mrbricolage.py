@@ -1,9 +1,10 @@
 # -*- coding: utf-8 -*-
+import os
 import re
 import time
 import random
 import asyncio
-from typing import Optional, Tuple
+from typing import List, Optional, Tuple
 
 import httpx
 from httpx import Limits, Timeout
@@ -11,8 +12,13 @@ from selectolax.parser import HTMLParser
 from tenacity import retry, stop_after_attempt, wait_exponential_jitter
 
 from app.scrapers.base import BaseScraper, SearchResult, CompetitorDetail
+from app.scrapers import capture
+from app.scrapers.parsing import parse
+from app.scrapers.singleflight import SingleFlight
 
 MRB_SEARCH_URL = "https://mr-bricolage.bg/search-list?query={}"
+# Category pages for listing crawls (comma-separated)
+MRB_CATEGORY_URLS = [u.strip() for u in os.getenv("MRBRICOLAGE_CATEGORY_URLS", "").split(",") if u.strip()]
 
 # keep these in line with praktiker scraper style
 CONCURRENCY = 8
@@ -117,6 +123,26 @@ def parse_mrb_card(card) -> Tuple[Optional[str], Optional[float], Optional[float
 
     return (name, regular_price, promo_price, pdp_url, label_text)
 
+def parse_search_page(html: str) -> Optional[Tuple[Optional[str], Optional[float], Optional[float], Optional[str], Optional[str]]]:
+    """
+    First PLP card of a search page -> parse_mrb_card() tuple, or None without a card.
+    Pure (html in, tuple out) so it can run off the event loop.
+    """
+    card = HTMLParser(html).css_first("div.plp-product div.product")
+    if not card:
+        return None
+    return parse_mrb_card(card)
+
+def parse_listing_page(html: str) -> dict:
+    """Category listing -> {"items": [parse_mrb_card() tuples], "next": next page URL or None}."""
+    tree = HTMLParser(html)
+    items = [parse_mrb_card(card) for card in tree.css("div.plp-product div.product")]
+    nxt = tree.css_first("link[rel='next'], a[rel='next'], li.pagination-next a")
+    href = nxt.attributes.get("href") if nxt else None
+    if href and not href.startswith("http"):
+        href = "https://mr-bricolage.bg" + href
+    return {"items": items, "next": href or None}
+
 async def _make_client() -> httpx.AsyncClient:
     return httpx.AsyncClient(
         http2=False,
@@ -132,6 +158,15 @@ async def _get(client: httpx.AsyncClient, url: str) -> str:
     r.raise_for_status()
     return r.text
 
+async def _fetch(client: httpx.AsyncClient, url: str, kind: str = "search") -> str:
+    """Network fetch with capture/replay (see app.scrapers.capture)."""
+    stored = capture.replay("mrbricolage", url)
+    if stored is not None:
+        return stored
+    html = await _get(client, url)
+    capture.record("mrbricolage", url, html, kind)
+    return html
+
 class _TokenBucket:
     def __init__(self, rate: float, capacity: float):
         self.rate = float(rate); self.capacity = float(capacity)
@@ -159,6 +194,23 @@ class MrBricolageScraper(BaseScraper):
         self.site_code = "mrbricolage"
         self._bucket = _TokenBucket(REQUESTS_PER_SECOND, BURST)
         self._sem = asyncio.Semaphore(CONCURRENCY)
+        self.listing_urls = list(MRB_CATEGORY_URLS)
+        self._flight = SingleFlight(self.site_code)
+
+    def stats(self) -> dict:
+        return {"singleflight": self._flight.stats()}
+
+    async def _throttled(self, url: str, kind: str) -> str:
+        async with self._sem:
+            if not capture.replaying():  # stored pages: nothing to be polite to
+                await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
+                await self._bucket.take()
+            async with await _make_client() as client:
+                return await _fetch(client, url, kind)
+
+    async def _page(self, url: str, kind: str = "search") -> str:
+        """Rate-limited fetch; concurrent callers for the same (kind, url) share one request."""
+        return await self._flight.do((kind, url), self._throttled, url, kind)
 
     async def search_by_barcode(self, barcode: Optional[str]) -> Optional[SearchResult]:
         """
@@ -167,18 +219,13 @@ class MrBricolageScraper(BaseScraper):
         """
         if not barcode: return None
         search_url = MRB_SEARCH_URL.format(barcode)
-        async with self._sem:
-            await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
-            await self._bucket.take()
-            async with await _make_client() as client:
-                html = await _get(client, search_url)
+        html = await self._page(search_url)
 
-        tree = HTMLParser(html)
-        card = tree.css_first("div.plp-product div.product")
-        if not card:
+        parsed = await parse(parse_search_page, html)
+        if not parsed:
             return None
 
-        name, _, _, pdp_url = parse_mrb_card(card)
+        name, _, _, pdp_url, _ = parsed
         return SearchResult(
             competitor_sku=None,               # usually unknown from search page
             competitor_barcode=None,           # we don’t discover it on page; we keep user’s EAN in Match
@@ -186,6 +233,10 @@ class MrBricolageScraper(BaseScraper):
             name=name
         )
 
+    def is_pdp_url(self, url: Optional[str]) -> bool:
+        # Stored for catalogue resolution; scraping stays search-first (labels come from the PLP card)
+        return bool(url) and "mr-bricolage.bg" in url and "search-list" not in url
+
     def _choose_query(self, match) -> tuple[str, str]:
         # Prefer SKU if present; else barcode — exactly like Praktiker
         sku = (match.competitor_sku or "").strip() or None
@@ -203,18 +254,13 @@ class MrBricolageScraper(BaseScraper):
             return None
 
         search_url = MRB_SEARCH_URL.format(query)
-        async with self._sem:
-            await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
-            await self._bucket.take()
-            async with await _make_client() as client:
-                html = await _get(client, search_url)
+        html = await self._page(search_url)
 
-        tree = HTMLParser(html)
-        card = tree.css_first("div.plp-product div.product")
-        if not card:
+        parsed = await parse(parse_search_page, html)
+        if not parsed:
             return None
 
-        name, regular_price, promo_price, pdp_url, label_text = parse_mrb_card(card)
+        name, regular_price, promo_price, pdp_url, label_text = parsed
 
         final_sku = (match.competitor_sku or "").strip() or None
         final_bar = (match.competitor_barcode or "").strip() or None
@@ -228,3 +274,30 @@ class MrBricolageScraper(BaseScraper):
             promo_price=promo_price,
             label=label_text,  # <<< NEW — saved into PriceSnapshot.competitor_label by your service
         )
+
+    async def crawl_listing(self, category_url: str, max_pages: int = 50) -> List[CompetitorDetail]:
+        """
+        Walk a category (following "next" links); every priced card becomes a CompetitorDetail.
+        No SKU on MrBricolage cards, so these resolve to matches by URL.
+        """
+        out: List[CompetitorDetail] = []
+        url: Optional[str] = category_url
+        seen = set()
+        for _ in range(max(1, int(max_pages))):
+            if not url or url in seen:
+                break
+            seen.add(url)
+            html = await self._page(url, "listing")
+            page = await parse(parse_listing_page, html)
+            for name, regular_price, promo_price, pdp_url, label_text in page["items"]:
+                if not pdp_url or (regular_price is None and promo_price is None):
+                    continue
+                out.append(CompetitorDetail(
+                    url=pdp_url,
+                    name=name,
+                    regular_price=regular_price,
+                    promo_price=promo_price,
+                    label=label_text,
+                ))
+            url = page["next"]
+        return out
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Off-loop HTML parsing for scrapers.
+
+Parsing a full page (HTMLParser + CSS queries, regex over the whole document)
+is CPU work; doing it on the event loop stalls every other fetch and every API
+request served by the same process. Scrapers call `await parse(fn, html)`
+with a module-level, picklable `fn(html) -> result`; calls are collected for a
+few milliseconds and shipped to the executor as one batch.
+
+Config (env):
+  SCRAPE_PARSE_EXECUTOR  process | thread | inline   (default: process)
+  SCRAPE_PARSE_WORKERS   pool size                   (default: min(4, cpu count))
+  SCRAPE_PARSE_BATCH     max calls per batch         (default: 16)
+  SCRAPE_PARSE_WAIT_MS   batching window in ms       (default: 5)
+"""
+from __future__ import annotations
+
+import os
+import asyncio
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional, Tuple
+
+PARSE_EXECUTOR = os.getenv("SCRAPE_PARSE_EXECUTOR", "process").strip().lower()
+PARSE_WORKERS = int(os.getenv("SCRAPE_PARSE_WORKERS", str(min(4, os.cpu_count() or 1))))
+PARSE_BATCH = int(os.getenv("SCRAPE_PARSE_BATCH", "16"))
+PARSE_WAIT_MS = float(os.getenv("SCRAPE_PARSE_WAIT_MS", "5"))
+
+
+def _run_batch(calls: List[Tuple[Callable, tuple]]) -> List[Tuple[bool, Any]]:
+    """Runs in the worker: execute each call, never let one failure sink the batch."""
+    out: List[Tuple[bool, Any]] = []
+    for fn, args in calls:
+        try:
+            out.append((True, fn(*args)))
+        except Exception as e:
+            out.append((False, e))
+    return out
+
+
+class ParsePool:
+    def __init__(self, mode: str = PARSE_EXECUTOR, workers: int = PARSE_WORKERS,
+                 batch_size: int = PARSE_BATCH, batch_wait_ms: float = PARSE_WAIT_MS):
+        self.mode = mode if mode in ("process", "thread", "inline") else "process"
+        self.workers = max(1, int(workers))
+        self.batch_size = max(1, int(batch_size))
+        self.batch_wait = max(0.0, float(batch_wait_ms)) / 1000.0
+        self._executor: Optional[Executor] = None
+        self._executor_lock = threading.Lock()
+        self._pending: List[Tuple[Callable, tuple, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self.stats = {"calls": 0, "batches": 0, "inline_fallbacks": 0}
+
+    def _get_executor(self) -> Executor:
+        with self._executor_lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                else:
+                    self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="parse")
+            return self._executor
+
+    def _reset_executor(self):
+        with self._executor_lock:
+            ex, self._executor = self._executor, None
+        if ex is not None:
+            ex.shutdown(wait=False, cancel_futures=True)
+
+    async def run(self, fn: Callable, *args) -> Any:
+        self.stats["calls"] += 1
+        if self.mode == "inline":
+            return fn(*args)
+        loop = asyncio.get_running_loop()
+        fut = loop.create_future()
+        self._pending.append((fn, args, fut))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.batch_wait, self._flush)
+        return await fut
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.stats["batches"] += 1
+        calls = [(fn, args) for fn, args, _ in batch]
+        try:
+            cf = self._get_executor().submit(_run_batch, calls)
+        except (BrokenProcessPool, RuntimeError):
+            self._reset_executor()
+            self._run_inline(batch)
+            return
+        afut = asyncio.wrap_future(cf)
+        afut.add_done_callback(lambda f: self._deliver(batch, f))
+
+    def _deliver(self, batch, done: asyncio.Future):
+        exc = done.exception() if not done.cancelled() else asyncio.CancelledError()
+        if exc is not None:
+            # pool died (worker crash / pickling error): parse these on the loop once
+            if isinstance(exc, BrokenProcessPool):
+                self._reset_executor()
+            self._run_inline(batch)
+            return
+        for (_, _, fut), (ok, value) in zip(batch, done.result()):
+            if fut.done():
+                continue
+            if ok:
+                fut.set_result(value)
+            else:
+                fut.set_exception(value)
+
+    def _run_inline(self, batch):
+        self.stats["inline_fallbacks"] += len(batch)
+        for fn, args, fut in batch:
+            if fut.done():
+                continue
+            try:
+                fut.set_result(fn(*args))
+            except Exception as e:
+                fut.set_exception(e)
+
+    def shutdown(self):
+        self._reset_executor()
+
+
+pool = ParsePool()
+
+
+async def parse(fn: Callable, *args) -> Any:
+    """Run a pure parser `fn(*args)` off the event loop (see module docstring)."""
+    return await pool.run(fn, *args)
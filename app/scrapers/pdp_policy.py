@@ -0,0 +1,102 @@
+# -*- coding: utf-8 -*-
+"""
+When is a PDP follow-up request worth it?
+
+The search card already carries name, prices and (usually) the label. A PDP
+fetch doubles the request cost of an item, so it is only made when:
+  - the card has no price at all, or
+  - the card has no label but this competitor key showed a PDP-only label
+    recently (seeded from snapshots, updated from PDP outcomes), or
+  - a random sample (sample_rate) so new PDP-only labels are still discovered.
+
+Counts of PDP fetches made / avoided (with reasons) are kept per site.
+"""
+from __future__ import annotations
+
+import os
+import time
+import random
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+
+class PdpPolicy:
+    def __init__(self, site_code: str, sample_rate: float = 0.05, label_ttl_days: float = 30.0):
+        self.site_code = site_code
+        self.sample_rate = max(0.0, min(1.0, float(sample_rate)))
+        self.label_ttl = float(label_ttl_days) * 86400.0
+        self._label_seen: Dict[str, float] = {}   # key -> monotonic ts of last PDP-only label
+        self.seeded = False
+        self._lock = threading.Lock()
+        self._counts: Dict[str, int] = {}
+
+    @classmethod
+    def from_env(cls, site_code: str) -> "PdpPolicy":
+        prefix = site_code.upper()
+        return cls(
+            site_code,
+            sample_rate=float(os.getenv(f"{prefix}_PDP_SAMPLE_RATE", "0.05")),
+            label_ttl_days=float(os.getenv(f"{prefix}_PDP_LABEL_TTL_DAYS", "30")),
+        )
+
+    # ---- history ----
+    def seed(self, keys: Iterable[str]):
+        """Mark keys that recently carried a label (from snapshots, once per process)."""
+        now = time.monotonic()
+        with self._lock:
+            self.seeded = True
+            for k in keys:
+                if k:
+                    self._label_seen.setdefault(k, now)
+
+    def observe(self, key: Optional[str], card_label: Optional[str], pdp_label: Optional[str]):
+        """Record a PDP outcome: did the PDP show a label the card did not?"""
+        if not key:
+            return
+        with self._lock:
+            if pdp_label and not card_label:
+                self._label_seen[key] = time.monotonic()
+            elif not pdp_label:
+                self._label_seen.pop(key, None)
+
+    def _label_likely(self, key: Optional[str]) -> bool:
+        if not key:
+            return False
+        with self._lock:
+            ts = self._label_seen.get(key)
+            if ts is None:
+                return False
+            if time.monotonic() - ts > self.label_ttl:
+                self._label_seen.pop(key, None)
+                return False
+            return True
+
+    # ---- decision ----
+    def decide(self, key: Optional[str], has_price: bool, has_label: bool) -> Tuple[bool, str]:
+        if has_price and has_label:
+            return False, "card_complete"   # never needed a PDP, not counted as avoided
+        if not has_price:
+            fetch, reason = True, "missing_price"
+        elif self._label_likely(key):
+            fetch, reason = True, "label_history"
+        elif self.sample_rate and random.random() < self.sample_rate:
+            fetch, reason = True, "sample"
+        else:
+            fetch, reason = False, "no_label_expected"
+        with self._lock:
+            self._counts["made" if fetch else "avoided"] = self._counts.get("made" if fetch else "avoided", 0) + 1
+            self._counts[reason] = self._counts.get(reason, 0) + 1
+        return fetch, reason
+
+    def stats(self) -> Dict[str, object]:
+        with self._lock:
+            counts = dict(self._counts)
+            tracked = len(self._label_seen)
+        return {
+            "site": self.site_code,
+            "pdp_made": counts.pop("made", 0),
+            "pdp_avoided": counts.pop("avoided", 0),
+            "reasons": counts,
+            "label_keys_tracked": tracked,
+            "sample_rate": self.sample_rate,
+        }
@@ -1,4 +1,5 @@
 # -*- coding: utf-8 -*-
+import os
 import re
 import time
 import random
@@ -11,8 +12,14 @@ from selectolax.parser import HTMLParser, Node
 from tenacity import retry, stop_after_attempt, wait_exponential_jitter
 
 from app.scrapers.base import BaseScraper, SearchResult, CompetitorDetail
+from app.scrapers import capture
+from app.scrapers.parsing import parse
+from app.scrapers.singleflight import SingleFlight
+from app.scrapers.pdp_policy import PdpPolicy
 
 PRAKTIKER_SEARCH_URL = "https://praktiker.bg/search/{}"
+# Category pages for listing crawls (comma-separated)
+PRAKTIKER_CATEGORY_URLS = [u.strip() for u in os.getenv("PRAKTIKER_CATEGORY_URLS", "").split(",") if u.strip()]
 CONCURRENCY = 8
 REQUESTS_PER_SECOND = 1.5
 BURST = 3
@@ -104,6 +111,68 @@ def extract_item_labels(scope: Node) -> List[str]:
       out.append(t); seen.add(t)
   return out
 
+# ---- page parsers (pure: html -> dict; run off-loop via app.scrapers.parsing) ----
+def _parse_card(card: Node) -> dict:
+  """One grid card -> dict(name, regular, promo, label, pdp_url, sku)."""
+  name_el = card.css_first("h2.product-item__title a")
+  regular, promo = extract_praktiker_prices(card)
+  labels = extract_item_labels(card)
+
+  pdp_url = None
+  sku = None
+  a = card.css_first("a[href*='/p/']")
+  href = a.attributes.get("href") if a else None
+  if href:
+    pdp_url = href if href.startswith("http") else "https://praktiker.bg" + href
+    m_id = re.search(r"/p/(\d+)", href)
+    if m_id: sku = m_id.group(1)
+
+  return {
+    "name": name_el.text(strip=True) if name_el else None,
+    "regular": regular,
+    "promo": promo,
+    "label": labels[0] if labels else None,
+    "pdp_url": pdp_url,
+    "sku": sku,
+  }
+
+def parse_search_page(html: str) -> Optional[dict]:
+  """
+  First product card of a search page -> _parse_card() dict.
+  None when the page has no product grid/card.
+  """
+  tree = HTMLParser(html)
+  grid = tree.css_first("div.products-grid")
+  if not grid: return None
+  card = grid.css_first("te-product-box div.products-grid__item")
+  if not card: return None
+  return _parse_card(card)
+
+def parse_listing_page(html: str) -> dict:
+  """Category listing -> {"items": [_parse_card() dicts], "next": next page URL or None}."""
+  tree = HTMLParser(html)
+  items = [_parse_card(c) for c in tree.css("div.products-grid te-product-box div.products-grid__item")]
+  nxt = tree.css_first("link[rel='next'], a[rel='next'], a.pagination__next")
+  href = nxt.attributes.get("href") if nxt else None
+  if href and not href.startswith("http"):
+    href = "https://praktiker.bg" + href
+  return {"items": items, "next": href or None}
+
+def parse_pdp_page(html: str) -> dict:
+  """PDP -> dict(name, regular, promo, label)."""
+  t2 = HTMLParser(html)
+  h = t2.css_first("h1, h1.product-title, title")
+  regular, promo = extract_praktiker_prices(t2)
+  if regular is None and promo is None:
+    regular, _ = parse_dual_price_block(t2)
+  labels = extract_item_labels(t2)
+  return {
+    "name": h.text(strip=True) if h else None,
+    "regular": regular,
+    "promo": promo,
+    "label": labels[0] if labels else None,
+  }
+
 async def _make_client() -> httpx.AsyncClient:
   return httpx.AsyncClient(http2=False, limits=CLIENT_LIMITS, timeout=CLIENT_TIMEOUT, headers=build_headers(), follow_redirects=True)
 
@@ -113,6 +182,37 @@ async def _get(client: httpx.AsyncClient, url: str) -> str:
   r.raise_for_status()
   return r.text
 
+@retry(stop=stop_after_attempt(3), wait=wait_exponential_jitter(0.8, 2.2))
+async def _get_response(client: httpx.AsyncClient, url: str) -> httpx.Response:
+  r = await client.get(url, headers=build_headers())
+  if r.status_code >= 500:
+    r.raise_for_status()
+  return r
+
+async def _fetch_pdp(client: httpx.AsyncClient, url: str) -> Optional[str]:
+  """Direct PDP fetch; a removed (404) or moved (redirect) product returns None instead of raising."""
+  try:
+    stored = capture.replay("praktiker", url)
+  except capture.CaptureMiss:
+    return None
+  if stored is not None:
+    return stored
+  r = await _get_response(client, url)
+  if r.status_code == 404 or r.history:
+    return None
+  r.raise_for_status()
+  capture.record("praktiker", url, r.text, "pdp")
+  return r.text
+
+async def _fetch(client: httpx.AsyncClient, url: str, kind: str = "search") -> str:
+  """Network fetch with capture/replay (see app.scrapers.capture)."""
+  stored = capture.replay("praktiker", url)
+  if stored is not None:
+    return stored
+  html = await _get(client, url)
+  capture.record("praktiker", url, html, kind)
+  return html
+
 class _TokenBucket:
   def __init__(self, rate: float, capacity: float):
     self.rate = float(rate); self.capacity = float(capacity)
@@ -140,29 +240,37 @@ class PraktikerScraper(BaseScraper):
     self.site_code = "praktiker"
     self._bucket = _TokenBucket(REQUESTS_PER_SECOND, BURST)
     self._sem = asyncio.Semaphore(CONCURRENCY)
+    self.pdp_policy = PdpPolicy.from_env(self.site_code)
+    self.listing_urls = list(PRAKTIKER_CATEGORY_URLS)
+    self._direct = {"hits": 0, "fallbacks": 0}
+    self._flight = SingleFlight(self.site_code)
 
-  async def search_by_barcode(self, barcode: Optional[str]) -> Optional[SearchResult]:
-    if not barcode: return None
+  def stats(self) -> dict:
+    return {"pdp": self.pdp_policy.stats(), "direct_pdp": dict(self._direct), "singleflight": self._flight.stats()}
+
+  async def _throttled(self, url: str, kind: str) -> Optional[str]:
     async with self._sem:
-      await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
-      await self._bucket.take()
+      if not capture.replaying():  # stored pages: nothing to be polite to
+        await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
+        await self._bucket.take()
       async with await _make_client() as client:
-        html = await _get(client, PRAKTIKER_SEARCH_URL.format(barcode))
-    tree = HTMLParser(html)
-    grid = tree.css_first("div.products-grid")
-    if not grid: return None
-    card = grid.css_first("te-product-box div.products-grid__item")
+        if kind == "pdp_direct":
+          return await _fetch_pdp(client, url)
+        return await _fetch(client, url, kind)
+
+  async def _page(self, url: str, kind: str = "search") -> Optional[str]:
+    """Rate-limited fetch; concurrent callers for the same (kind, url) share one request."""
+    return await self._flight.do((kind, url), self._throttled, url, kind)
+
+  def is_pdp_url(self, url: Optional[str]) -> bool:
+    return bool(url) and "praktiker.bg" in url and "/p/" in url
+
+  async def search_by_barcode(self, barcode: Optional[str]) -> Optional[SearchResult]:
+    if not barcode: return None
+    html = await self._page(PRAKTIKER_SEARCH_URL.format(barcode))
+    card = await parse(parse_search_page, html)
     if not card: return None
-    a = card.css_first("a[href*='/p/']")
-    href = a.attributes.get("href") if a else None
-    url = (href if (href and href.startswith("http")) else ("https://praktiker.bg" + href)) if href else None
-    competitor_sku = None
-    if href:
-      m = re.search(r"/p/(\d+)", href)
-      if m: competitor_sku = m.group(1)
-    name_el = card.css_first("h2.product-item__title a")
-    name = name_el.text(strip=True) if name_el else None
-    return SearchResult(competitor_sku=competitor_sku, competitor_barcode=None, url=url, name=name)
+    return SearchResult(competitor_sku=card["sku"], competitor_barcode=None, url=card["pdp_url"], name=card["name"])
 
   def _choose_query(self, match) -> tuple[str, str]:
     sku = (match.competitor_sku or "").strip() or None
@@ -173,7 +281,33 @@ class PraktikerScraper(BaseScraper):
       return bar, "barcode"
     return "", "none"
 
+  async def _fetch_direct(self, match, pdp_url: str) -> Optional[CompetitorDetail]:
+    """One PDP request instead of search (+PDP). None => caller falls back to search."""
+    html = await self._page(pdp_url, "pdp_direct")
+    pdp = await parse(parse_pdp_page, html) if html else None
+    if not pdp or (pdp["regular"] is None and pdp["promo"] is None):
+      self._direct["fallbacks"] += 1
+      return None
+    self._direct["hits"] += 1
+    m_id = re.search(r"/p/(\d+)", pdp_url)
+    return CompetitorDetail(
+      competitor_sku=(m_id.group(1) if m_id else None) or (match.competitor_sku or "").strip() or None,
+      competitor_barcode=(match.competitor_barcode or "").strip() or None,
+      url=pdp_url,
+      name=pdp["name"],
+      regular_price=pdp["regular"],
+      promo_price=pdp["promo"],
+      label=pdp["label"],
+    )
+
   async def fetch_product_by_match(self, match, product=None) -> Optional[CompetitorDetail]:
+    # Known PDP URL: fetch it directly, search only if it is gone (404) or moved (redirect)
+    known_pdp = (getattr(match, "pdp_url", None) or "").strip() or None
+    if known_pdp and self.is_pdp_url(known_pdp):
+      detail = await self._fetch_direct(match, known_pdp)
+      if detail is not None:
+        return detail
+
     query, used = self._choose_query(match)
     if not query:
       return None
@@ -181,62 +315,34 @@ class PraktikerScraper(BaseScraper):
     search_url = PRAKTIKER_SEARCH_URL.format(query)
 
     # Search page
-    async with self._sem:
-      await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
-      await self._bucket.take()
-      async with await _make_client() as client:
-        html = await _get(client, search_url)
-
-    tree = HTMLParser(html)
-    grid = tree.css_first("div.products-grid")
-    name = None
-    price_reg_bgn = None
-    price_promo_bgn = None
-    pdp_url = None
-    derived_sku = None
-    label_txt: Optional[str] = None
-
-    if grid:
-      card = grid.css_first("te-product-box div.products-grid__item")
-      if card:
-        name_el = card.css_first("h2.product-item__title a")
-        name = name_el.text(strip=True) if name_el else None
-
-        # Prices from card
-        price_reg_bgn, price_promo_bgn = extract_praktiker_prices(card)
-
-        # Item label(s) from card
-        labels = extract_item_labels(card)
-        if labels: label_txt = labels[0]
-
-        a = card.css_first("a[href*='/p/']")
-        if a:
-          href = a.attributes.get("href")
-          if href:
-            pdp_url = href if href.startswith("http") else "https://praktiker.bg" + href
-            m_id = re.search(r"/p/(\d+)", href)
-            if m_id:
-              derived_sku = m_id.group(1)
-
-    # If we still have no price (or label), follow PDP
-    if ((price_reg_bgn is None and price_promo_bgn is None) or label_txt is None) and pdp_url:
-      async with self._sem:
-        await asyncio.sleep(random.uniform(JITTER_MIN, JITTER_MAX))
-        await self._bucket.take()
-        async with await _make_client() as client:
-          html2 = await _get(client, pdp_url)
-      t2 = HTMLParser(html2)
+    html = await self._page(search_url)
+
+    card = await parse(parse_search_page, html) or {}
+    name = card.get("name")
+    price_reg_bgn = card.get("regular")
+    price_promo_bgn = card.get("promo")
+    label_txt: Optional[str] = card.get("label")
+    pdp_url = card.get("pdp_url")
+    derived_sku = card.get("sku")
+
+    # Follow the PDP only when the policy says it is worth a second request
+    has_price = not (price_reg_bgn is None and price_promo_bgn is None)
+    want_pdp = False
+    policy_key = derived_sku or query
+    if pdp_url:
+      want_pdp, _reason = self.pdp_policy.decide(policy_key, has_price, label_txt is not None)
+
+    if want_pdp:
+      html2 = await self._page(pdp_url, "pdp")
+      pdp = await parse(parse_pdp_page, html2)
       if not name:
-        h = t2.css_first("h1, h1.product-title, title")
-        name = h.text(strip=True) if h else None
+        name = pdp["name"]
 
-      price_reg_bgn, price_promo_bgn = extract_praktiker_prices(t2)
+      if pdp["regular"] is not None or pdp["promo"] is not None or not has_price:
+        price_reg_bgn, price_promo_bgn = pdp["regular"], pdp["promo"]
+      self.pdp_policy.observe(policy_key, label_txt, pdp["label"])
       if label_txt is None:
-        labels2 = extract_item_labels(t2)
-        if labels2: label_txt = labels2[0]
-
-      if price_reg_bgn is None and price_promo_bgn is None:
-        price_reg_bgn, _ = parse_dual_price_block(t2)
+        label_txt = pdp["label"]
 
     final_sku = (derived_sku or (match.competitor_sku or "").strip() or None)
     final_bar = (match.competitor_barcode or "").strip() or None
@@ -250,3 +356,28 @@ class PraktikerScraper(BaseScraper):
       promo_price=price_promo_bgn,
       label=label_txt  # <<< NEW
     )
+
+  async def crawl_listing(self, category_url: str, max_pages: int = 50) -> List[CompetitorDetail]:
+    """Walk a category (following "next" links); every card becomes a CompetitorDetail."""
+    out: List[CompetitorDetail] = []
+    url: Optional[str] = category_url
+    seen = set()
+    for _ in range(max(1, int(max_pages))):
+      if not url or url in seen:
+        break
+      seen.add(url)
+      html = await self._page(url, "listing")
+      page = await parse(parse_listing_page, html)
+      for it in page["items"]:
+        if it["regular"] is None and it["promo"] is None:
+          continue
+        out.append(CompetitorDetail(
+          competitor_sku=it["sku"],
+          url=it["pdp_url"],
+          name=it["name"],
+          regular_price=it["regular"],
+          promo_price=it["promo"],
+          label=it["label"],
+        ))
+      url = page["next"]
+    return out
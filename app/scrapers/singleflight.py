@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Single-flight coalescing of concurrent page fetches.
+
+Matches that share a competitor key, or an auto-match overlapping a scrape,
+ask for the same URL at the same moment. The first caller for a key does the
+(throttled) fetch; callers arriving while it is in flight await the same
+result instead of sending another request. If the first caller is cancelled
+(its client went away), the waiting callers are not: one of them takes over
+the fetch. Nothing is cached after the fetch completes - that is what the
+capture store and snapshots are for.
+"""
+from __future__ import annotations
+
+import asyncio
+import threading
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class _LeaderCancelled(Exception):
+    """Set on the shared future when the caller doing the fetch was cancelled."""
+
+
+class SingleFlight:
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Tuple[int, Hashable], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        # saved = duplicate fetches avoided; taken_over = waits restarted because the leader was cancelled
+        self._counts = {"calls": 0, "fetches": 0, "saved": 0, "taken_over": 0}
+
+    async def do(self, key: Hashable, fn: Callable[..., Awaitable[Any]], *args) -> Any:
+        """Return fn(*args), sharing one in-flight call among concurrent callers with the same key."""
+        loop = asyncio.get_running_loop()
+        slot = (id(loop), key)  # futures belong to one loop
+        with self._lock:
+            self._counts["calls"] += 1
+        while True:
+            with self._lock:
+                fut = self._inflight.get(slot)
+                if fut is None:
+                    fut = loop.create_future()
+                    self._inflight[slot] = fut
+                    self._counts["fetches"] += 1
+                    leader = True
+                else:
+                    self._counts["saved"] += 1
+                    leader = False
+
+            if not leader:
+                try:
+                    # shield: a cancelled follower must not cancel the leader's result for the others
+                    return await asyncio.shield(fut)
+                except _LeaderCancelled:
+                    # the leader's caller went away: fetch ourselves (or follow whoever does)
+                    with self._lock:
+                        self._counts["saved"] -= 1
+                        self._counts["taken_over"] += 1
+                    continue
+
+            try:
+                result = await fn(*args)
+            except asyncio.CancelledError:
+                fut.set_exception(_LeaderCancelled())
+                fut.exception()  # mark retrieved when nobody is waiting
+                raise
+            except BaseException as e:
+                fut.set_exception(e)
+                fut.exception()  # mark retrieved; followers (if any) still get it raised
+                raise
+            else:
+                fut.set_result(result)
+                return result
+            finally:
+                with self._lock:
+                    if self._inflight.get(slot) is fut:
+                        del self._inflight[slot]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            counts = dict(self._counts)
+            counts["in_flight"] = len(self._inflight)
+        return counts
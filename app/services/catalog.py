@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Competitor catalogue from category listings.
+
+One listing page shows 24-60 priced products, so walking a site's categories
+refreshes many matched prices per request instead of one search per match.
+Cards are stored in `competitor_catalog` (one row per competitor URL) and
+resolved to matches by competitor SKU, or by URL via the snapshot history.
+"""
+from __future__ import annotations
+
+import os
+import time
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, or_, union
+from sqlalchemy.orm import Session
+
+from app.db import get_session
+from app.models import CompetitorCatalogItem, CompetitorSite, Match, PriceSnapshot
+from app.scrapers.base import CompetitorDetail
+
+logger = logging.getLogger(__name__)
+
+# Matches refreshed from the catalogue within this window are skipped by per-match scraping
+CATALOG_FRESH_HOURS = float(os.getenv("CATALOG_FRESH_HOURS", "12"))
+# Stay well under SQL Server's 2100 bind-parameter limit
+_IN_CHUNK = 1000
+
+
+def _chunks(items: List, n: int = _IN_CHUNK) -> Iterable[List]:
+    for i in range(0, len(items), n):
+        yield items[i:i + n]
+
+
+def upsert_catalog(site_id: int, details: List[CompetitorDetail], category_url: Optional[str]) -> int:
+    """Insert/update catalogue rows keyed by (site, url). Returns rows touched."""
+    by_url: Dict[str, CompetitorDetail] = {}
+    for d in details:
+        if d.url:
+            by_url[d.url[:450]] = d
+    if not by_url:
+        return 0
+
+    now = datetime.utcnow()
+    touched = 0
+    for urls in _chunks(list(by_url.keys())):
+        with get_session() as s:
+            existing = {
+                row.url: row
+                for row in s.execute(
+                    select(CompetitorCatalogItem).where(
+                        CompetitorCatalogItem.site_id == site_id,
+                        CompetitorCatalogItem.url.in_(urls),
+                    )
+                ).scalars()
+            }
+            for url in urls:
+                d = by_url[url]
+                row = existing.get(url)
+                if row is None:
+                    row = CompetitorCatalogItem(site_id=site_id, url=url)
+                    s.add(row)
+                row.competitor_sku = d.competitor_sku or row.competitor_sku
+                row.name = d.name
+                row.regular_price = d.regular_price
+                row.promo_price = d.promo_price
+                row.label = d.label
+                row.category_url = category_url
+                row.seen_at = now
+                touched += 1
+            s.commit()
+    return touched
+
+
+def resolve_catalog_matches(session: Session, site_id: int, since: datetime) -> List[Tuple[Match, CompetitorDetail]]:
+    """
+    Pair matches of the site with catalogue rows seen since `since`:
+      1) Match.competitor_sku == catalogue SKU
+      2) Match.pdp_url == catalogue URL
+      3) catalogue URL == a snapshot URL of the match's key (sites without SKUs on cards)
+    """
+    rows = session.execute(
+        select(CompetitorCatalogItem).where(
+            CompetitorCatalogItem.site_id == site_id,
+            CompetitorCatalogItem.seen_at >= since,
+        )
+    ).scalars().all()
+    if not rows:
+        return []
+
+    def _detail(row: CompetitorCatalogItem) -> CompetitorDetail:
+        return CompetitorDetail(
+            competitor_sku=row.competitor_sku,
+            url=row.url,
+            name=row.name,
+            regular_price=row.regular_price,
+            promo_price=row.promo_price,
+            label=row.label,
+        )
+
+    by_sku = {r.competitor_sku: r for r in rows if r.competitor_sku}
+    by_url = {r.url: r for r in rows}
+    out: Dict[int, Tuple[Match, CompetitorDetail]] = {}
+
+    # 1) by competitor SKU
+    for skus in _chunks(list(by_sku.keys())):
+        for m in session.execute(
+            select(Match).where(Match.site_id == site_id, Match.competitor_sku.in_(skus))
+        ).scalars():
+            out[m.id] = (m, _detail(by_sku[m.competitor_sku]))
+
+    # 2) by stored PDP URL
+    for urls in _chunks(list(by_url.keys())):
+        for m in session.execute(
+            select(Match).where(Match.site_id == site_id, Match.pdp_url.in_(urls))
+        ).scalars():
+            if m.id not in out:
+                d = _detail(by_url[m.pdp_url])
+                d.competitor_sku = d.competitor_sku if m.competitor_sku else None
+                out[m.id] = (m, d)
+
+    # 3) by URL through snapshot keys
+    key_to_url: Dict[Tuple[Optional[str], Optional[str]], str] = {}
+    for urls in _chunks(list(by_url.keys())):
+        for k_sku, k_bar, url in session.execute(
+            select(PriceSnapshot.competitor_sku, PriceSnapshot.competitor_barcode, PriceSnapshot.url)
+            .where(PriceSnapshot.site_id == site_id, PriceSnapshot.url.in_(urls))
+            .distinct()
+        ).all():
+            key_to_url[(k_sku, k_bar)] = url
+    if key_to_url:
+        sku_to_url = {k: u for (k, _), u in key_to_url.items() if k}
+        bar_to_url = {b: u for (_, b), u in key_to_url.items() if b}
+        keys = list(set(sku_to_url) | set(bar_to_url))
+        for chunk in _chunks(keys, _IN_CHUNK // 2):
+            for m in session.execute(
+                select(Match).where(
+                    Match.site_id == site_id,
+                    or_(Match.competitor_sku.in_(chunk), Match.competitor_barcode.in_(chunk)),
+                )
+            ).scalars():
+                if m.id in out:
+                    continue
+                url = sku_to_url.get(m.competitor_sku) or bar_to_url.get(m.competitor_barcode)
+                if url:
+                    d = _detail(by_url[url])
+                    d.competitor_sku = None  # keep the match's own snapshot key
+                    out[m.id] = (m, d)
+
+    return list(out.values())
+
+
+def catalog_fresh_match_ids(session: Session, site_id: int) -> set:
+    """
+    Match ids already refreshed from the catalogue within CATALOG_FRESH_HOURS:
+    the matches resolve_catalog_matches() pairs with fresh rows, as id-only
+    joins in the database (this runs before every scrape).
+    """
+    if CATALOG_FRESH_HOURS <= 0:
+        return set()
+    since = datetime.utcnow() - timedelta(hours=CATALOG_FRESH_HOURS)
+    fresh = (
+        select(CompetitorCatalogItem.competitor_sku, CompetitorCatalogItem.url)
+        .where(CompetitorCatalogItem.site_id == site_id, CompetitorCatalogItem.seen_at >= since)
+        .subquery()
+    )
+    # snapshot keys whose URL is a fresh catalogue row (path 3)
+    snap = (
+        select(PriceSnapshot.competitor_sku, PriceSnapshot.competitor_barcode)
+        .join(fresh, fresh.c.url == PriceSnapshot.url)
+        .where(PriceSnapshot.site_id == site_id)
+        .distinct()
+        .subquery()
+    )
+    site_matches = select(Match.id).where(Match.site_id == site_id)
+    q = union(
+        site_matches.join(fresh, fresh.c.competitor_sku == Match.competitor_sku),
+        site_matches.join(fresh, fresh.c.url == Match.pdp_url),
+        site_matches.join(snap, snap.c.competitor_sku == Match.competitor_sku),
+        site_matches.join(snap, snap.c.competitor_barcode == Match.competitor_barcode),
+    )
+    return set(session.execute(q).scalars())
+
+
+async def crawl_listings(session: Session, scraper, category_urls: Optional[List[str]] = None,
+                         max_pages: int = 50) -> Dict[str, object]:
+    """
+    Walk the site's category listings, store every card in the catalogue and
+    write snapshots for all matches it resolves to.
+    """
+    from app.services.comparison import _persist_details, _remember_pdp_urls  # avoid import cycle
+
+    site = session.execute(
+        select(CompetitorSite).where(CompetitorSite.code == scraper.site_code)
+    ).scalars().first()
+    if not site:
+        return {"site": scraper.site_code, "categories": 0, "items": 0, "matches": 0, "written": 0}
+
+    urls = [u for u in (category_urls or scraper.listing_urls or []) if u]
+    t0 = time.perf_counter()
+    started = datetime.utcnow()
+    logger.info("crawl_listings: site=%s categories=%d max_pages=%d", scraper.site_code, len(urls), max_pages)
+
+    async def one(url: str) -> Tuple[str, List[CompetitorDetail]]:
+        try:
+            return url, await scraper.crawl_listing(url, max_pages=max_pages)
+        except Exception as e:
+            logger.exception("crawl_listings: site=%s category=%s failed: %s", scraper.site_code, url, e)
+            return url, []
+
+    items = 0
+    for url, details in await asyncio.gather(*(one(u) for u in urls)):
+        items += len(details)
+        upsert_catalog(site.id, details, url)
+
+    resolved = resolve_catalog_matches(session, site.id, since=started)
+    try:
+        session.rollback()  # end read txn; writes use their own sessions
+    except Exception:
+        pass
+    _remember_pdp_urls(scraper, resolved)
+    written = _persist_details(site.id, resolved)
+
+    summary = {
+        "site": scraper.site_code,
+        "categories": len(urls),
+        "items": items,
+        "matches": len(resolved),
+        "written": written,
+        "elapsed_s": round(time.perf_counter() - t0, 1),
+    }
+    logger.info("crawl_listings: %s", summary)
+    return summary
@@ -5,7 +5,7 @@ import math
 from datetime import datetime, timedelta
 from typing import List, Optional, Dict, Tuple
 
-from sqlalchemy import select, func, desc, or_, and_, delete, text as _sql_text, outerjoin
+from sqlalchemy import select, func, desc, or_, and_, delete, update, text as _sql_text, outerjoin
 from sqlalchemy.orm import Session
 
 from app.models import (
@@ -16,9 +16,11 @@ from app.models import (
     ProductTag,
     Tag,
     Group,  # ← has id, parent_id, name
+    ProductPriceHistory,
 )
 from app.db import get_session
 from app.registry import registry, register_default_scrapers
+from app.services.catalog import catalog_fresh_match_ids
 
 # ─────────────────────────────────────────────────────────────────────────────
 # Logger
@@ -251,11 +253,148 @@ def _enforce_snapshot_retention(session: Session, site_id: int, key_sku: Optiona
         session.execute(delete(PriceSnapshot).where(PriceSnapshot.id.in_(to_delete)))
         session.flush()
 
+# ---------- PDP follow-up policy seed (labels seen recently) ----------
+def _seed_pdp_policy(session: Session, site_id: int, scraper) -> None:
+    policy = getattr(scraper, "pdp_policy", None)
+    if policy is None or policy.seeded:
+        return
+    cutoff = datetime.utcnow() - timedelta(days=30)
+    rows = session.execute(
+        select(PriceSnapshot.competitor_sku, PriceSnapshot.competitor_barcode)
+        .where(
+            PriceSnapshot.site_id == site_id,
+            PriceSnapshot.competitor_label.is_not(None),
+            PriceSnapshot.ts >= cutoff,
+        )
+        .distinct()
+    ).all()
+    policy.seed(k for row in rows for k in row if k)
+
+# ---------- persist scraped details as snapshots (write on change only) ----------
+def _persist_details(site_id: int, results: List[Tuple[Match, object]], chunk_size: int = 50) -> int:
+    """
+    Write one snapshot per (match, detail) whose prices or label differ from the
+    latest snapshot for the key. Short independent transactions per chunk.
+    """
+    written = 0
+    for i in range(0, len(results), chunk_size):
+        chunk = results[i:i + chunk_size]
+        with get_session() as s2:
+            try:
+                for m, detail in chunk:
+                    key_sku = (getattr(detail, "competitor_sku", None) or m.competitor_sku or None)
+                    key_bar = (getattr(detail, "competitor_barcode", None) or m.competitor_barcode or None)
+
+                    latest = s2.execute(_latest_snapshot_stmt(site_id, key_sku, key_bar)).scalars().first()
+
+                    # Compare fields; write only if something changed
+                    changed = False
+                    if latest is None:
+                        changed = True
+                    else:
+                        # Only track changes in prices or label; ignore name / URL changes
+                        if not _eq_price(detail.regular_price, latest.regular_price):
+                            changed = True
+                        elif not _eq_price(detail.promo_price, latest.promo_price):
+                            changed = True
+                        elif (getattr(detail, "label", None) or None) != (latest.competitor_label or None):
+                            changed = True
+                    if not changed:
+                        continue
+
+                    s2.add(PriceSnapshot(
+                        ts=datetime.utcnow(),
+                        site_id=site_id,
+                        competitor_sku=key_sku,
+                        competitor_barcode=key_bar,
+                        name=getattr(detail, "name", None),
+                        regular_price=_num(getattr(detail, "regular_price", None)),
+                        promo_price=_num(getattr(detail, "promo_price", None)),
+                        url=(getattr(detail, "url", None) or None),
+                        competitor_label=getattr(detail, "label", None),
+                    ))
+                    s2.flush()
+
+                    _enforce_snapshot_retention(s2, site_id, key_sku, key_bar)
+                    written += 1
+
+                s2.commit()
+            except Exception as e:
+                logger.exception("persist_details: site=%s DB chunk commit failed: %s", site_id, e)
+                try:
+                    s2.rollback()
+                except Exception:
+                    pass
+
+    return written
+
+# ---------- remember canonical PDP URLs on matches ----------
+def _remember_pdp_urls(scraper, results: List[Tuple[Match, object]]) -> int:
+    """Store detail.url on Match.pdp_url when it is a PDP and differs (next scrape can go direct)."""
+    is_pdp = getattr(scraper, "is_pdp_url", None)
+    if not is_pdp:
+        return 0
+    updates: Dict[int, str] = {}
+    for m, detail in results:
+        url = getattr(detail, "url", None)
+        if url and url != getattr(m, "pdp_url", None) and is_pdp(url):
+            updates[m.id] = url
+    if not updates:
+        return 0
+    with get_session() as s:
+        try:
+            for mid, url in updates.items():
+                s.execute(update(Match).where(Match.id == mid).values(pdp_url=url))
+            s.commit()
+        except Exception as e:
+            logger.warning("remember_pdp_urls: failed: %s", e)
+            s.rollback()
+            return 0
+    return len(updates)
+
+# ---------- fetch once per competitor key, fan out to matches ----------
+def _competitor_key(m: Match) -> Tuple:
+    """Snapshot key of a match; matches without one are never grouped."""
+    sku = (m.competitor_sku or "").strip() or None
+    bar = (m.competitor_barcode or "").strip() or None
+    if sku or bar:
+        return ("key", sku, bar)
+    return ("match", m.id)
+
+async def _fetch_by_key(scraper, to_process, log_prefix: str = "scrape") -> Tuple[List[Tuple[Match, object]], List[Tuple[Match, object]], int]:
+    """
+    Group (match, product) rows by competitor key, fetch each key once and fan the
+    detail out to every match of the group.
+    Returns (per-match results, one result per key, distinct keys).
+    """
+    groups: Dict[Tuple, List[Tuple[Match, Product]]] = {}
+    for m, p in to_process:
+        groups.setdefault(_competitor_key(m), []).append((m, p))
+
+    fanned: List[Tuple[Match, object]] = []
+    per_key: List[Tuple[Match, object]] = []
+    for rows in groups.values():
+        m0, p0 = rows[0]
+        try:
+            detail = await scraper.fetch_product_by_match(m0, p0)
+        except Exception as e:
+            logger.warning("%s: scraper error site=%s m.id=%s: %s", log_prefix, getattr(scraper, "site_code", "?"), m0.id, e)
+            continue
+        if not detail:
+            continue
+        per_key.append((m0, detail))
+        fanned.extend((m, detail) for m, _ in rows)
+    logger.info("%s: site=%s match_rows=%d distinct_keys=%d", log_prefix, getattr(scraper, "site_code", "?"),
+                len(to_process), len(groups))
+    return fanned, per_key, len(groups)
+
 # ---------- main site scrape ----------
-async def scrape_and_snapshot(session, scraper, limit: int = 200) -> int:
+async def scrape_and_snapshot(session, scraper, limit: int = 200, stats: Optional[Dict[str, int]] = None) -> int:
     """
     Scrape recent matches for the site and persist snapshots **only on change**.
     Picks matches whose latest snapshot is oldest (or missing) first.
+    Matches sharing a competitor key are fetched once; `stats` (if given) receives
+    match_rows / distinct_keys.
     """
     try:
         session.execute(_sql_text("SET TRANSACTION ISOLATION LEVEL READ UNCOMMITTED"))
@@ -309,6 +448,12 @@ async def scrape_and_snapshot(session, scraper, limit: int = 200) -> int:
 
     picked = session.execute(q_pick).all()
     to_process = [(m, p) for (m, p, _ts) in picked]
+    _seed_pdp_policy(session, site.id, scraper)
+
+    # Matches just refreshed from a category-listing crawl need no search request
+    fresh_ids = catalog_fresh_match_ids(session, site.id)
+    if fresh_ids:
+        to_process = [(m, p) for (m, p) in to_process if m.id not in fresh_ids]
 
     # End read txn before network scraping
     try:
@@ -316,85 +461,13 @@ async def scrape_and_snapshot(session, scraper, limit: int = 200) -> int:
     except Exception:
         pass
 
-    results = []
-    for m, p in to_process:
-        try:
-            detail = await scraper.fetch_product_by_match(m, p)
-        except Exception:
-            continue
-        if not detail:
-            continue
-        results.append((m, detail))
-
-    written = 0
-    CHUNK = 50
-    EPS = 0.005
-
-    def _num(x):
-        if x is None:
-            return None
-        try:
-            return float(x)
-        except Exception:
-            return None
-
-    def _eq_price(a, b):
-        a = _num(a); b = _num(b)
-        if a is None and b is None:
-            return True
-        if a is None or b is None:
-            return False
-        return math.isclose(a, b, abs_tol=EPS)
-
-    for i in range(0, len(results), CHUNK):
-        chunk = results[i:i + CHUNK]
-        with get_session() as s2:
-            try:
-                for m, detail in chunk:
-                    key_sku = (getattr(detail, "competitor_sku", None) or m.competitor_sku or None)
-                    key_bar = (getattr(detail, "competitor_barcode", None) or m.competitor_barcode or None)
+    results, per_key, n_keys = await _fetch_by_key(scraper, to_process, "scrape_and_snapshot")
+    if stats is not None:
+        stats["match_rows"] = len(to_process)
+        stats["distinct_keys"] = n_keys
 
-                    latest = s2.execute(_latest_snapshot_stmt(site.id, key_sku, key_bar)).scalars().first()
-
-                    # Compare fields; write only if something changed
-                    changed = False
-                    if latest is None:
-                        changed = True
-                    else:
-                        # Only track changes in prices or label; ignore name / URL changes
-                        if not _eq_price(detail.regular_price, latest.regular_price):
-                            changed = True
-                        elif not _eq_price(detail.promo_price, latest.promo_price):
-                            changed = True
-                        elif (getattr(detail, "label", None) or None) != (latest.competitor_label or None):
-                            changed = True
-                    if not changed:
-                        continue
-
-                    s2.add(PriceSnapshot(
-                        ts=datetime.utcnow(),
-                        site_id=site.id,
-                        competitor_sku=key_sku,
-                        competitor_barcode=key_bar,
-                        name=getattr(detail, "name", None),
-                        regular_price=_num(getattr(detail, "regular_price", None)),
-                        promo_price=_num(getattr(detail, "promo_price", None)),
-                        url=(getattr(detail, "url", None) or None),
-                        competitor_label=getattr(detail, "label", None),
-                    ))
-                    s2.flush()
-
-                    _enforce_snapshot_retention(s2, site.id, key_sku, key_bar)
-                    written += 1
-
-                s2.commit()
-            except Exception:
-                try:
-                    s2.rollback()
-                except Exception:
-                    pass
-
-    return written
+    _remember_pdp_urls(scraper, results)
+    return _persist_details(site.id, per_key)
 
 # ---------- NEW: filtered scrape (first page only; max 50) ----------
 async def scrape_filtered(
@@ -439,85 +512,13 @@ async def scrape_filtered(
     register_default_scrapers()
     scraper = registry.get(site_code)
 
-    results: List[Tuple[Match, object]] = []
-    for m, p in to_process:
-        try:
-            detail = await scraper.fetch_product_by_match(m, p)
-        except Exception as e:
-            logger.exception("scrape_filtered: scraper error site=%s m.id=%s: %s", site_code, getattr(m, "id", "?"), e)
-            continue
-        if not detail:
-            continue
-        results.append((m, detail))
-
-    written = 0
-    CHUNK = 50
-    EPS = 0.005
-
-    def _num(x):
-        if x is None:
-            return None
-        try:
-            return float(x)
-        except Exception:
-            return None
-
-    def _eq_price(a, b):
-        a = _num(a); b = _num(b)
-        if a is None and b is None: return True
-        if a is None or b is None:  return False
-        return math.isclose(a, b, abs_tol=EPS)
+    fanned, per_key, n_keys = await _fetch_by_key(scraper, to_process, "scrape_filtered")
 
-    for i in range(0, len(results), CHUNK):
-        chunk = results[i:i + CHUNK]
-        with get_session() as s2:
-            try:
-                for m, detail in chunk:
-                    key_sku = (getattr(detail, "competitor_sku", None) or m.competitor_sku or None)
-                    key_bar = (getattr(detail, "competitor_barcode", None) or m.competitor_barcode or None)
-                    latest = s2.execute(_latest_snapshot_stmt(site.id, key_sku, key_bar)).scalars().first()
-
-                    changed = False
-                    if latest is None:
-                        changed = True
-                    else:
-                        if (getattr(detail, "name", None) or None) != (latest.name or None):
-                            changed = True
-                        elif not _eq_price(getattr(detail, "regular_price", None), latest.regular_price):
-                            changed = True
-                        elif not _eq_price(getattr(detail, "promo_price", None), latest.promo_price):
-                            changed = True
-                        elif (getattr(detail, "url", None) or None) != (latest.url or None):
-                            changed = True
-                        elif (getattr(detail, "label", None) or None) != (latest.competitor_label or None):
-                            changed = True
-                    if not changed:
-                        continue
-
-                    s2.add(PriceSnapshot(
-                        ts=datetime.utcnow(),
-                        site_id=site.id,
-                        competitor_sku=key_sku,
-                        competitor_barcode=key_bar,
-                        name=getattr(detail, "name", None),
-                        regular_price=_num(getattr(detail, "regular_price", None)),
-                        promo_price=_num(getattr(detail, "promo_price", None)),
-                        url=(getattr(detail, "url", None) or None),
-                        competitor_label=getattr(detail, "label", None),
-                    ))
-                    s2.flush()
-                    _enforce_snapshot_retention(s2, site.id, key_sku, key_bar)
-                    written += 1
-                s2.commit()
-            except Exception as e:
-                logger.exception("scrape_filtered: DB chunk commit failed: %s", e)
-                try:
-                    s2.rollback()
-                except Exception:
-                    pass
+    _remember_pdp_urls(scraper, fanned)
+    written = _persist_details(site.id, per_key)
 
     logger.info("scrape_filtered: site=%s done written=%d", site_code, written)
-    return {"attempted": len(to_process), "written": written}
+    return {"attempted": len(to_process), "distinct_keys": n_keys, "written": written}
 
 # ---------- NEW: nightly mass scrape (all matched, all sites; concurrent) ----------
 async def scrape_all(session: Session) -> Dict[str, object]:
@@ -534,7 +535,7 @@ async def scrape_all(session: Session) -> Dict[str, object]:
     sites = [{"id": sid, "code": scode} for (sid, scode) in site_rows if scode]
     if not sites:
         logger.warning("scrape_all: no sites registered")
-        return {"attempted_sites": 0, "total_matches": 0, "written_snapshots": 0, "per_site": {}}
+        return {"attempted_sites": 0, "total_matches": 0, "distinct_keys": 0, "written_snapshots": 0, "per_site": {}}
 
     # Pre-compute number of matches per site
     per_site_counts: Dict[str, int] = {}
@@ -557,9 +558,12 @@ async def scrape_all(session: Session) -> Dict[str, object]:
 
         with get_session() as s2:
             try:
-                written = await scrape_and_snapshot(s2, scraper, limit=2000)
-                logger.info("scrape_all: site=%s done written=%d", site_code, written)
-                return {"matches": per_site_counts.get(site_code, 0), "written": int(written or 0)}
+                key_stats: Dict[str, int] = {}
+                written = await scrape_and_snapshot(s2, scraper, limit=2000, stats=key_stats)
+                logger.info("scrape_all: site=%s done written=%d rows=%d keys=%d", site_code, written,
+                            key_stats.get("match_rows", 0), key_stats.get("distinct_keys", 0))
+                return {"matches": per_site_counts.get(site_code, 0), "written": int(written or 0),
+                        "match_rows": key_stats.get("match_rows", 0), "distinct_keys": key_stats.get("distinct_keys", 0)}
             except Exception as e:
                 logger.exception("scrape_all: site=%s failed: %s", site_code, e)
                 return {"matches": per_site_counts.get(site_code, 0), "written": 0}
@@ -569,17 +573,25 @@ async def scrape_all(session: Session) -> Dict[str, object]:
 
     per_site: Dict[str, Dict[str, int]] = {}
     written_total = 0
+    keys_total = 0
     for s, res in zip(sites, results):
         if isinstance(res, Exception):
             logger.exception("scrape_all: task error site=%s: %s", s["code"], res)
             per_site[s["code"]] = {"matches": per_site_counts.get(s["code"], 0), "written": 0}
             continue
-        per_site[s["code"]] = {"matches": int(res.get("matches", 0)), "written": int(res.get("written", 0))}
+        per_site[s["code"]] = {
+            "matches": int(res.get("matches", 0)),
+            "match_rows": int(res.get("match_rows", 0)),
+            "distinct_keys": int(res.get("distinct_keys", 0)),
+            "written": int(res.get("written", 0)),
+        }
         written_total += int(res.get("written", 0))
+        keys_total += int(res.get("distinct_keys", 0))
 
     summary = {
         "attempted_sites": len(sites),
         "total_matches": total_matches,
+        "distinct_keys": keys_total,
         "written_snapshots": written_total,
         "per_site": per_site,
     }
@@ -640,3 +652,24 @@ def get_history_for_product(
             out[code] = snaps
 
     return prod, out
+
+
+def get_own_price_history(session: Session, product_id: int, days: int = 180) -> List[ProductPriceHistory]:
+    """
+    Our (ERP) price changes of a product in the last `days`, ascending, preceded
+    by the last change before the window (the price in effect at its start).
+    Two seeks on ix_pph_product_ts.
+    """
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    before = session.execute(
+        select(ProductPriceHistory)
+        .where(ProductPriceHistory.product_id == product_id, ProductPriceHistory.ts < cutoff)
+        .order_by(ProductPriceHistory.ts.desc())
+        .limit(1)
+    ).scalars().first()
+    rows = session.execute(
+        select(ProductPriceHistory)
+        .where(ProductPriceHistory.product_id == product_id, ProductPriceHistory.ts >= cutoff)
+        .order_by(ProductPriceHistory.ts.asc())
+    ).scalars().all()
+    return ([before] if before else []) + list(rows)
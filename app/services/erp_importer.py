@@ -0,0 +1,391 @@
+# -*- coding: utf-8 -*-
+"""
+One ERP import pipeline for every entry point:
+
+    source -> parse -> select prices -> bulk upsert -> delta events
+
+Sources yield upsert rows (see app.services.erp_upsert):
+
+  - ZeronApiSource(skus)           Zeron GetPriceCheckerData for a SKU list
+                                   (parallel chunks + zeron_cache, zeron_client)
+  - ExcelSkuSource(file, filename) SKU list from Excel / CSV (sku_file), then Zeron
+  - XmlUploadSource(file)          a Zeron XML export, streamed (zeron_xml)
+  - ItemsXmlSource(xml_text)       legacy <item><sku/>...<price_regular/></item> feed
+
+Zeron data always goes through app.services.zeron_select, so every path picks
+the same price. Rows are upserted in chunks of ERP_UPSERT_CHUNK with delta
+detection; Zeron sources also stamp products.erp_refreshed_at for the SKUs
+Zeron answered. Every finished import is passed to the delta listeners
+(add_delta_listener) as an ImportResult.
+
+Benchmark on synthetic 100k-item files: python -m benchmarks.erp_import_pipeline
+"""
+from __future__ import annotations
+
+import io
+import os
+import time
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import BinaryIO, Callable, Dict, Iterator, List, Optional
+from xml.etree import ElementTree as ET
+
+from sqlalchemy import update
+
+from app.db import get_session
+from app.models import Product
+from app.services import zeron_client
+from app.services.erp_upsert import ERP_UPSERT_CHUNK, bulk_upsert_products, row_from_erp_info
+from app.services.sku_file import extract_skus
+from app.services.zeron_client import ZeronFetchResult
+from app.services.zeron_select import iter_selected, parse_selected
+from app.services.zeron_xml import open_xml_upload
+
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# Zeron connection config
+# =============================================================================
+
+ZERON_URL = os.getenv(
+    "ZERON_URL",
+    "https://sysserver.praktis.bg:37005/ZeronServerService/DataExchange",
+)
+ZERON_DATABASE = os.getenv("ZERON_DB", "zdbMegadom")
+ZERON_USERCODE = os.getenv("ZERON_USERCODE", "1831")
+ZERON_USERPASS = os.getenv("ZERON_USERPASS", "angelbangel33")
+ZERON_STOREHOUSE = os.getenv("ZERON_STOREHOUSE", "1001")
+
+ZERON_MAX_PER_REQUEST = int(os.getenv("ZERON_MAX_PER_REQUEST", "200"))
+
+# zeron_cache namespace: parsed records of this operation / storehouse
+ZERON_CACHE_NS = f"{ZERON_DATABASE}/{ZERON_STOREHOUSE}/GetPriceCheckerData"
+
+# API responses list at most this many changed SKUs (the count is always exact)
+CHANGED_SKUS_SAMPLE = int(os.getenv("ERP_CHANGED_SKUS_SAMPLE", "100"))
+
+
+# =============================================================================
+# Zeron request / response
+# =============================================================================
+
+def build_zeron_payload(skus: List[str]) -> str:
+    rows = "".join(f"<Row><InvCode>{sku}</InvCode></Row>" for sku in skus)
+    xml = f"""
+<Data>
+  <Destination>
+    <Database>{ZERON_DATABASE}</Database>
+    <UserCode>{ZERON_USERCODE}</UserCode>
+    <UserPass>{ZERON_USERPASS}</UserPass>
+    <Operation>
+      <OperName>GetPriceCheckerData</OperName>
+      <Parameters>
+        <InvList>
+          {rows}
+        </InvList>
+        <StoreHouse>{ZERON_STOREHOUSE}</StoreHouse>
+      </Parameters>
+    </Operation>
+  </Destination>
+</Data>
+""".strip()
+    # compact payload
+    return xml.replace("\n", "").replace("  ", "")
+
+
+def parse_zeron_response(xml_text) -> Dict[str, dict]:
+    """
+    Parse Zeron XML into a dict keyed by InvCode (sku); the row used per SKU
+    is chosen by app.services.zeron_select.
+    """
+    return parse_selected(xml_text, ZERON_STOREHOUSE)
+
+
+async def fetch_zeron_for_skus_async(all_skus: List[str], force_refresh: bool = False) -> ZeronFetchResult:
+    """
+    Call Zeron in parallel chunks (see app.services.zeron_client) and return the
+    merged sku -> info mapping after price selection, plus failed chunks.
+    """
+    return await zeron_client.fetch_chunks(
+        all_skus, build_zeron_payload, parse_zeron_response,
+        url=ZERON_URL, chunk_size=ZERON_MAX_PER_REQUEST,
+        cache_ns=ZERON_CACHE_NS, force_refresh=force_refresh,
+    )
+
+
+def fetch_zeron_for_skus(all_skus: List[str], force_refresh: bool = False) -> Dict[str, dict]:
+    """
+    Sync wrapper for callers without an event loop (scripts / cron).
+    Partial failures are logged; raises only when no chunk succeeded.
+    """
+    res = asyncio.run(fetch_zeron_for_skus_async(all_skus, force_refresh))
+    if res.failed_chunks:
+        if not res.data:
+            raise ZeronUnavailable(res)
+        logger.warning("zeron: %d skus without data after retries", len(res.failed_skus))
+    return res.data
+
+
+def mark_refreshed(skus: List[str], ts: Optional[datetime] = None) -> None:
+    """Stamp products.erp_refreshed_at: these SKUs were asked from Zeron (answered, with or without data)."""
+    ts = ts or datetime.utcnow()
+    with get_session() as session:
+        for i in range(0, len(skus), 1000):  # SQL Server: max 2100 parameters
+            session.execute(
+                update(Product).where(Product.sku.in_(skus[i:i + 1000])).values(erp_refreshed_at=ts)
+            )
+        session.commit()
+
+
+class ZeronUnavailable(RuntimeError):
+    """No Zeron chunk succeeded (after retries)."""
+
+    def __init__(self, fetched: ZeronFetchResult):
+        super().__init__(fetched.failed_chunks[0]["error"] if fetched.failed_chunks else "no data")
+        self.fetched = fetched
+
+
+# =============================================================================
+# Sources
+# =============================================================================
+
+class ErpSource:
+    """
+    prepare() does the network / file work up front (awaited on the event
+    loop), rows() yields upsert rows and runs in a worker thread.
+    """
+    name = "erp"
+
+    async def prepare(self) -> None:
+        pass
+
+    def rows(self) -> Iterator[dict]:
+        raise NotImplementedError
+
+    def refreshed_skus(self) -> List[str]:
+        """SKUs to stamp in products.erp_refreshed_at after the upsert."""
+        return []
+
+    def details(self) -> Dict[str, object]:
+        """Source-specific fields for the import response."""
+        return {}
+
+
+class ZeronApiSource(ErpSource):
+    name = "zeron"
+
+    def __init__(self, skus: List[str], force_refresh: bool = False):
+        self.skus = [s for s in dict.fromkeys(skus) if s]
+        self.force_refresh = force_refresh
+        self.fetched = ZeronFetchResult()
+
+    async def prepare(self) -> None:
+        if not self.skus:
+            return
+        self.fetched = await fetch_zeron_for_skus_async(self.skus, self.force_refresh)
+        if self.fetched.failed_chunks and not self.fetched.data:
+            raise ZeronUnavailable(self.fetched)
+
+    def rows(self) -> Iterator[dict]:
+        for info in self.fetched.data.values():
+            yield row_from_erp_info(info)
+
+    def refreshed_skus(self) -> List[str]:
+        failed = set(self.fetched.failed_skus)
+        return [s for s in self.skus if s not in failed]
+
+    def details(self) -> Dict[str, object]:
+        failed = set(self.fetched.failed_skus)
+        return {
+            "skus_with_data": len(self.fetched.data),
+            "missing_in_erp": sorted(set(self.skus) - set(self.fetched.data) - failed),
+            # chunks that still failed after retries (Zeron timeout / 5xx): try these again
+            "failed_skus": sorted(failed),
+            "zeron": self.fetched.summary(),
+        }
+
+
+class ExcelSkuSource(ZeronApiSource):
+    """SKU column of an Excel / CSV upload (ValueError when there is none), then Zeron."""
+    name = "excel"
+
+    def __init__(self, f: BinaryIO, filename: str = "", force_refresh: bool = False):
+        super().__init__([], force_refresh)
+        self.f = f
+        self.filename = filename
+
+    async def prepare(self) -> None:
+        # CPU / file work: off the event loop
+        self.skus = await asyncio.to_thread(extract_skus, self.f, self.filename)
+        await super().prepare()
+
+    def details(self) -> Dict[str, object]:
+        return {"skus_in_file": len(self.skus), "skus_unique": len(set(self.skus)), **super().details()}
+
+
+class XmlUploadSource(ErpSource):
+    """Zeron XML export (str / bytes / binary file), streamed article by article."""
+    name = "xml"
+
+    def __init__(self, f):
+        self.f = f
+        self.stream = None
+
+    async def prepare(self) -> None:
+        if hasattr(self.f, "read"):
+            # the encoding sniff may read the whole upload: off the event loop
+            self.stream = await asyncio.to_thread(open_xml_upload, self.f)
+        else:
+            self.stream = self.f
+
+    def rows(self) -> Iterator[dict]:
+        for info in iter_selected(self.stream, ZERON_STOREHOUSE):
+            yield row_from_erp_info(info)
+
+
+class ItemsXmlSource(ErpSource):
+    """
+    Legacy feed: <item><sku/><barcode/><name/><price_regular/><price_promo/></item>.
+    Every field is written as given (an empty one clears the stored value).
+    """
+    name = "items_xml"
+
+    def __init__(self, xml):
+        self.xml = xml
+
+    @staticmethod
+    def _price(raw: Optional[str]) -> Optional[float]:
+        try:
+            return float(raw.replace(",", ".")) if raw else None
+        except Exception:
+            return None
+
+    def rows(self) -> Iterator[dict]:
+        source = self.xml
+        if isinstance(source, str):
+            source = source.encode("utf-8")
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        stack = []
+        for event, item in ET.iterparse(source, events=("start", "end")):
+            if event == "start":
+                stack.append(item)
+                continue
+            stack.pop()
+            if item.tag != "item":
+                continue
+            sku = (item.findtext("sku") or "").strip()
+            if sku:
+                yield {
+                    "sku": sku,
+                    "barcode": (item.findtext("barcode") or "").strip() or None,
+                    "name": (item.findtext("name") or "").strip() or sku,
+                    "price_regular": self._price(item.findtext("price_regular")),
+                    "price_promo": self._price(item.findtext("price_promo")),
+                }
+            # detach from the parent too (as zeron_xml.TableStream): memory stays flat
+            if stack:
+                stack[-1].remove(item)
+            item.clear()
+
+
+# =============================================================================
+# Importer
+# =============================================================================
+
+@dataclass
+class ImportResult:
+    source: str
+    rows: int = 0
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+    price_changes: int = 0
+    changed_skus: List[str] = field(default_factory=list)
+    details: Dict[str, object] = field(default_factory=dict)
+    elapsed_s: float = 0.0
+    finished_at: str = ""
+
+    def as_dict(self) -> Dict[str, object]:
+        return {
+            "ok": True,
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "unchanged": self.unchanged,
+            **changed_summary(self.changed_skus),
+            **self.details,
+        }
+
+
+def changed_summary(skus: List[str]) -> Dict[str, object]:
+    """
+    Response fields for the SKUs an import wrote (created or ERP data changed):
+    the count plus a sorted sample of CHANGED_SKUS_SAMPLE. The full list is
+    only passed to the delta listeners.
+    """
+    return {"changed_count": len(skus), "changed_skus": sorted(skus)[:CHANGED_SKUS_SAMPLE]}
+
+
+_DELTA_LISTENERS: List[Callable[[ImportResult], None]] = []
+
+
+def add_delta_listener(fn: Callable[[ImportResult], None]) -> None:
+    """fn(result) is called after every finished import (in the caller's thread)."""
+    _DELTA_LISTENERS.append(fn)
+
+
+class ErpImporter:
+    """
+    Runs one source through the pipeline. `stats` is filled while the import
+    runs, so after a failure it shows how far it got (committed chunks stay).
+
+    The upsert always runs in a worker thread with its own session (commits
+    per chunk), so a large import never blocks the event loop.
+    """
+
+    def __init__(self, chunk_size: int = ERP_UPSERT_CHUNK):
+        self.chunk_size = chunk_size
+        self.stats: Dict[str, object] = {"rows": 0}
+
+    def _upsert(self, source: ErpSource) -> None:
+        stats = self.stats
+
+        def counted():
+            for row in source.rows():
+                stats["rows"] += 1
+                yield row
+
+        bulk_upsert_products(counted(), chunk_size=self.chunk_size, stats=stats)
+        refreshed = source.refreshed_skus()
+        if refreshed:
+            mark_refreshed(refreshed)
+
+    async def run(self, source: ErpSource) -> ImportResult:
+        t0 = time.perf_counter()
+        self.stats = {"rows": 0}
+        await source.prepare()
+        await asyncio.to_thread(self._upsert, source)
+
+        s = self.stats
+        result = ImportResult(
+            source=source.name, rows=s["rows"],
+            created=s["created"], updated=s["updated"], unchanged=s["unchanged"],
+            price_changes=s["price_changes"], changed_skus=list(s["changed_skus"]),
+            details=source.details(), elapsed_s=round(time.perf_counter() - t0, 2),
+            finished_at=datetime.utcnow().isoformat(),
+        )
+        logger.info("erp import %s: rows=%d created=%d updated=%d unchanged=%d in %.1fs",
+                    result.source, result.rows, result.created, result.updated, result.unchanged, result.elapsed_s)
+        for fn in _DELTA_LISTENERS:
+            try:
+                fn(result)
+            except Exception:
+                logger.exception("erp import: delta listener failed")
+        return result
+
+    def run_sync(self, source: ErpSource) -> ImportResult:
+        """For callers without an event loop (scripts / cron)."""
+        return asyncio.run(self.run(source))
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+Bulk product upsert for ERP imports.
+
+Rows are processed in chunks of ERP_UPSERT_CHUNK SKUs, one transaction per
+chunk. Per chunk the existing products are read with ONE query, every row is
+classified as created / updated / unchanged in Python, and only created and
+updated rows are written with one set-based statement:
+
+  - SQL Server:        staging temp table (#erp_products_stage) + MERGE when
+                       ERP_UPSERT_MSSQL_MERGE=1, otherwise the generic path
+  - SQLite / Postgres: INSERT ... ON CONFLICT (sku) DO UPDATE
+  - anything else:     executemany INSERT + executemany UPDATE by id
+
+A row dict has "sku" plus any of UPSERT_FIELDS. A key that is present is
+written as given (None included); a missing key keeps the stored value.
+groupid is only written when it exists in groups (FK).
+
+Delta detection: products.erp_hash holds a hash of the last row applied. A
+row with the same hash is skipped after a narrow (id, sku, erp_hash) read,
+without touching updated_at; rows whose hash differs but whose values are
+already stored only get the new hash. The SKUs actually created / changed
+are returned as "changed_skus".
+
+Price changes (and the first price of a new product) are appended to
+product_price_history in the same transaction.
+"""
+from __future__ import annotations
+
+import os
+import json
+import hashlib
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import select, update, insert, text, bindparam, String
+
+from app.db import get_session
+from app.models import Product, Group, ProductPriceHistory
+from app.services.gtin import to_gtin14, gtin_index
+
+logger = logging.getLogger(__name__)
+
+ERP_UPSERT_CHUNK = int(os.getenv("ERP_UPSERT_CHUNK", "1000"))
+# staging + MERGE on SQL Server; off until verified against the production server
+ERP_UPSERT_MSSQL_MERGE = os.getenv("ERP_UPSERT_MSSQL_MERGE", "0").lower() in ("1", "true", "yes", "on")
+
+UPSERT_FIELDS = (
+    "barcode", "gtin14", "item_number", "brand", "name",
+    "price_regular", "price_promo", "groupid",
+)
+
+# columns written for created / changed rows
+WRITE_FIELDS = UPSERT_FIELDS + ("erp_hash",)
+
+_STAGE = "#erp_products_stage"
+
+
+def _chunks(rows: Iterable[dict], size: int) -> Iterable[Dict[str, dict]]:
+    """Chunks keyed by sku (a later row for the same sku wins)."""
+    chunk: Dict[str, dict] = {}
+    for row in rows:
+        sku = row.get("sku")
+        if not sku:
+            continue
+        if sku not in chunk and len(chunk) >= size:
+            yield chunk
+            chunk = {}
+        chunk[sku] = row
+    if chunk:
+        yield chunk
+
+
+def row_hash(row: dict) -> str:
+    """Stable hash of a row's provided fields (sku excluded)."""
+    payload = json.dumps({k: v for k, v in row.items() if k != "sku"}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+
+def _final_values(row: dict, current: Optional[dict]) -> dict:
+    vals = {f: (current or {}).get(f) for f in UPSERT_FIELDS}
+    for f in UPSERT_FIELDS:
+        if f in row:
+            vals[f] = row[f]
+    if "barcode" in row and "gtin14" not in row:
+        vals["gtin14"] = to_gtin14(vals["barcode"])
+    if not vals.get("name"):
+        vals["name"] = (current or {}).get("name") or row["sku"]  # name is NOT NULL
+    return vals
+
+
+# ---------- dialect writers ----------
+def _stage_ddl(dialect) -> str:
+    """
+    Stage columns sized like products: String(n) -> NVARCHAR(n), so
+    fast_executemany binds fixed-size buffers (only Text falls back to MAX).
+    """
+    t = Product.__table__
+    cols = []
+    for c in ("sku",) + WRITE_FIELDS:
+        typ = t.c[c].type
+        if isinstance(typ, String):
+            ddl = f"{c} NVARCHAR({typ.length or 'MAX'}) COLLATE DATABASE_DEFAULT"
+        else:
+            ddl = f"{c} {typ.compile(dialect=dialect)}"
+        cols.append(ddl + (" PRIMARY KEY" if c == "sku" else " NULL"))
+    return ", ".join(cols + ["ts DATETIME2 NULL"])
+
+
+def _write_mssql(session, new: List[dict], changed: List[dict]):
+    conn = session.connection()
+    conn.execute(text(
+        f"IF OBJECT_ID('tempdb..{_STAGE}') IS NULL "
+        f"CREATE TABLE {_STAGE} ({_stage_ddl(conn.dialect)})"
+    ))
+    conn.execute(text(f"TRUNCATE TABLE {_STAGE}"))
+    cols = ("sku",) + WRITE_FIELDS + ("ts",)
+    conn.execute(
+        text(f"INSERT INTO {_STAGE} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)})"),
+        [{c: r[c] for c in cols} for r in new + changed],
+    )
+    sets = ", ".join(f"t.{f} = s.{f}" for f in WRITE_FIELDS)
+    conn.execute(text(
+        f"MERGE products WITH (HOLDLOCK) AS t USING {_STAGE} AS s ON t.sku = s.sku "
+        f"WHEN MATCHED THEN UPDATE SET {sets}, t.updated_at = s.ts "
+        f"WHEN NOT MATCHED THEN INSERT (sku, {', '.join(WRITE_FIELDS)}, created_at, updated_at) "
+        f"VALUES (s.sku, {', '.join('s.' + f for f in WRITE_FIELDS)}, s.ts, s.ts);"
+    ))
+
+
+def _write_on_conflict(session, dialect: str, new: List[dict], changed: List[dict]):
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    rows = [
+        {"sku": r["sku"], **{f: r[f] for f in WRITE_FIELDS}, "created_at": r["ts"], "updated_at": r["ts"]}
+        for r in new + changed
+    ]
+    # one cached statement + executemany: a multi-row VALUES would be recompiled per chunk
+    stmt = dialect_insert(Product.__table__)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[Product.__table__.c.sku],
+        set_={**{f: stmt.excluded[f] for f in WRITE_FIELDS}, "updated_at": stmt.excluded.updated_at},
+    )
+    session.connection().execute(stmt, rows)
+
+
+def _write_generic(session, new: List[dict], changed: List[dict]):
+    conn = session.connection()
+    if new:
+        conn.execute(insert(Product.__table__), [
+            {"sku": r["sku"], **{f: r[f] for f in WRITE_FIELDS}, "created_at": r["ts"], "updated_at": r["ts"]}
+            for r in new
+        ])
+    if changed:
+        t = Product.__table__
+        stmt = update(t).where(t.c.id == bindparam("_id")).values(
+            **{f: bindparam(f) for f in WRITE_FIELDS}, updated_at=bindparam("ts"),
+        )
+        conn.execute(stmt, [{"_id": r["id"], **{f: r[f] for f in WRITE_FIELDS}, "ts": r["ts"]} for r in changed])
+
+
+def _write_hashes(session, hashes: List[dict]):
+    """Values already stored: record the row hash only (updated_at untouched)."""
+    t = Product.__table__
+    session.connection().execute(
+        update(t).where(t.c.id == bindparam("_id")).values(erp_hash=bindparam("h")),
+        hashes,
+    )
+
+
+def _write(session, new: List[dict], changed: List[dict], hashes: List[dict]):
+    if hashes:
+        _write_hashes(session, hashes)
+    if not new and not changed:
+        return
+    dialect = session.get_bind().dialect.name
+    if dialect == "mssql" and ERP_UPSERT_MSSQL_MERGE:
+        _write_mssql(session, new, changed)
+    elif dialect in ("sqlite", "postgresql"):
+        _write_on_conflict(session, dialect, new, changed)
+    else:
+        _write_generic(session, new, changed)
+
+
+def _write_price_history(session, new: List[dict], changed: List[dict], current: Dict[str, dict], now) -> int:
+    """Append product_price_history rows for created products with a price and for real price changes."""
+    hist: List[dict] = []
+    for r in changed:
+        cur = current[r["sku"]]
+        if r["price_regular"] != cur["price_regular"] or r["price_promo"] != cur["price_promo"]:
+            hist.append({
+                "product_id": r["id"], "ts": now,
+                "price_regular": r["price_regular"], "price_promo": r["price_promo"],
+                "prev_price_regular": cur["price_regular"], "prev_price_promo": cur["price_promo"],
+            })
+    priced = [r for r in new if r["price_regular"] is not None or r["price_promo"] is not None]
+    if priced:
+        ids = dict(session.execute(
+            select(Product.sku, Product.id).where(Product.sku.in_([r["sku"] for r in priced]))
+        ).all())
+        hist.extend({
+            "product_id": ids[r["sku"]], "ts": now,
+            "price_regular": r["price_regular"], "price_promo": r["price_promo"],
+            "prev_price_regular": None, "prev_price_promo": None,
+        } for r in priced if r["sku"] in ids)
+    if hist:
+        session.connection().execute(insert(ProductPriceHistory.__table__), hist)
+    return len(hist)
+
+
+# ---------- public ----------
+def row_from_erp_info(info: dict) -> dict:
+    """
+    Zeron info dict (sku, barcode, name, price, groupid, ...) -> upsert row.
+    Empty barcode / item_number / brand / name / groupid keep the stored value;
+    price is always written.
+    """
+    row = {"sku": info["sku"]}
+    for f in ("barcode", "item_number", "brand", "name", "groupid"):
+        if info.get(f):
+            row[f] = info[f]
+    if "price" in info:
+        row["price_regular"] = info["price"]
+    return row
+
+
+def bulk_upsert_products(rows: Iterable[dict], session=None, chunk_size: int = ERP_UPSERT_CHUNK,
+                         stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Upsert ERP rows into products (see module doc for the row format).
+    Returns {"created", "updated", "unchanged", "price_changes", "changed_skus"}; commits once
+    per chunk, so a failure keeps the chunks before it (pass `stats` to see
+    how far it got).
+    """
+    if stats is None:
+        stats = {}
+    for k in ("created", "updated", "unchanged", "price_changes"):
+        stats.setdefault(k, 0)
+    stats.setdefault("changed_skus", [])
+    if session is None:
+        with get_session() as s:
+            return bulk_upsert_products(rows, s, chunk_size, stats)
+
+    cols = [Product.id, Product.sku] + [getattr(Product, f) for f in UPSERT_FIELDS]
+    for chunk in _chunks(rows, chunk_size):
+        now = datetime.utcnow()
+        head = {
+            sku: (pid, h)
+            for pid, sku, h in session.execute(
+                select(Product.id, Product.sku, Product.erp_hash).where(Product.sku.in_(list(chunk)))
+            ).all()
+        }
+        group_ids = {r["groupid"] for r in chunk.values() if r.get("groupid") is not None}
+        valid_groups = (
+            {gid for (gid,) in session.execute(select(Group.id).where(Group.id.in_(group_ids))).all()}
+            if group_ids else set()
+        )
+
+        pending: Dict[str, tuple] = {}
+        for sku, row in chunk.items():
+            if "groupid" in row and row["groupid"] not in valid_groups:
+                row = {k: v for k, v in row.items() if k != "groupid"}  # unknown group: keep as-is (FK)
+            h = row_hash(row)
+            if sku in head and head[sku][1] == h:
+                stats["unchanged"] += 1
+                continue
+            pending[sku] = (row, h)
+
+        known = [sku for sku in pending if sku in head]
+        current = {
+            r.sku: dict(r._mapping)
+            for r in session.execute(select(*cols).where(Product.sku.in_(known))).all()
+        } if known else {}
+
+        new: List[dict] = []
+        changed: List[dict] = []
+        hashes: List[dict] = []
+        for sku, (row, h) in pending.items():
+            cur = current.get(sku)
+            vals = _final_values(row, cur)
+            if cur is None:
+                new.append({"sku": sku, **vals, "erp_hash": h, "ts": now})
+            elif any(vals[f] != cur[f] for f in UPSERT_FIELDS):
+                changed.append({"id": cur["id"], "sku": sku, **vals, "erp_hash": h, "ts": now})
+            else:
+                hashes.append({"_id": cur["id"], "h": h})
+                stats["unchanged"] += 1
+
+        _write(session, new, changed, hashes)
+        stats["price_changes"] += _write_price_history(session, new, changed, current, now)
+        session.commit()
+        stats["created"] += len(new)
+        stats["updated"] += len(changed)
+        stats["changed_skus"].extend(r["sku"] for r in new + changed)
+        if new or changed:
+            gtin_index.invalidate()
+
+    logger.info("erp_upsert: created=%d updated=%d unchanged=%d price_changes=%d",
+                stats["created"], stats["updated"], stats["unchanged"], stats["price_changes"])
+    return stats
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+"""
+Offline fuzzy matcher: name similarity without any network request.
+
+Our products (brand + name + item_number) and the competitor names we already
+hold (latest PriceSnapshot per key, competitor_catalog rows) are turned into
+character n-gram TF-IDF vectors (sublinear tf, L2-normalised), so cosine
+similarity is a sparse dot product. Products are processed in row chunks:
+chunk @ competitors.T gives all scores of the chunk at once and the top-k per
+row is taken with argpartition. Results are suggestions only; a user confirms
+them (POST /matches/fuzzy/confirm).
+
+Requires numpy + scipy (optional: the rest of the app runs without them).
+"""
+from __future__ import annotations
+
+import re
+import math
+import time
+import logging
+from collections import Counter
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, func, exists, and_
+
+from app.models import Product, Match, PriceSnapshot, CompetitorCatalogItem
+
+try:  # optional, only this feature needs them
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - depends on environment
+    np = None
+    sparse = None
+
+logger = logging.getLogger(__name__)
+
+NGRAM = 3
+CHUNK_ROWS = 512        # product rows scored per sparse product
+IN_CHUNK = 1000         # ids per IN (...) list; SQL Server allows 2100 parameters
+MAX_DF = 0.10           # n-grams in more than 10% of all documents carry no signal (and densify scores)
+_NON_WORD = re.compile(r"[^\w]+", re.UNICODE)
+
+
+class FuzzyUnavailable(RuntimeError):
+    """numpy/scipy are not installed."""
+
+
+@dataclass
+class Suggestion:
+    product_id: int
+    product_sku: str
+    product_name: str
+    competitor_sku: Optional[str]
+    competitor_barcode: Optional[str]
+    competitor_name: str
+    competitor_url: Optional[str]
+    source: str                     # snapshot | catalog
+    score: float
+
+
+# ---------- text -> n-grams ----------
+def normalize(text: Optional[str]) -> str:
+    return _NON_WORD.sub(" ", (text or "").lower()).strip()
+
+
+def char_ngrams(text: str, n: int = NGRAM) -> List[str]:
+    """Character n-grams per word, padded so word starts/ends get their own grams."""
+    out: List[str] = []
+    for word in text.split():
+        w = f" {word} "
+        if len(w) <= n:
+            out.append(w)
+        else:
+            out.extend(w[i:i + n] for i in range(len(w) - n + 1))
+    return out
+
+
+# ---------- vectoriser ----------
+class NgramTfidf:
+    """Fitted on both sides together so product and competitor vectors share one space."""
+
+    def __init__(self, n: int = NGRAM, max_df: float = MAX_DF):
+        self.n = n
+        self.max_df = max_df
+        self.vocab: Dict[str, int] = {}
+        self.idf = None
+
+    def fit(self, docs: Sequence[List[str]]):
+        df: Counter = Counter()
+        for grams in docs:
+            df.update(set(grams))
+        n_docs = max(1, len(docs))
+        cap = max(2, int(self.max_df * n_docs))
+        kept = sorted(g for g, c in df.items() if c <= cap)
+        self.vocab = {g: i for i, g in enumerate(kept)}
+        self.idf = np.array(
+            [math.log((1 + n_docs) / (1 + df[g])) + 1.0 for g in kept], dtype=np.float32
+        )
+        return self
+
+    def transform(self, docs: Sequence[List[str]]):
+        indptr = [0]
+        indices: List[int] = []
+        data: List[float] = []
+        vocab = self.vocab
+        for grams in docs:
+            counts = Counter(g for g in grams if g in vocab)
+            for g, c in counts.items():
+                indices.append(vocab[g])
+                data.append(1.0 + math.log(c))
+            indptr.append(len(indices))
+        m = sparse.csr_matrix(
+            (np.asarray(data, dtype=np.float32), np.asarray(indices, dtype=np.int32), np.asarray(indptr, dtype=np.int64)),
+            shape=(len(docs), len(vocab)),
+        )
+        m = m.multiply(self.idf).tocsr()
+        norms = np.sqrt(np.asarray(m.multiply(m).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        return sparse.diags(1.0 / norms).dot(m).tocsr()
+
+
+def top_k(a, b, k: int, min_score: float, chunk_rows: int = CHUNK_ROWS) -> Iterable[Tuple[int, int, float]]:
+    """(row in a, row in b, cosine) for the k best b rows of every a row, score >= min_score."""
+    bt = b.T.tocsr()
+    for start in range(0, a.shape[0], chunk_rows):
+        scores = (a[start:start + chunk_rows] @ bt).tocsr()
+        for r in range(scores.shape[0]):
+            lo, hi = scores.indptr[r], scores.indptr[r + 1]
+            if lo == hi:
+                continue
+            vals = scores.data[lo:hi]
+            cols = scores.indices[lo:hi]
+            if len(vals) > k:
+                sel = np.argpartition(-vals, k - 1)[:k]
+                vals, cols = vals[sel], cols[sel]
+            order = np.argsort(-vals)
+            for j in order:
+                if vals[j] < min_score:
+                    break
+                yield start + r, int(cols[j]), float(vals[j])
+
+
+# ---------- corpora ----------
+def _product_rows(session, site_id: int, product_ids: Optional[List[int]]):
+    has_match = select(Match.id).where(Match.product_id == Product.id, Match.site_id == site_id)
+    stmt = select(Product.id, Product.sku, Product.name, Product.brand, Product.item_number).where(~exists(has_match))
+    if not product_ids:
+        return session.execute(stmt.order_by(Product.id.asc())).all()
+    ids = sorted(set(product_ids))
+    rows = []
+    for i in range(0, len(ids), IN_CHUNK):
+        rows.extend(session.execute(stmt.where(Product.id.in_(ids[i:i + IN_CHUNK]))).all())
+    return sorted(rows, key=lambda r: r[0])
+
+
+def _competitor_rows(session, site_id: int) -> List[dict]:
+    """Distinct competitor products we hold names for: latest snapshot per key + catalogue rows."""
+    rows: Dict[tuple, dict] = {}
+    last = (
+        select(
+            PriceSnapshot.competitor_sku.label("k_sku"),
+            PriceSnapshot.competitor_barcode.label("k_bar"),
+            func.max(PriceSnapshot.ts).label("ts"),
+        )
+        .where(PriceSnapshot.site_id == site_id, PriceSnapshot.name.is_not(None))
+        .group_by(PriceSnapshot.competitor_sku, PriceSnapshot.competitor_barcode)
+        .subquery()
+    )
+    stmt = (
+        select(PriceSnapshot.competitor_sku, PriceSnapshot.competitor_barcode, PriceSnapshot.name, PriceSnapshot.url)
+        .join(last, and_(
+            PriceSnapshot.site_id == site_id,
+            PriceSnapshot.ts == last.c.ts,
+            func.coalesce(PriceSnapshot.competitor_sku, "") == func.coalesce(last.c.k_sku, ""),
+            func.coalesce(PriceSnapshot.competitor_barcode, "") == func.coalesce(last.c.k_bar, ""),
+        ))
+    )
+    for sku, bar, name, url in session.execute(stmt).all():
+        if name and name != "N/A":
+            rows[("snap", sku, bar)] = {"sku": sku, "barcode": bar, "name": name, "url": url, "source": "snapshot"}
+    for sku, name, url in session.execute(
+        select(CompetitorCatalogItem.competitor_sku, CompetitorCatalogItem.name, CompetitorCatalogItem.url)
+        .where(CompetitorCatalogItem.site_id == site_id, CompetitorCatalogItem.name.is_not(None))
+    ).all():
+        rows.setdefault(("cat", url), {"sku": sku, "barcode": None, "name": name, "url": url, "source": "catalog"})
+    return list(rows.values())
+
+
+def suggest(session, site_id: int, top: int = 3, min_score: float = 0.45,
+            product_ids: Optional[List[int]] = None) -> List[Suggestion]:
+    """Scored candidates for unmatched products of one site (no network)."""
+    if np is None or sparse is None:
+        raise FuzzyUnavailable("offline fuzzy matching needs numpy and scipy (pip install numpy scipy)")
+
+    t0 = time.perf_counter()
+    products = _product_rows(session, site_id, product_ids)
+    competitors = _competitor_rows(session, site_id)
+    if not products or not competitors:
+        return []
+
+    p_docs = [char_ngrams(normalize(f"{brand or ''} {name or ''} {item or ''}")) for _, _, name, brand, item in products]
+    c_docs = [char_ngrams(normalize(c["name"])) for c in competitors]
+    vec = NgramTfidf().fit(p_docs + c_docs)
+    a = vec.transform(p_docs)
+    b = vec.transform(c_docs)
+    t_vec = time.perf_counter() - t0
+
+    out: List[Suggestion] = []
+    for i, j, score in top_k(a, b, max(1, int(top)), float(min_score)):
+        pid, psku, pname, _, _ = products[i]
+        c = competitors[j]
+        out.append(Suggestion(
+            product_id=pid,
+            product_sku=psku,
+            product_name=pname,
+            competitor_sku=c["sku"],
+            competitor_barcode=c["barcode"],
+            competitor_name=c["name"],
+            competitor_url=c["url"],
+            source=c["source"],
+            score=round(score, 4),
+        ))
+    logger.info(
+        "fuzzy_match: site_id=%s products=%d competitors=%d vocab=%d suggestions=%d vectorize=%.1fs total=%.1fs",
+        site_id, len(products), len(competitors), len(vec.vocab), len(out), t_vec, time.perf_counter() - t0,
+    )
+    return out
+
@@ -0,0 +1,129 @@
+# -*- coding: utf-8 -*-
+"""
+Barcode normalisation to GTIN-14 and an in-memory GTIN -> product index.
+
+EAN-8, UPC-A (12), EAN-13 and GTIN-14 spellings of one article, with or
+without leading zeros, all map to the same zero-padded 14-digit GTIN.
+Anything else (other lengths, letters, a wrong check digit) is not a GTIN:
+a "corrected" typo would join unrelated articles (GTIN siblings share
+competitor matches). Products store the result in `products.gtin14` (set on
+ERP import, backfilled / corrected on startup); `gtin_index` answers "which
+products have this GTIN" from memory.
+"""
+from __future__ import annotations
+
+import os
+import re
+import time
+import threading
+from typing import Dict, List, Optional
+
+from sqlalchemy import or_, select, update
+
+from app.models import Product
+
+GTIN_INDEX_TTL = float(os.getenv("GTIN_INDEX_TTL_SECONDS", "600"))
+GTIN_LENGTHS = (8, 12, 13, 14)
+_SEPARATORS = re.compile(r"[\s\-]")
+_ASCII_DIGITS = re.compile(r"[0-9]+")
+
+
+def check_digit(body: str) -> int:
+    """GS1 mod-10 check digit for the digits before it."""
+    total = sum(int(d) * (3 if i % 2 == 0 else 1) for i, d in enumerate(reversed(body)))
+    return (10 - total % 10) % 10
+
+
+def is_valid(code: str) -> bool:
+    return len(code) >= 2 and _ASCII_DIGITS.fullmatch(code) is not None and check_digit(code[:-1]) == int(code[-1])
+
+
+def to_gtin14(raw: Optional[str]) -> Optional[str]:
+    """
+    Normalise a barcode to GTIN-14, or None unless it is an EAN-8 / UPC-A /
+    EAN-13 / GTIN-14 with a valid check digit (spaces and dashes are ignored).
+    """
+    if not raw:
+        return None
+    code = _SEPARATORS.sub("", str(raw))
+    if not _ASCII_DIGITS.fullmatch(code):
+        return None
+    if len(code) > 14:
+        code = code.lstrip("0")
+    if len(code) not in GTIN_LENGTHS or not code.strip("0") or not is_valid(code):
+        return None
+    return code.zfill(14)
+
+
+def gtin_query(q: Optional[str]) -> Optional[str]:
+    """GTIN-14 of a search text that is exactly a barcode (8/12/13/14 digits, valid check digit), else None."""
+    code = (q or "").strip()
+    if len(code) not in GTIN_LENGTHS or not _ASCII_DIGITS.fullmatch(code):
+        return None
+    return to_gtin14(code)
+
+
+def backfill_gtin14(session, chunk: int = 1000) -> int:
+    """
+    Fill products.gtin14 from the barcode where it is empty (after upgrade) or
+    differs from to_gtin14 (values stored by older normalisation rules).
+    """
+    done = 0
+    last_id = 0
+    while True:
+        rows = session.execute(
+            select(Product.id, Product.barcode, Product.gtin14)
+            .where(Product.id > last_id, or_(Product.barcode.is_not(None), Product.gtin14.is_not(None)))
+            .order_by(Product.id.asc())
+            .limit(chunk)
+        ).all()
+        if not rows:
+            break
+        for pid, barcode, stored in rows:
+            g = to_gtin14(barcode)
+            if g != stored:
+                session.execute(update(Product).where(Product.id == pid).values(gtin14=g))
+                done += 1
+        session.commit()
+        last_id = rows[-1][0]
+    if done:
+        gtin_index.invalidate()
+    return done
+
+
+class GtinIndex:
+    """GTIN-14 -> product ids, rebuilt from products.gtin14 when invalidated or older than the TTL."""
+
+    def __init__(self, ttl: float = GTIN_INDEX_TTL):
+        self.ttl = ttl
+        self._map: Dict[str, List[int]] = {}
+        self._built_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = None
+
+    def _ensure(self, session):
+        with self._lock:
+            if self._built_at is not None and time.monotonic() - self._built_at < self.ttl:
+                return
+        m: Dict[str, List[int]] = {}
+        for pid, g in session.execute(select(Product.id, Product.gtin14).where(Product.gtin14.is_not(None))).all():
+            m.setdefault(g, []).append(pid)
+        with self._lock:
+            self._map = m
+            self._built_at = time.monotonic()
+
+    def product_ids(self, session, barcode: Optional[str]) -> List[int]:
+        g = to_gtin14(barcode)
+        if not g:
+            return []
+        self._ensure(session)
+        return list(self._map.get(g, ()))
+
+    def size(self) -> int:
+        return len(self._map)
+
+
+gtin_index = GtinIndex()
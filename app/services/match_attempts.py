@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+Negative-result cache for auto-matching.
+
+Every search made by auto-match is recorded in `match_attempts` per
+(product, site, method) together with the searched value. A "not found"
+is not retried before its backoff expires (AUTO_MATCH_BACKOFF_DAYS, default
+1,3,7,30 days after the 1st, 2nd, 3rd, 4th+ miss). When the product's
+barcode / item_number changes, the stored value no longer equals the query
+and the product is searched again immediately.
+"""
+from __future__ import annotations
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import select
+
+from app.models import MatchAttempt
+
+BACKOFF_DAYS: List[float] = [
+    float(x) for x in os.getenv("AUTO_MATCH_BACKOFF_DAYS", "1,3,7,30").split(",") if x.strip()
+] or [1.0]
+
+
+def backoff_for(failures: int) -> timedelta:
+    """Delay before the next search after `failures` consecutive misses (>= 1)."""
+    idx = min(max(failures, 1), len(BACKOFF_DAYS)) - 1
+    return timedelta(days=BACKOFF_DAYS[idx])
+
+
+class AttemptLog:
+    """
+    Attempts of one site for a batch of products, loaded in one query.
+    `due()` answers from memory; `record()` stages inserts/updates on the
+    caller's session (committed together with the batch's new matches).
+    """
+
+    def __init__(self, session, site_id: int, product_ids: Iterable[int], respect_backoff: bool = True):
+        self.session = session
+        self.site_id = site_id
+        self.respect_backoff = respect_backoff
+        self.now = datetime.utcnow()
+        ids = list(product_ids)
+        self._rows: Dict[Tuple[int, str], MatchAttempt] = {}
+        if ids:
+            for a in session.execute(
+                select(MatchAttempt).where(MatchAttempt.site_id == site_id, MatchAttempt.product_id.in_(ids))
+            ).scalars():
+                self._rows[(a.product_id, a.method)] = a
+
+    def due(self, product_id: int, method: str, query: Optional[str]) -> bool:
+        if not self.respect_backoff:
+            return True
+        a = self._rows.get((product_id, method))
+        if a is None or a.outcome != "not_found" or a.query != query:
+            return True
+        return a.next_attempt_at is None or a.next_attempt_at <= self.now
+
+    def is_backed_off(self, product_id: int, queries: Dict[str, Optional[str]]) -> bool:
+        """True when every searchable method of the product is still in backoff."""
+        methods = [(m, q) for m, q in queries.items() if q]
+        return bool(methods) and not any(self.due(product_id, m, q) for m, q in methods)
+
+    def record(self, product_id: int, method: str, query: Optional[str], found: bool):
+        a = self._rows.get((product_id, method))
+        if a is None:
+            a = MatchAttempt(product_id=product_id, site_id=self.site_id, method=method, failures=0)
+            self.session.add(a)
+            self._rows[(product_id, method)] = a
+        elif a.query != query:
+            a.failures = 0  # barcode / item_number changed: start the schedule over
+        a.query = query
+        a.attempted_at = self.now
+        if found:
+            a.outcome = "found"
+            a.failures = 0
+            a.next_attempt_at = None
+        else:
+            a.outcome = "not_found"
+            a.failures = (a.failures or 0) + 1
+            a.next_attempt_at = self.now + backoff_for(a.failures)
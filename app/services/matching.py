@@ -7,8 +7,10 @@ from datetime import datetime
 from sqlalchemy import select, func, and_, exists
 
 from app.models import Product, Match, CompetitorSite, PriceSnapshot, ProductTag
-from app.schemas import MatchOut, MatchCreate
+from app.schemas import MatchOut, MatchCreate, MatchSuggestionConfirm
 from app.scrapers.base import BaseScraper, SearchResult
+from app.services.match_attempts import AttemptLog
+from app.services.gtin import to_gtin14, gtin_index
 
 
 def list_products_simple(session, page: int, page_size: int, q: Optional[str], tag_id: Optional[int] = None) -> List[Product]:
@@ -72,6 +74,8 @@ def create_or_update_match(session, payload: MatchCreate) -> MatchOut:
         raise ValueError("Product not found")
 
     if m:
+        if (m.competitor_sku, m.competitor_barcode) != (payload.competitor_sku, payload.competitor_barcode):
+            m.pdp_url = None  # keys changed: the learned PDP belongs to the old product
         m.competitor_sku = payload.competitor_sku
         m.competitor_barcode = payload.competitor_barcode
         m.updated_at = datetime.utcnow()
@@ -91,12 +95,84 @@ def create_or_update_match(session, payload: MatchCreate) -> MatchOut:
         competitor_name=None, competitor_url=None
     )
 
-async def auto_match_for_site(session, scraper: BaseScraper, limit: Optional[int] = None) -> Tuple[int, int]:
+class UnresolvableSuggestion(ValueError):
+    """The suggestion carries nothing a later scrape could find the competitor product by."""
+
+
+def confirm_suggestion(session, payload: MatchSuggestionConfirm, scraper: Optional[BaseScraper] = None) -> MatchOut:
+    """
+    Accept a fuzzy-match suggestion. Key = competitor SKU, else competitor barcode;
+    a product-page URL is kept as pdp_url. A suggestion with neither key is only
+    accepted with a PDP URL of the site (our own EAN would be a dead key on
+    sites that search by SKU).
+    """
+    comp_sku = (payload.competitor_sku or "").strip() or None
+    comp_bar = (payload.competitor_barcode or "").strip() or None
+    url = (payload.competitor_url or "").strip() or None
+    is_pdp = bool(url) and (scraper.is_pdp_url(url) if scraper is not None else False)
+    if not comp_sku and not comp_bar and not is_pdp:
+        raise UnresolvableSuggestion("suggestion has no competitor SKU, barcode or product URL to scrape by")
+    out = create_or_update_match(session, MatchCreate(
+        product_id=payload.product_id,
+        site_code=payload.site_code,
+        competitor_sku=comp_sku,
+        competitor_barcode=comp_bar,
+    ))
+    if url and (scraper is None or is_pdp):
+        m = session.get(Match, out.id)
+        m.pdp_url = url
+        session.commit()
+    out.competitor_url = url
+    return out
+
+def _gtin_siblings(session, site_id: int, products: List[Product]) -> Dict[int, Match]:
+    """
+    product id -> existing match of this site on another product with the same GTIN-14
+    (resolved through the in-memory GTIN index; one query per 1000 sibling ids).
+    """
+    by_gtin: Dict[str, List[int]] = {}
+    for p in products:
+        g = p.gtin14 or to_gtin14(p.barcode)
+        if g:
+            by_gtin.setdefault(g, []).append(p.id)
+    if not by_gtin:
+        return {}
+    sibling_of: Dict[int, str] = {}
+    for g in by_gtin:
+        for pid in gtin_index.product_ids(session, g):
+            sibling_of[pid] = g
+    ids = list(sibling_of)
+    match_by_gtin: Dict[str, Match] = {}
+    for i in range(0, len(ids), 1000):
+        for m in session.execute(
+            select(Match).where(Match.site_id == site_id, Match.product_id.in_(ids[i:i + 1000]))
+        ).scalars():
+            match_by_gtin.setdefault(sibling_of[m.product_id], m)
+    return {pid: match_by_gtin[g] for g, pids in by_gtin.items() if g in match_by_gtin for pid in pids}
+
+def _search_queries(site_code: str, prod: Product) -> Dict[str, Optional[str]]:
+    """Search value per auto-match method (what match_attempts remembers)."""
+    queries: Dict[str, Optional[str]] = {"barcode": (prod.barcode or "").strip() or None}
+    if site_code == "mashinibg":
+        item_no = (prod.item_number or "").strip() or None
+        brand = (prod.brand or "").strip() or None
+        queries["item_number"] = (item_no if not brand else f"{item_no} {brand}") if item_no else None
+    return queries
+
+# Per-site progress of running / finished auto-match runs (read by /matches/auto_all/progress)
+AUTO_PROGRESS: Dict[str, Dict[str, Any]] = {}
+
+def _report_progress(site_code: str, **fields):
+    AUTO_PROGRESS.setdefault(site_code, {}).update(fields, updated_at=datetime.utcnow().isoformat())
+
+async def auto_match_for_site(session, scraper: BaseScraper, limit: Optional[int] = None,
+                              global_sem: Optional[asyncio.Semaphore] = None) -> Tuple[int, int]:
     """
     Auto-match using each scraper's own lightweight search logic.
     - OnlineMashini: prefer item_number (+brand), fallback to barcode; if no SKU is discoverable, store our item_number as competitor_sku.
     - Others: prefer barcode.
     Runs lookups concurrently; DB writes happen in batches.
+    `global_sem` (optional) caps lookups across several sites running at once.
     """
     site = get_site(session, scraper.site_code)
 
@@ -107,42 +183,50 @@ async def auto_match_for_site(session, scraper: BaseScraper, limit: Optional[int
 
     attempted = 0
     found = 0
-    tried_ids: Set[int] = set()
+    skipped = 0
+    by_gtin = 0
+    last_id: Optional[int] = None   # keyset cursor: next batch continues below this id
     cache: Dict[tuple, Optional[SearchResult]] = {}
 
     t0 = time.perf_counter()
     print(f"[AUTO] Start: site={scraper.site_code} limit={limit} batch={BATCH} par={PAR}")
+    _report_progress(scraper.site_code, state="running", attempted=0, found=0, backed_off=0, elapsed_s=0.0)
 
-    async def resolve(prod: Product) -> Optional[SearchResult]:
-        """Use per-site locating strategy; cache repeated keys inside this run."""
+    async def resolve(prod: Product, attempts: AttemptLog) -> Optional[SearchResult]:
+        """Use per-site locating strategy; cache repeated keys inside this run; skip backed-off misses."""
         async def by_item_number():
             item_no = (prod.item_number or "").strip() or None
             brand   = (prod.brand or "").strip() or None
             if not item_no:
                 return None
+            query = _search_queries(scraper.site_code, prod)["item_number"]
+            if not attempts.due(prod.id, "item_number", query):
+                return None
             key = (scraper.site_code, "item_number", item_no.lower(), (brand or "").lower())
-            if key in cache:
-                return cache[key]
-            try:
-                r = await scraper.search_by_item_number(item_no, brand=brand)  # Mashini implements this
-            except Exception:
-                r = None
-            cache[key] = r
-            return r
+            if key not in cache:
+                try:
+                    r = await scraper.search_by_item_number(item_no, brand=brand)  # Mashini implements this
+                except Exception:
+                    return None  # transient error: not recorded, retried next run
+                cache[key] = r
+            attempts.record(prod.id, "item_number", query, cache[key] is not None)
+            return cache[key]
 
         async def by_barcode():
             code = (prod.barcode or "").strip() or None
             if not code:
                 return None
-            key = (scraper.site_code, "barcode", code)
-            if key in cache:
-                return cache[key]
-            try:
-                r = await scraper.search_by_barcode(code)  # Praktiker/MrB/Mashini implement this
-            except Exception:
-                r = None
-            cache[key] = r
-            return r
+            if not attempts.due(prod.id, "barcode", code):
+                return None
+            key = (scraper.site_code, "barcode", to_gtin14(code) or code)  # one search per GTIN, any spelling
+            if key not in cache:
+                try:
+                    r = await scraper.search_by_barcode(code)  # Praktiker/MrB/Mashini implement this
+                except Exception:
+                    return None  # transient error: not recorded, retried next run
+                cache[key] = r
+            attempts.record(prod.id, "barcode", code, cache[key] is not None)
+            return cache[key]
 
         # Site-specific preference
         if scraper.site_code == "mashinibg":
@@ -155,31 +239,50 @@ async def auto_match_for_site(session, scraper: BaseScraper, limit: Optional[int
         if batch_cap == 0:
             break
 
-        # Unmatched for this site
-        sub = select(Match.product_id).where(Match.site_id == site.id)
-        stmt = (
-            select(Product)
-            .where(Product.id.not_in(sub))
-            .order_by(Product.id.desc())
+        # Unmatched for this site: keyset cursor on Product.id (desc) + NOT EXISTS anti-join,
+        # so every batch is the same small statement no matter how far the run is
+        has_match = (
+            select(Match.id)
+            .where(Match.product_id == Product.id, Match.site_id == site.id)
         )
-        if tried_ids:
-            stmt = stmt.where(~Product.id.in_(tried_ids))
-        stmt = stmt.limit(batch_cap)
+        stmt = select(Product).where(~exists(has_match))
+        if last_id is not None:
+            stmt = stmt.where(Product.id < last_id)
+        stmt = stmt.order_by(Product.id.desc()).limit(batch_cap)
 
         products = session.execute(stmt).scalars().all()
         if not products:
             print(f"[AUTO] No more unmatched rows for site={scraper.site_code}")
             break
 
-        for p in products:
-            tried_ids.add(p.id)
+        last_id = products[-1].id
+
+        # Not found recently (and keys unchanged): wait for the backoff to expire
+        attempts = AttemptLog(session, site.id, [p.id for p in products])
+        due = [p for p in products if not attempts.is_backed_off(p.id, _search_queries(scraper.site_code, p))]
+        skipped += len(products) - len(due)
+
+        # Same GTIN already matched on another product: reuse its competitor key, no search
+        siblings = _gtin_siblings(session, site.id, due)
+        for p in due:
+            src = siblings.get(p.id)
+            if src is not None:
+                session.add(Match(product_id=p.id, site_id=site.id, competitor_sku=src.competitor_sku,
+                                  competitor_barcode=src.competitor_barcode, pdp_url=src.pdp_url))
+                attempted += 1
+                found += 1
+                by_gtin += 1
+        due = [p for p in due if p.id not in siblings]
 
         sem = asyncio.Semaphore(PAR)
         async def pooled(p: Product):
             async with sem:
-                return p, await resolve(p)
+                if global_sem is None:
+                    return p, await resolve(p, attempts)
+                async with global_sem:
+                    return p, await resolve(p, attempts)
 
-        results = await asyncio.gather(*(pooled(p) for p in products))
+        results = await asyncio.gather(*(pooled(p) for p in due))
         before_found = found
 
         for p, sres in results:
@@ -208,15 +311,18 @@ async def auto_match_for_site(session, scraper: BaseScraper, limit: Optional[int
                     site_id=site.id,
                     competitor_sku=comp_sku,
                     competitor_barcode=comp_bar,
+                    pdp_url=sres.url if scraper.is_pdp_url(sres.url) else None,
                 ))
                 found += 1
 
         session.commit()
         elapsed = time.perf_counter() - t0
+        _report_progress(scraper.site_code, attempted=attempted, found=found, backed_off=skipped,
+                         elapsed_s=round(elapsed, 1))
         print(
             f"[AUTO] Batch committed: site={scraper.site_code} "
             f"processed={attempted} new_matches={found - before_found} "
-            f"batch_size={len(products)} elapsed={elapsed:.1f}s "
+            f"batch_size={len(products)} backed_off={len(products) - len(due)} elapsed={elapsed:.1f}s "
             f"remaining={'∞' if to_process is None else max(0, to_process - attempted)}"
         )
 
@@ -224,7 +330,10 @@ async def auto_match_for_site(session, scraper: BaseScraper, limit: Optional[int
             break
 
     total = time.perf_counter() - t0
-    print(f"[AUTO] Finished: site={scraper.site_code} attempted={attempted} found={found} elapsed={total:.1f}s")
+    _report_progress(scraper.site_code, state="done", attempted=attempted, found=found, backed_off=skipped,
+                     elapsed_s=round(total, 1))
+    print(f"[AUTO] Finished: site={scraper.site_code} attempted={attempted} found={found} "
+          f"backed_off={skipped} by_gtin={by_gtin} elapsed={total:.1f}s")
     return attempted, found
 
 
@@ -272,46 +381,65 @@ async def auto_match_for_products(session, scraper: BaseScraper, product_ids: Li
     t0 = time.perf_counter()
     print(f"[AUTO_PAGE] Start: site={scraper.site_code} count={len(products)}")
 
-    async def resolve(prod: Product) -> Optional[SearchResult]:
+    async def resolve(prod: Product, attempts: AttemptLog) -> Optional[SearchResult]:
         async def by_item_number():
             item_no = (prod.item_number or "").strip() or None
             brand   = (prod.brand or "").strip() or None
             if not item_no:
                 return None
+            query = _search_queries(scraper.site_code, prod)["item_number"]
+            if not attempts.due(prod.id, "item_number", query):
+                return None
             key = (scraper.site_code, "item_number", item_no.lower(), (brand or "").lower())
-            if key in cache:
-                return cache[key]
-            try:
-                r = await scraper.search_by_item_number(item_no, brand=brand)
-            except Exception:
-                r = None
-            cache[key] = r
-            return r
+            if key not in cache:
+                try:
+                    r = await scraper.search_by_item_number(item_no, brand=brand)
+                except Exception:
+                    return None  # transient error: not recorded, retried next run
+                cache[key] = r
+            attempts.record(prod.id, "item_number", query, cache[key] is not None)
+            return cache[key]
 
         async def by_barcode():
             code = (prod.barcode or "").strip() or None
             if not code:
                 return None
-            key = (scraper.site_code, "barcode", code)
-            if key in cache:
-                return cache[key]
-            try:
-                r = await scraper.search_by_barcode(code)
-            except Exception:
-                r = None
-            cache[key] = r
-            return r
+            if not attempts.due(prod.id, "barcode", code):
+                return None
+            key = (scraper.site_code, "barcode", to_gtin14(code) or code)  # one search per GTIN, any spelling
+            if key not in cache:
+                try:
+                    r = await scraper.search_by_barcode(code)
+                except Exception:
+                    return None  # transient error: not recorded, retried next run
+                cache[key] = r
+            attempts.record(prod.id, "barcode", code, cache[key] is not None)
+            return cache[key]
 
         if scraper.site_code == "mashinibg":
             return (await by_item_number()) or (await by_barcode())
         else:
             return await by_barcode()
 
+    # Same GTIN already matched on another product: reuse its competitor key, no search
+    siblings = _gtin_siblings(session, site.id, products)
+    for p in products:
+        src = siblings.get(p.id)
+        if src is not None:
+            session.add(Match(product_id=p.id, site_id=site.id, competitor_sku=src.competitor_sku,
+                              competitor_barcode=src.competitor_barcode, pdp_url=src.pdp_url))
+            attempted += 1
+            found += 1
+    products = [p for p in products if p.id not in siblings]
+
+    # Explicit request from the UI: search even inside the backoff window, but record outcomes
+    attempts = AttemptLog(session, site.id, [p.id for p in products], respect_backoff=False)
+
     sem = asyncio.Semaphore(PAR)
 
     async def pooled(p: Product):
         async with sem:
-            return p, await resolve(p)
+            return p, await resolve(p, attempts)
 
     results = await asyncio.gather(*(pooled(p) for p in products))
 
@@ -338,6 +466,7 @@ async def auto_match_for_products(session, scraper: BaseScraper, product_ids: Li
                 site_id=site.id,
                 competitor_sku=comp_sku,
                 competitor_barcode=comp_bar,
+                pdp_url=sres.url if scraper.is_pdp_url(sres.url) else None,
             ))
             found += 1
 
@@ -363,13 +492,19 @@ def get_matches_for_product_ids(session, site_code: str, product_ids: List[int])
         .where(Match.site_id == site.id, Match.product_id.in_(product_ids))
     ).subquery()
 
+    # keys on this page only: the group-bys below touch just these keys' snapshots
+    # (index seeks on competitor_sku / competitor_barcode), not the site's whole history
+    page_matches = select(Match).where(Match.site_id == site.id, Match.product_id.in_(product_ids)).subquery()
+    page_skus = select(page_matches.c.competitor_sku).where(page_matches.c.competitor_sku.is_not(None))
+    page_bars = select(page_matches.c.competitor_barcode).where(page_matches.c.competitor_barcode.is_not(None))
+
     # latest-by-sku and latest-by-barcode subqueries
     latest_by_sku = (
         select(
             PriceSnapshot.competitor_sku.label("key_sku"),
             func.max(PriceSnapshot.ts).label("max_ts")
         )
-        .where(PriceSnapshot.site_id == site.id, PriceSnapshot.competitor_sku.is_not(None))
+        .where(PriceSnapshot.site_id == site.id, PriceSnapshot.competitor_sku.in_(page_skus))
         .group_by(PriceSnapshot.competitor_sku)
         .subquery()
     )
@@ -378,7 +513,7 @@ def get_matches_for_product_ids(session, site_code: str, product_ids: List[int])
             PriceSnapshot.competitor_barcode.label("key_bar"),
             func.max(PriceSnapshot.ts).label("max_ts")
         )
-        .where(PriceSnapshot.site_id == site.id, PriceSnapshot.competitor_barcode.is_not(None))
+        .where(PriceSnapshot.site_id == site.id, PriceSnapshot.competitor_barcode.in_(page_bars))
         .group_by(PriceSnapshot.competitor_barcode)
         .subquery()
     )
@@ -0,0 +1,436 @@
+# -*- coding: utf-8 -*-
+"""
+SKU list extraction from uploaded Excel / CSV / TSV files.
+
+The SKU column is found by its header (first 20 rows, see SKU_HEADER_KEYWORDS)
+and only that column is read:
+
+  - .xlsx: the sheet XML is streamed straight from the zip; the header rows
+    go through expat, the rest through a regex that only matches cells of the
+    SKU column. A sheet without a header in its first 20 rows is abandoned
+    there, and only the shared strings actually referenced are resolved
+    (sharedStrings.xml is streamed up to the highest index needed). Anything
+    unusual falls back to openpyxl (read_only).
+  - .csv / .tsv / .txt: csv module, delimiter sniffed, UTF-8 or Windows-1251.
+
+All of this is CPU/IO work: endpoints call it via asyncio.to_thread.
+"""
+from __future__ import annotations
+
+import io
+import re
+import csv
+import html
+import logging
+import zipfile
+import posixpath
+from typing import BinaryIO, Dict, List, Optional, Set, Tuple, Union
+from xml.etree import ElementTree as ET
+from xml.parsers import expat
+
+logger = logging.getLogger(__name__)
+
+HEADER_SCAN_ROWS = 20
+CSV_EXTENSIONS = (".csv", ".tsv", ".txt")
+EXCEL_EXTENSIONS = (".xlsx", ".xls")
+
+# Names / fragments for the SKU column header
+SKU_HEADER_KEYWORDS = (
+    # Bulgarian variants
+    "код",              # "Код"
+    "ску",              # "Ску"
+    "код на zeron",
+    "код в zeron",
+    "код zeron",
+    "ков зерон",        # typo: "Ков Зерон"
+    # English variants
+    "sku",
+    "skus",
+    "codes",
+)
+
+NO_SKU_COLUMN = (
+    "Не успях да намеря колона със SKU. Очаквам заглавие като "
+    '"Код", "Код в Zeron", "Код на Зерон", "Sku", "Skus", "Codes" и т.н.'
+)
+
+_NS = "{http://schemas.openxmlformats.org/spreadsheetml/2006/main}"
+_REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+_PKG_REL_NS = "{http://schemas.openxmlformats.org/package/2006/relationships}"
+_COL_RE = re.compile(r"[A-Z]+")
+_READ_SIZE = 1 << 20
+_SI_RE = re.compile(rb"<(?:\w+:)?si(?:\s[^>]*)?(?:/>|>(.*?)</(?:\w+:)?si>)", re.S)
+_RPH_RE = re.compile(rb"<(?:\w+:)?rPh\b.*?</(?:\w+:)?rPh>", re.S)
+_T_ATTR_RE = re.compile(rb'\bt="(\w+)"')
+_V_TEXT_RE = re.compile(rb"<(?:\w+:)?v>(.*?)</(?:\w+:)?v>", re.S)
+_T_TEXT_RE = re.compile(rb"<(?:\w+:)?t(?:\s[^>]*)?>(.*?)</(?:\w+:)?t>", re.S)
+
+
+# ---------- header / cell helpers ----------
+def _normalize_header(value: str) -> str:
+    if value is None:
+        return ""
+    s = str(value).strip().lower()
+    while "  " in s:
+        s = s.replace("  ", " ")
+    return s
+
+
+def _is_sku_header_cell(text: str) -> bool:
+    if not text:
+        return False
+    norm = _normalize_header(text)
+
+    # exact simple names
+    if norm in ("код", "ску", "sku", "skus", "codes"):
+        return True
+
+    for kw in SKU_HEADER_KEYWORDS:
+        if kw in norm:
+            return True
+    return False
+
+
+def _normalize_sku_cell(value) -> Optional[str]:
+    if value is None:
+        return None
+    # Numeric cells (e.g. 35566672 or 35566672.0)
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and value.is_integer():
+            return str(int(value))
+        return str(value).strip()
+    s = str(value).strip()
+    if not s:
+        return None
+    # Excel-ish "35566672.0"
+    if s.endswith(".0") and s[:-2].isdigit():
+        return s[:-2]
+    return s
+
+
+def _numeric(v: str):
+    """<v> of a numeric cell -> int/float like openpyxl gives it."""
+    try:
+        return int(v)
+    except ValueError:
+        try:
+            return float(v)
+        except ValueError:
+            return v
+
+
+def _col_index(ref: str) -> int:
+    n = 0
+    for ch in _COL_RE.match(ref).group(0):
+        n = n * 26 + (ord(ch) - 64)
+    return n
+
+
+def _col_letters(n: int) -> str:
+    s = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+class _Unsupported(Exception):
+    """xlsx layout the fast reader does not handle: use openpyxl."""
+
+
+# ---------- xlsx fast reader ----------
+def _sheet_paths(zf: zipfile.ZipFile) -> List[str]:
+    wb = ET.fromstring(zf.read("xl/workbook.xml"))
+    rels = ET.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    targets = {r.get("Id"): r.get("Target") for r in rels.iter(f"{_PKG_REL_NS}Relationship")}
+    paths = []
+    for sh in wb.iter(f"{_NS}sheet"):
+        target = targets.get(sh.get(f"{_REL_NS}id"))
+        if not target:
+            continue
+        paths.append(target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target)))
+    return paths
+
+
+def _cell_value(t: Optional[str], v: str, ss: Dict[int, str]):
+    """Raw cell text (<v> or inline <t>) -> value like openpyxl gives it."""
+    if t == "s":
+        return ss.get(int(v)) if v else None
+    if t in ("inlineStr", "str", "e", "d"):
+        return v
+    if not v:
+        return None
+    if t == "b":
+        return v == "1"
+    return _numeric(v)
+
+
+def _shared_strings(zf: zipfile.ZipFile, wanted: Set[int]) -> Dict[int, str]:
+    """Only the wanted shared strings; stops after the highest wanted index."""
+    out: Dict[int, str] = {}
+    if not wanted:
+        return out
+    try:
+        f = zf.open("xl/sharedStrings.xml")
+    except KeyError:
+        raise _Unsupported("sharedStrings.xml missing")
+    last = max(wanted)
+    with f:
+        i = -1
+        data = b""
+        more = True
+        while more:
+            chunk = f.read(_READ_SIZE)
+            more = bool(chunk)
+            data += chunk
+            cut = data.rfind(b"</si>") + 5 if more else len(data)
+            if cut < 5:
+                continue
+            for body in _SI_RE.findall(data, 0, cut):
+                i += 1
+                if i in wanted:
+                    if b"rPh" in body:
+                        body = _RPH_RE.sub(b"", body)  # phonetic runs are not cell text
+                    out[i] = html.unescape(b"".join(_T_TEXT_RE.findall(body)).decode("utf-8"))
+                if i >= last:
+                    return out
+            data = data[cut:]
+    return out
+
+
+class _HeaderFound(Exception):
+    """Header scan done: the data rows start at this byte offset of the sheet XML."""
+
+
+class _SheetScan:
+    """
+    Header phase: expat over the first HEADER_SCAN_ROWS rows (all cells kept)
+    to find the SKU column; without one the sheet is abandoned there.
+
+    Data phase: the rest of the sheet XML is scanned with one compiled regex
+    that only matches cells whose "r" attribute is in the SKU column, so other
+    cells never reach Python. It expects "r" as the first attribute of every
+    cell, as Excel and openpyxl write it; other layouts are left to the
+    openpyxl fallback.
+    """
+
+    def __init__(self, zf: zipfile.ZipFile, path: str):
+        self.zf = zf
+        self.path = path
+        self.row_no = 0
+        self.head: List[Tuple[int, int, Optional[str], str]] = []  # (row, col, type, raw text)
+        self.cell: Optional[Tuple[int, Optional[str]]] = None     # (col, type) of the open cell
+        self.buf: List[str] = []
+
+    # ---- header phase (expat handlers) ----
+    def _start(self, tag, attrs):
+        tag = tag.rpartition(":")[2]
+        if tag == "c":
+            ref = attrs.get("r")
+            if not ref or next(iter(attrs)) != "r":
+                raise _Unsupported("cell without leading r attribute")
+            self.cell = (_col_index(ref), attrs.get("t"))
+            self.buf = []
+        elif tag in ("v", "t") and self.cell is not None:
+            self.parser.CharacterDataHandler = self.buf.append
+        elif tag == "row":
+            r = attrs.get("r")
+            self.row_no = int(r) if r else self.row_no + 1
+            if self.row_no > HEADER_SCAN_ROWS:
+                raise _HeaderFound(self.parser.CurrentByteIndex)
+
+    def _end(self, tag):
+        tag = tag.rpartition(":")[2]
+        if tag in ("v", "t"):
+            self.parser.CharacterDataHandler = None
+        elif tag == "c" and self.cell is not None:
+            col, t = self.cell
+            self.cell = None
+            self.head.append((self.row_no, col, t, "".join(self.buf)))
+
+    def _scan_header(self, f) -> Tuple[bytes, bool]:
+        """Returns (bytes read so far from the data offset on, whether more data follows)."""
+        self.parser = expat.ParserCreate()
+        self.parser.buffer_text = True
+        self.parser.StartElementHandler = self._start
+        self.parser.EndElementHandler = self._end
+        seen = b""
+        while True:
+            chunk = f.read(_READ_SIZE)
+            # CurrentByteIndex counts from the first byte fed: keep them (header rows only)
+            seen += chunk
+            try:
+                self.parser.Parse(chunk, not chunk)
+            except _HeaderFound as stop:
+                return seen[stop.args[0]:], True
+            if not chunk:
+                return b"", False
+
+    # ---- data phase ----
+    @staticmethod
+    def _cell_re(letters: str):
+        return re.compile(
+            rb'<(?:\w+:)?c r="' + letters.encode() + rb'\d+"([^>]*?)(?<!/)>(.*?)</(?:\w+:)?c>',
+            re.S,
+        )
+
+    def _scan_data(self, f, data: bytes, more: bool, letters: str) -> List[Tuple[Optional[str], str]]:
+        cell_re = self._cell_re(letters)
+        out: List[Tuple[Optional[str], str]] = []
+        while True:
+            if more:
+                chunk = f.read(_READ_SIZE)
+                more = bool(chunk)
+                data += chunk
+            cut = data.rfind(b"</row>") + 6 if more else len(data)
+            if cut > 5:
+                for attrs, body in cell_re.findall(data, 0, cut):
+                    t = _T_ATTR_RE.search(attrs) if b't="' in attrs else None
+                    t = t.group(1).decode() if t else None
+                    if t != "inlineStr" and body[:3] == b"<v>" and body[-4:] == b"</v>":
+                        value = body[3:-4]  # the usual <c r=".."><v>..</v></c>
+                    else:
+                        parts = _T_TEXT_RE.findall(body) if t == "inlineStr" else _V_TEXT_RE.findall(body)[:1]
+                        value = b"".join(parts)
+                    value = value.decode("utf-8")
+                    out.append((t, html.unescape(value) if "&" in value else value))
+                data = data[cut:]
+            if not more:
+                return out
+
+    def run(self) -> Optional[List[str]]:
+        with self.zf.open(self.path) as f:
+            rest, more = self._scan_header(f)
+
+            ss = _shared_strings(self.zf, {int(v) for _, _, t, v in self.head if t == "s" and v})
+            sku_col = header_row = None
+            for row_no, col, t, v in self.head:
+                text = _cell_value(t, v, ss)
+                if text is not None and _is_sku_header_cell(str(text).strip()):
+                    sku_col, header_row = col, row_no
+                    break
+            if sku_col is None:
+                return None  # early exit: the rest of the sheet is never read
+
+            raw = [(t, v) for row_no, col, t, v in self.head if row_no > header_row and col == sku_col]
+            if rest or more:
+                raw.extend(self._scan_data(f, rest, more, _col_letters(sku_col)))
+
+        ss = _shared_strings(self.zf, {int(v) for t, v in raw if t == "s" and v})
+        out = []
+        for t, v in raw:
+            sku = _normalize_sku_cell(_cell_value(t, v, ss))
+            if sku:
+                out.append(sku)
+        return out
+
+
+def _xlsx_skus(f: BinaryIO) -> List[str]:
+    with zipfile.ZipFile(f) as zf:
+        found: List[str] = []
+        for path in _sheet_paths(zf):
+            skus = _SheetScan(zf, path).run()
+            if skus:
+                found.extend(skus)
+        return found
+
+
+def _openpyxl_skus(f: BinaryIO) -> List[str]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(f, read_only=True, data_only=True)
+    found: List[str] = []
+    for sheet in wb.worksheets:
+        sku_col_idx: Optional[int] = None
+        header_row_idx: Optional[int] = None
+
+        # Search header row (first 20 rows max)
+        for row in sheet.iter_rows(min_row=1, max_row=HEADER_SCAN_ROWS):
+            for cell in row:
+                text = str(cell.value).strip() if cell.value is not None else ""
+                if _is_sku_header_cell(text):
+                    sku_col_idx = cell.column  # 1-based index
+                    header_row_idx = cell.row
+                    break
+            if sku_col_idx is not None:
+                break
+
+        if sku_col_idx is None or header_row_idx is None:
+            continue  # sheet without recognised header
+
+        # Data rows: the SKU column only
+        for (value,) in sheet.iter_rows(min_row=header_row_idx + 1, min_col=sku_col_idx,
+                                        max_col=sku_col_idx, values_only=True):
+            sku = _normalize_sku_cell(value)
+            if sku:
+                found.append(sku)
+    return found
+
+
+# ---------- csv / tsv ----------
+def _csv_skus(data: bytes) -> List[str]:
+    try:
+        text = data.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        text = data.decode("cp1251", errors="ignore")
+    sample = text[:64 * 1024]
+    try:
+        delimiter = csv.Sniffer().sniff(sample, delimiters="\t;,|").delimiter
+    except csv.Error:
+        delimiter = "\t" if "\t" in sample else ","
+    reader = csv.reader(io.StringIO(text), delimiter=delimiter)
+
+    sku_col: Optional[int] = None
+    for i, row in enumerate(reader):
+        if i >= HEADER_SCAN_ROWS:
+            break
+        for j, cell in enumerate(row):
+            if _is_sku_header_cell(cell.strip()):
+                sku_col = j
+                break
+        if sku_col is not None:
+            break
+    if sku_col is None:
+        return []
+
+    found: List[str] = []
+    for row in reader:
+        if len(row) > sku_col:
+            sku = _normalize_sku_cell(row[sku_col])
+            if sku:
+                found.append(sku)
+    return found
+
+
+# ---------- public ----------
+def extract_skus(source: Union[bytes, BinaryIO], filename: str = "") -> List[str]:
+    """
+    Unique SKUs (file order) from an Excel / CSV / TSV upload.
+    Raises ValueError when no sheet has a recognised SKU header.
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    source.seek(0)
+    name = (filename or "").lower()
+
+    if name.endswith(CSV_EXTENSIONS):
+        found = _csv_skus(source.read())
+    else:
+        try:
+            found = _xlsx_skus(source)
+            if not found:
+                raise _Unsupported("no SKU column found")  # let openpyxl have a look too
+        except (_Unsupported, KeyError, zipfile.BadZipFile, ET.ParseError, expat.ExpatError, ValueError, AttributeError) as e:
+            logger.info("sku_file: fast xlsx reader failed (%s), using openpyxl", e)
+            source.seek(0)
+            found = _openpyxl_skus(source)
+
+    skus: List[str] = []
+    seen: set[str] = set()
+    for sku in found:
+        if sku not in seen:
+            seen.add(sku)
+            skus.append(sku)
+    if not skus:
+        raise ValueError(NO_SKU_COLUMN)
+    return skus
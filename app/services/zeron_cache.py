@@ -0,0 +1,151 @@
+# -*- coding: utf-8 -*-
+"""
+SKU-level cache of parsed Zeron records.
+
+Excel imports, /erp/refresh_all and ad-hoc calls often ask Zeron for the same
+SKUs within minutes. zeron_client.fetch_chunks looks every SKU up here first
+and only requests the misses; what Zeron returns is stored per
+(namespace, sku) for ZERON_CACHE_TTL seconds (default 600, 0 disables).
+SKUs Zeron answered without data are cached too (as "no data"), SKUs of
+failed chunks are not.
+
+The namespace separates Zeron databases / storehouses / operations, so
+records parsed from one never answer a lookup for another.
+
+Storage is one small SQLite file (ZERON_CACHE_PATH), so the cache survives
+restarts and is shared by the app and cron scripts on the same machine.
+"""
+from __future__ import annotations
+
+import os
+import json
+import time
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+ZERON_CACHE_TTL = int(os.getenv("ZERON_CACHE_TTL", "600"))
+ZERON_CACHE_PATH = Path(os.getenv(
+    "ZERON_CACHE_PATH",
+    str(Path(__file__).resolve().parent.parent.parent / ".cache" / "zeron_cache.sqlite3"),
+))
+
+# SQLite's default limit of host parameters per statement is 999 on older builds
+_IN_CHUNK = 500
+
+
+class ZeronCache:
+    def __init__(self, path: Path, ttl: int):
+        self.path = Path(path)
+        self.ttl = int(ttl)
+        self._lock = threading.Lock()
+        self._ready = False
+        # cumulative since process start
+        self.lookups = 0
+        self.hits = 0
+        self.negative_hits = 0
+        self.forced = 0
+        self.stored = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0
+
+    # ---- storage helpers ----
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(str(self.path), timeout=30)
+
+    def _ensure(self):
+        if self._ready:
+            return
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as con:
+            con.execute("PRAGMA journal_mode=WAL")
+            con.execute(
+                "CREATE TABLE IF NOT EXISTS zeron_cache ("
+                " ns TEXT NOT NULL, sku TEXT NOT NULL, ts REAL NOT NULL, data TEXT NULL,"
+                " PRIMARY KEY (ns, sku)) WITHOUT ROWID"
+            )
+            con.execute("CREATE INDEX IF NOT EXISTS ix_zeron_cache_ts ON zeron_cache(ts)")
+        self._ready = True
+
+    # ---- public API ----
+    def get_many(self, ns: str, skus: List[str]) -> Dict[str, Optional[dict]]:
+        """Fresh entries for `skus`: sku -> record, or None for a cached "no data"."""
+        out: Dict[str, Optional[dict]] = {}
+        if not self.enabled or not skus:
+            return out
+        wanted = list(dict.fromkeys(skus))
+        min_ts = time.time() - self.ttl
+        with self._lock:
+            self._ensure()
+            with self._connect() as con:
+                for i in range(0, len(wanted), _IN_CHUNK):
+                    part = wanted[i:i + _IN_CHUNK]
+                    rows = con.execute(
+                        f"SELECT sku, data FROM zeron_cache WHERE ns = ? AND ts >= ?"
+                        f" AND sku IN ({', '.join('?' * len(part))})",
+                        (ns, min_ts, *part),
+                    ).fetchall()
+                    for sku, data in rows:
+                        out[sku] = json.loads(data) if data is not None else None
+            self.lookups += len(wanted)
+            self.hits += len(out)
+            self.negative_hits += sum(1 for v in out.values() if v is None)
+        return out
+
+    def put_many(self, ns: str, data: Dict[str, dict], no_data: Iterable[str] = ()):
+        """Store fetched records (and SKUs Zeron had no data for) with the current time."""
+        if not self.enabled:
+            return
+        now = time.time()
+        rows = [(ns, sku, now, json.dumps(rec, ensure_ascii=False, default=str)) for sku, rec in data.items()]
+        rows.extend((ns, sku, now, None) for sku in no_data)
+        if not rows:
+            return
+        with self._lock:
+            self._ensure()
+            with self._connect() as con:
+                con.executemany("INSERT OR REPLACE INTO zeron_cache(ns, sku, ts, data) VALUES (?, ?, ?, ?)", rows)
+                # expired rows are dead weight: drop them while we hold the file anyway
+                con.execute("DELETE FROM zeron_cache WHERE ts < ?", (now - self.ttl,))
+            self.stored += len(rows)
+
+    def clear(self, ns: Optional[str] = None) -> int:
+        with self._lock:
+            self._ensure()
+            with self._connect() as con:
+                if ns is None:
+                    cur = con.execute("DELETE FROM zeron_cache")
+                else:
+                    cur = con.execute("DELETE FROM zeron_cache WHERE ns = ?", (ns,))
+                return cur.rowcount
+
+    def stats(self) -> Dict[str, object]:
+        entries = fresh = 0
+        if self.enabled:
+            with self._lock:
+                self._ensure()
+                with self._connect() as con:
+                    entries, fresh = con.execute(
+                        "SELECT COUNT(*), COALESCE(SUM(CASE WHEN ts >= ? THEN 1 ELSE 0 END), 0) FROM zeron_cache",
+                        (time.time() - self.ttl,),
+                    ).fetchone()
+        return {
+            "enabled": self.enabled,
+            "ttl_s": self.ttl,
+            "path": str(self.path),
+            "entries": entries,
+            "fresh_entries": fresh,
+            "lookups": self.lookups,
+            "hits": self.hits,
+            "negative_hits": self.negative_hits,
+            "misses": self.lookups - self.hits,
+            "hit_rate": round(self.hits / self.lookups, 3) if self.lookups else None,
+            "forced_refreshes": self.forced,
+            "stored": self.stored,
+        }
+
+
+cache = ZeronCache(ZERON_CACHE_PATH, ZERON_CACHE_TTL)
@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+"""
+Async, bounded-parallel Zeron DataExchange client.
+
+SKUs are posted in chunks of ZERON_MAX_PER_REQUEST; up to ZERON_PARALLEL
+chunks are in flight at once over one pooled httpx connection pool. Each chunk
+is retried (ZERON_RETRIES, exponential backoff with jitter) on transport
+errors, 5xx and unparsable responses; a chunk that still fails is reported
+instead of failing the whole refresh.
+
+The request body and the response parser are passed in (see
+app.services.erp_importer), so the client knows nothing about the operation.
+
+With a cache namespace, SKUs still fresh in app.services.zeron_cache are
+answered from there and only the misses are requested (force_refresh skips
+the lookup and re-stores everything fetched).
+
+Local stand-in server for development/benchmarks: benchmarks/zeron_standin.py.
+"""
+from __future__ import annotations
+
+import os
+import time
+import random
+import asyncio
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+import httpx
+from xml.parsers.expat import ExpatError
+
+from app.services.zeron_cache import cache as zeron_cache
+
+logger = logging.getLogger(__name__)
+
+ZERON_URL = os.getenv(
+    "ZERON_URL",
+    "https://sysserver.praktis.bg:37005/ZeronServerService/DataExchange",
+)
+ZERON_MAX_PER_REQUEST = int(os.getenv("ZERON_MAX_PER_REQUEST", "200"))
+ZERON_TIMEOUT = int(os.getenv("ZERON_TIMEOUT", "60"))
+ZERON_VERIFY_SSL = os.getenv("ZERON_SSL_VERIFY", "1").lower() in ("1", "true", "yes", "on")
+ZERON_PARALLEL = int(os.getenv("ZERON_PARALLEL", "4"))
+ZERON_RETRIES = int(os.getenv("ZERON_RETRIES", "3"))
+ZERON_BACKOFF_BASE = float(os.getenv("ZERON_BACKOFF_BASE", "1.0"))
+
+
+@dataclass
+class ZeronFetchResult:
+    data: Dict[str, dict] = field(default_factory=dict)
+    chunks: int = 0
+    requests: int = 0
+    failed_chunks: List[dict] = field(default_factory=list)   # {"skus": [...], "error": "..."}
+    elapsed_s: float = 0.0
+    cache_hits: int = 0        # SKUs answered from zeron_cache (data or "no data")
+    cache_misses: int = 0      # SKUs that had to be requested
+
+    @property
+    def failed_skus(self) -> List[str]:
+        return [s for c in self.failed_chunks for s in c["skus"]]
+
+    def summary(self) -> Dict[str, object]:
+        return {
+            "chunks": self.chunks,
+            "requests": self.requests,
+            "failed_chunks": len(self.failed_chunks),
+            "failed_skus": len(self.failed_skus),
+            "elapsed_s": round(self.elapsed_s, 1),
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+        }
+
+
+class _Retryable(Exception):
+    pass
+
+
+async def fetch_chunks(
+    skus: List[str],
+    build_payload: Callable[[List[str]], str],
+    parse: Callable[[bytes], Dict[str, dict]],
+    url: Optional[str] = None,
+    chunk_size: int = ZERON_MAX_PER_REQUEST,
+    parallel: int = ZERON_PARALLEL,
+    retries: int = ZERON_RETRIES,
+    cache_ns: Optional[str] = None,
+    force_refresh: bool = False,
+) -> ZeronFetchResult:
+    """POST `skus` to Zeron in parallel chunks and merge the parsed results."""
+    skus = [s for s in skus if s]
+    res = ZeronFetchResult()
+    if not skus:
+        return res
+
+    t0 = time.perf_counter()
+    use_cache = cache_ns is not None and zeron_cache.enabled
+    if use_cache and force_refresh:
+        zeron_cache.forced += 1
+    elif use_cache:
+        cached = await asyncio.to_thread(zeron_cache.get_many, cache_ns, skus)
+        res.data.update((sku, rec) for sku, rec in cached.items() if rec is not None)
+        res.cache_hits = len(cached)
+        skus = [s for s in skus if s not in cached]
+    res.cache_misses = len(set(skus))
+    if not skus:
+        res.elapsed_s = time.perf_counter() - t0
+        logger.info("zeron: all skus from cache %s", res.summary())
+        return res
+
+    chunks = [skus[i:i + chunk_size] for i in range(0, len(skus), chunk_size)]
+    res.chunks = len(chunks)
+    sem = asyncio.Semaphore(max(1, int(parallel)))
+    limits = httpx.Limits(max_connections=max(1, int(parallel)), max_keepalive_connections=max(1, int(parallel)))
+
+    async with httpx.AsyncClient(
+        timeout=ZERON_TIMEOUT, verify=ZERON_VERIFY_SSL, limits=limits,
+        headers={"Content-Type": "application/xml"},
+    ) as client:
+
+        async def post(chunk: List[str]) -> Dict[str, dict]:
+            body = build_payload(chunk).encode("utf-8")
+            last_err: Optional[BaseException] = None
+            for attempt in range(max(1, int(retries))):
+                if attempt:
+                    await asyncio.sleep(ZERON_BACKOFF_BASE * (2 ** (attempt - 1)) * random.uniform(0.8, 1.2))
+                res.requests += 1
+                try:
+                    r = await client.post(url or ZERON_URL, content=body)
+                    if r.status_code >= 500:
+                        raise _Retryable(f"HTTP {r.status_code}")
+                    r.raise_for_status()
+                    # parsing is CPU work: keep the event loop (and other chunks) moving
+                    return await asyncio.to_thread(parse, r.content)
+                except (httpx.TransportError, _Retryable, ExpatError, SyntaxError, ValueError) as e:
+                    last_err = e
+                    logger.warning("zeron: chunk of %d skus attempt %d/%d failed: %s",
+                                   len(chunk), attempt + 1, retries, e)
+            raise last_err or RuntimeError("zeron: no attempt made")
+
+        async def one(chunk: List[str]):
+            async with sem:
+                try:
+                    res.data.update(await post(chunk))
+                except Exception as e:
+                    res.failed_chunks.append({"skus": chunk, "error": str(e)})
+
+        await asyncio.gather(*(one(c) for c in chunks))
+
+    if use_cache:
+        failed = set(res.failed_skus)
+        answered = [s for s in dict.fromkeys(skus) if s not in failed]
+        await asyncio.to_thread(
+            zeron_cache.put_many, cache_ns,
+            {s: res.data[s] for s in answered if s in res.data},
+            [s for s in answered if s not in res.data],
+        )
+
+    res.elapsed_s = time.perf_counter() - t0
+    logger.info("zeron: skus=%d with_data=%d %s", len(skus), len(res.data), res.summary())
+    return res
@@ -0,0 +1,230 @@
+# -*- coding: utf-8 -*-
+"""
+Zeron price-group selection: which of an article's price-group rows sets its price.
+
+Rows come from app.services.zeron_xml.TableStream and are grouped per InvCode:
+`parse_selected()` (API responses) groups the whole response, `iter_selected()`
+(uploaded exports) streams runs of rows. `select_entry()` picks one row per
+article with the business rules below. The chosen rows of benchmarks/zeron_golden are the
+reference (`python -m benchmarks.zeron_selection`).
+"""
+from __future__ import annotations
+
+import logging
+from typing import Dict, Iterator, List, Optional
+
+from app.services.zeron_xml import TableStream
+
+logger = logging.getLogger(__name__)
+
+
+# =============================================================================
+# Common helper (taken from your code – ONLY used for price logic)
+# =============================================================================
+
+class Common:
+    @staticmethod
+    def process_string(s):
+        return (str(s).strip() if s is not None else "")
+
+    @staticmethod
+    def calculate_discounted_price(price: float, discount: float) -> float:
+        return price * (100.0 - discount) / 100.0
+
+    @classmethod
+    def process_entry(cls, entry, all_entries, base_price: Optional[float] = None):
+        if 'Discount' in entry:
+            entry['DiscountedPrice'] = cls.calculate_discounted_price(float(entry['Price']), float(entry['Discount']))
+        else:
+            # Find the maximum price for the same InvCode to determine the base price
+            # (callers that already know it pass base_price)
+            if base_price is None:
+                inv_code = entry['InvCode']
+                base_price = max(float(e['Price']) for e in all_entries if e['InvCode'] == inv_code)
+
+            discounted_price = float(entry['Price'])  # The current price is the discounted price
+
+            if base_price > discounted_price:
+                discount_percentage = round(((base_price - discounted_price) / base_price) * 100)
+                entry['Discount'] = discount_percentage  # Store discount percentage
+
+            entry['DiscountedPrice'] = discounted_price  # Store the actual discounted price
+            entry['Price'] = str(base_price)  # Ensure that the base price is stored correctly
+
+
+# =============================================================================
+# Selection
+# =============================================================================
+
+def select_entry(entries: List[dict]) -> Optional[dict]:
+    """
+    Pick the row to use for ONE InvCode (all its price-group rows), using
+    EXACTLY your if/else logic. Returns None when no row qualifies.
+
+    One pass buckets the rows by AllowBetterPrices / PriceGroupType; the base
+    (max) price is computed once, on first need, instead of per processed row.
+    """
+    by_abp: Dict[str, List[dict]] = {}
+    type_10_20: List[dict] = []
+    type_20_30: List[dict] = []
+    for entry in entries:
+        by_abp.setdefault(entry['AllowBetterPrices'], []).append(entry)
+        price_group_type = entry.get('PriceGroupType')
+        if price_group_type in ('10', '20'):
+            type_10_20.append(entry)
+        if price_group_type in ('20', '30'):
+            type_20_30.append(entry)
+
+    base: List[float] = []
+
+    def process(entry):
+        # process_entry only rewrites Price to the max itself, so the max never changes
+        if not base and 'Discount' not in entry:
+            base.append(max(float(e['Price']) for e in entries))
+        Common.process_entry(entry, entries, base[0] if base else None)
+
+    if by_abp.get('0'):
+        # If we have entries with AllowBetterPrices 0, select the one with the lowest PriceGroupCode
+        for entry in by_abp['0']:
+            process(entry)
+        return min(by_abp['0'], key=lambda x: int(x['PriceGroupCode']))
+
+    if by_abp.get('2'):
+        # If we have entries with AllowBetterPrices 2, filter by PriceGroupType 10 and 20, choose the lowest price
+        if not type_10_20:
+            return None
+        for entry in type_10_20:
+            process(entry)
+        return min(type_10_20, key=lambda x: float(x['DiscountedPrice']))
+
+    if by_abp.get('3'):
+        # If we have entries with AllowBetterPrices 3, filter by PriceGroupType 20 and 30, choose the lowest price
+        if not type_20_30:
+            return None
+        for entry in type_20_30:
+            process(entry)
+        return min(type_20_30, key=lambda x: float(x['DiscountedPrice']))
+
+    if by_abp.get('1'):
+        # Only calculate discounts for PriceGroupType != '10'
+        for entry in by_abp['1']:
+            if entry['PriceGroupType'] != '10':
+                process(entry)
+            else:
+                # keep the price as-is and zero out any discount
+                entry['DiscountedPrice'] = float(entry['Price'])
+                entry['Discount'] = 0
+        # now pick the one with the lowest discounted price
+        return min(by_abp['1'], key=lambda x: float(x['DiscountedPrice']))
+
+    return None
+
+
+def entry_to_info(entry: dict) -> dict:
+    """Selected Zeron row -> the info dict used by app.services.erp_importer."""
+    inv_code = entry.get("InvCode")
+
+    price_raw = entry.get("Price")
+    try:
+        price = float(str(price_raw).replace(",", ".")) if price_raw else None
+    except Exception:
+        price = None
+
+    group_raw = entry.get("GroupID")
+    try:
+        groupid = int(group_raw) if group_raw else None
+    except Exception:
+        groupid = None
+
+    return {
+        "sku": inv_code,
+        "barcode": entry.get("Barcode"),
+        "name": entry.get("InvName"),
+        "measure": entry.get("Measure"),
+        "price_group_type": entry.get("PriceGroupType"),
+        "price_group_code": entry.get("PriceGroupCode"),
+        "price": price,
+        "currency_code": entry.get("CurrencyCode"),
+        "from_date": entry.get("FromDate"),
+        "allow_better_prices": entry.get("AllowBetterPrices"),
+        "in_brochure": entry.get("InBroschure"),
+        "on_stock": entry.get("OnStock"),
+        "blocked_delivery": entry.get("BlockedDelivery"),
+        "groupid": groupid,
+        "brand": entry.get("Trademark"),
+        "item_number": entry.get("SuppItemCode"),
+    }
+
+
+def _rows(stream: TableStream, storehouse: Optional[str]) -> Iterator[dict]:
+    for entry in stream:
+        entry["Storehouse"] = storehouse
+        entry['CurrencyCode'] = Common.process_string(entry.get('CurrencyCode'))
+        if entry.get('InvCode'):
+            yield entry
+
+
+def _log_received(stream: TableStream, articles: int) -> None:
+    if stream.tables:
+        logger.info("Successfully received Zeron data (%d rows, %d articles).", stream.tables, articles)
+    else:
+        logger.error("Zeron data response has empty DataSet.")
+
+
+def iter_selected(source, storehouse: Optional[str] = None) -> Iterator[dict]:
+    """
+    Stream Zeron XML (str / bytes / binary file) and yield one selected info
+    dict per run of rows with the same InvCode; only the current run is held
+    in memory. For multi-hundred-MB exports, whose price-group rows of an
+    article are next to each other. An article whose rows are split apart is
+    selected per run (the last run wins when upserted) and logged; use
+    parse_selected() when the order is not known.
+    """
+    stream = TableStream(source)
+    current: Optional[str] = None
+    entries: List[dict] = []
+    seen = set()
+    split = 0
+
+    for entry in _rows(stream, storehouse):
+        inv_code = entry['InvCode']
+        if inv_code != current:
+            if entries:
+                chosen = select_entry(entries)
+                if chosen is not None:
+                    yield entry_to_info(chosen)
+                entries = []
+            if inv_code in seen:
+                split += 1
+            seen.add(inv_code)
+            current = inv_code
+        entries.append(entry)
+
+    if entries:
+        chosen = select_entry(entries)
+        if chosen is not None:
+            yield entry_to_info(chosen)
+
+    if split:
+        logger.warning("Zeron XML: %d runs of rows for articles seen earlier (rows not grouped per InvCode).", split)
+    _log_received(stream, len(seen))
+
+
+def parse_selected(source, storehouse: Optional[str] = None) -> Dict[str, dict]:
+    """
+    Parse Zeron XML into a dict keyed by InvCode (sku); all rows of an InvCode,
+    wherever they are in the response, go to select_entry() together (in
+    document order).
+    """
+    stream = TableStream(source)
+    by_code: Dict[str, List[dict]] = {}
+    for entry in _rows(stream, storehouse):
+        by_code.setdefault(entry['InvCode'], []).append(entry)
+
+    out: Dict[str, dict] = {}
+    for inv_code, entries in by_code.items():
+        chosen = select_entry(entries)
+        if chosen is not None:
+            out[inv_code] = entry_to_info(chosen)
+    _log_received(stream, len(by_code))
+    return out
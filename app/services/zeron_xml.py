@@ -0,0 +1,91 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming reader for Zeron DataExchange XML (API responses and uploaded exports).
+
+`TableStream(source)` yields one flat dict per <Table> row (child tag -> stripped
+text or None, like xmltodict) using ElementTree.iterparse; every row is detached and
+cleared as soon as it is yielded, so memory does not grow with the export size.
+<Success> / <ErrorMessage> are captured on the way and readable after the
+stream is exhausted.
+
+`open_xml_upload(fileobj)` wraps an uploaded file for the stream: the encoding
+from the XML declaration is honoured by the parser; files without one that are
+not valid UTF-8 are read as Windows-1251 (old Zeron exports).
+"""
+from __future__ import annotations
+
+import io
+import re
+import codecs
+from typing import BinaryIO, Dict, Iterator, Optional, Union
+from xml.etree import ElementTree as ET
+
+READ_CHUNK = 1 << 20
+_DECL_ENCODING = re.compile(rb"^\s*<\?xml[^>]*encoding\s*=\s*['\"]([A-Za-z0-9._-]+)['\"]")
+
+Source = Union[str, bytes, BinaryIO]
+
+
+class TableStream:
+    """Iterate <Table> rows of a Zeron XML document without building the tree."""
+
+    def __init__(self, source: Source):
+        if isinstance(source, str):
+            source = io.StringIO(source)
+        elif isinstance(source, (bytes, bytearray)):
+            source = io.BytesIO(source)
+        self.source = source
+        self.success: Optional[str] = None
+        self.error_message: Optional[str] = None
+        self.tables = 0
+
+    @property
+    def ok(self) -> bool:
+        return (self.success or "").strip().lower() in ("true", "1", "yes")
+
+    def __iter__(self) -> Iterator[Dict[str, Optional[str]]]:
+        stack = []
+        for event, el in ET.iterparse(self.source, events=("start", "end")):
+            if event == "start":
+                stack.append(el)
+                continue
+            stack.pop()
+            if el.tag == "Table":
+                row = {child.tag: (child.text or "").strip() or None for child in el}
+                self.tables += 1
+                # drop the row from its parent so the partial tree stays a single path
+                if stack:
+                    stack[-1].remove(el)
+                el.clear()
+                yield row
+            elif el.tag == "Success":
+                self.success = el.text
+            elif el.tag == "ErrorMessage":
+                self.error_message = (el.text or "").strip() or None
+
+
+def _is_utf8(f: BinaryIO) -> bool:
+    dec = codecs.getincrementaldecoder("utf-8")()
+    try:
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                dec.decode(b"", final=True)
+                return True
+            dec.decode(chunk)
+    except UnicodeDecodeError:
+        return False
+
+
+def open_xml_upload(f: BinaryIO):
+    """Readable for TableStream; falls back to cp1251 for undeclared non-UTF-8 files."""
+    f.seek(0)
+    head = f.read(256)
+    f.seek(0)
+    if head.startswith(codecs.BOM_UTF8) or _DECL_ENCODING.match(head):
+        return f  # parser follows the BOM / declared encoding
+    utf8 = _is_utf8(f)
+    f.seek(0)
+    if utf8:
+        return f
+    return io.TextIOWrapper(f, encoding="cp1251", errors="ignore")
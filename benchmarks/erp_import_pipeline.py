@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+End-to-end timing of the ERP import pipeline (app.services.erp_importer) on
+synthetic files, each imported twice (1st: all created, 2nd: all unchanged):
+
+  - xml    Zeron XML export with N articles (benchmarks.zeron_standin rows),
+           streamed through XmlUploadSource
+  - items  legacy <item> feed with N items (ItemsXmlSource)
+  - excel  .xlsx with N SKUs (benchmarks.sku_file_extract) through
+           ExcelSkuSource against a local Zeron stand-in (needs httpx)
+
+Runs against a throw-away SQLite database unless --database-url is given
+(never point it at production).
+
+  python -m benchmarks.erp_import_pipeline                 # 100k items per source
+  python -m benchmarks.erp_import_pipeline --items 20000 --only xml,items
+"""
+from __future__ import annotations
+
+import io
+import os
+import importlib.util
+import sys
+import time
+import socket
+import argparse
+import tempfile
+from pathlib import Path
+from typing import List, Optional
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024.0
+
+
+def _items_xml(skus: List[str]) -> bytes:
+    parts = ["<items>"]
+    for i, sku in enumerate(skus):
+        parts.append(
+            f"<item><sku>{sku}</sku><barcode>380{i:010d}</barcode><name>Артикул {sku}</name>"
+            f"<price_regular>{10 + i % 500},{i % 100:02d}</price_regular><price_promo></price_promo></item>"
+        )
+    parts.append("</items>")
+    return "".join(parts).encode("utf-8")
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--items", type=int, default=100_000)
+    ap.add_argument("--only", default="xml,items,excel", help="comma separated: xml,items,excel")
+    ap.add_argument("--database-url", default=None)
+    args = ap.parse_args(argv)
+    only = {x.strip() for x in args.only.split(",") if x.strip()}
+
+    tmp = Path(tempfile.mkdtemp(prefix="erp_bench_"))
+    # before any app import: app.db / erp_importer read these at import time
+    os.environ["DATABASE_URL"] = args.database_url or f"sqlite:///{tmp / 'bench.db'}"
+    os.environ["ZERON_CACHE_PATH"] = str(tmp / "zeron_cache.sqlite3")
+    port = _free_port()
+    os.environ["ZERON_URL"] = f"http://127.0.0.1:{port}/"
+
+    from app.db import init_db
+    from app.services.erp_importer import ErpImporter, XmlUploadSource, ItemsXmlSource, ExcelSkuSource
+    from benchmarks.zeron_standin import iter_response_parts, serve
+    from benchmarks.sku_file_extract import build_xlsx
+
+    init_db()
+    n = args.items
+    cases = []
+
+    if "xml" in only:
+        path = tmp / "zeron_export.xml"
+        with open(path, "w", encoding="utf-8") as f:
+            for part in iter_response_parts([f"X{i:07d}" for i in range(n)]):
+                f.write(part)
+        print(f"xml export: {path.stat().st_size / 1e6:.0f} MB")
+        cases.append(("xml", lambda: XmlUploadSource(open(path, "rb"))))
+
+    if "items" in only:
+        data = _items_xml([f"I{i:07d}" for i in range(n)])
+        print(f"items feed: {len(data) / 1e6:.0f} MB")
+        cases.append(("items", lambda: ItemsXmlSource(data)))
+
+    if "excel" in only:
+        if importlib.util.find_spec("httpx") is None:
+            print("excel: httpx not installed, skipped")
+        else:
+            xlsx = build_xlsx([f"E{i:07d}" for i in range(n)])
+            print(f"excel list: {len(xlsx) / 1e6:.1f} MB")
+            serve(port)
+            # force_refresh: measure Zeron round trips, not zeron_cache
+            cases.append(("excel", lambda: ExcelSkuSource(io.BytesIO(xlsx), "skus.xlsx", force_refresh=True)))
+
+    print(f"{'source':<8} {'run':<10} {'rows':>8} {'created':>8} {'unchanged':>9} {'seconds':>8} {'rows/s':>8}")
+    for name, make in cases:
+        for run in ("first", "unchanged"):
+            t0 = time.perf_counter()
+            res = ErpImporter().run_sync(make())
+            dt = time.perf_counter() - t0
+            print(f"{name:<8} {run:<10} {res.rows:>8} {res.created:>8} {res.unchanged:>9} {dt:>8.2f} {res.rows / dt:>8.0f}")
+    rss = _peak_rss_mb()
+    if rss is not None:
+        print(f"peak RSS: {rss:.0f} MB")
+    print(f"scratch dir: {tmp}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
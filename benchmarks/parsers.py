@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""
+Offline parser benchmark over recorded HTML pages.
+
+Corpus: benchmarks/corpus/<site>_<kind>/*.html (checked in), or the capture
+store (--captures, see app.scrapers.capture). No network is used.
+
+Per parser it reports pages/sec, p50/p99 parse time and allocations
+(tracemalloc: blocks and KiB per page). With a baseline file it fails
+(exit code 1) when p50 or allocations regress past --max-regression.
+
+  python -m benchmarks.parsers                      # run + compare with baseline
+  python -m benchmarks.parsers --save-baseline      # record this machine's baseline
+  python -m benchmarks.parsers --captures --limit 200
+"""
+from __future__ import annotations
+
+import gc
+import sys
+import json
+import time
+import argparse
+import statistics
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+BENCH_DIR = Path(__file__).resolve().parent
+CORPUS_DIR = BENCH_DIR / "corpus"
+BASELINE_FILE = BENCH_DIR / "baseline.json"
+
+
+# ---- parser entry points (imported lazily so one missing module only skips its parsers) ----
+def _praktiker_prices() -> Callable[[str], object]:
+    from selectolax.parser import HTMLParser
+    from app.scrapers.praktiker import extract_praktiker_prices
+
+    def run(html: str):
+        tree = HTMLParser(html)
+        card = tree.css_first("div.products-grid te-product-box div.products-grid__item") or tree.root
+        return extract_praktiker_prices(card)
+    return run
+
+
+def _praktiker_labels() -> Callable[[str], object]:
+    from selectolax.parser import HTMLParser
+    from app.scrapers.praktiker import extract_item_labels
+
+    def run(html: str):
+        tree = HTMLParser(html)
+        card = tree.css_first("div.products-grid te-product-box div.products-grid__item") or tree.root
+        return extract_item_labels(card)
+    return run
+
+
+def _mrb_card() -> Callable[[str], object]:
+    from selectolax.parser import HTMLParser
+    from app.scrapers.mrbricolage import parse_mrb_card
+
+    def run(html: str):
+        return parse_mrb_card(HTMLParser(html).css_first("div.plp-product div.product"))
+    return run
+
+
+def _mashini_search() -> Callable[[str], object]:
+    from app.scrapers.mashinibg import _parse_search_card
+    return _parse_search_card
+
+
+def _mashini_pdp() -> Callable[[str], object]:
+    from app.scrapers.mashinibg import _parse_pdp
+    return _parse_pdp
+
+
+def _praktis_assets() -> Callable[[str], object]:
+    from app.routers.praktis_assets import parse_search_or_pdp
+    return parse_search_or_pdp
+
+
+# name -> (loader, corpus dirs)
+PARSERS: Dict[str, tuple] = {
+    "praktiker.extract_praktiker_prices": (_praktiker_prices, ["praktiker_search", "praktiker_pdp"]),
+    "praktiker.extract_item_labels": (_praktiker_labels, ["praktiker_search", "praktiker_pdp"]),
+    "mrbricolage.parse_mrb_card": (_mrb_card, ["mrbricolage_search"]),
+    "mashinibg._parse_search_card": (_mashini_search, ["mashinibg_search"]),
+    "mashinibg._parse_pdp": (_mashini_pdp, ["mashinibg_pdp"]),
+    "praktis_assets.parse_search_or_pdp": (_praktis_assets, ["praktis_search"]),
+}
+
+
+# ---- corpus ----
+def load_corpus(dirs: List[str], use_captures: bool, limit: int) -> List[str]:
+    pages: List[str] = []
+    if use_captures:
+        from app.scrapers.capture import store
+        for d in dirs:
+            site, kind = d.split("_", 1)
+            if site == "praktis":
+                continue  # assets pages are not captured
+            for page in store.iter_pages(site=site, kind=kind):
+                pages.append(store.read(page))
+                if len(pages) >= limit:
+                    return pages
+    else:
+        for d in dirs:
+            for f in sorted((CORPUS_DIR / d).glob("*.html")):
+                pages.append(f.read_text(encoding="utf-8"))
+    return pages[:limit]
+
+
+# ---- measurement ----
+def _percentile(sorted_vals: List[float], q: float) -> float:
+    if not sorted_vals:
+        return 0.0
+    idx = min(len(sorted_vals) - 1, max(0, int(round(q * (len(sorted_vals) - 1)))))
+    return sorted_vals[idx]
+
+
+def bench_one(fn: Callable[[str], object], pages: List[str], rounds: int) -> dict:
+    # warm-up (imports, selector compilation)
+    for html in pages[:3]:
+        fn(html)
+
+    timings: List[float] = []
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        t_start = time.perf_counter()
+        for _ in range(rounds):
+            for html in pages:
+                t0 = time.perf_counter()
+                fn(html)
+                timings.append(time.perf_counter() - t0)
+        wall = time.perf_counter() - t_start
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # allocations: separate single pass, tracemalloc distorts timings
+    blocks = 0
+    peak = 0
+    tracemalloc.start()
+    try:
+        for html in pages:
+            before = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            fn(html)
+            _, pk = tracemalloc.get_traced_memory()
+            after = tracemalloc.take_snapshot()
+            blocks += sum(max(0, s.count_diff) for s in after.compare_to(before, "lineno"))
+            peak += max(0, pk - base)
+    finally:
+        tracemalloc.stop()
+
+    timings.sort()
+    n = len(timings)
+    return {
+        "pages": len(pages),
+        "samples": n,
+        "pages_per_sec": round(n / wall, 1) if wall > 0 else 0.0,
+        "p50_ms": round(_percentile(timings, 0.50) * 1000, 4),
+        "p99_ms": round(_percentile(timings, 0.99) * 1000, 4),
+        "mean_ms": round(statistics.fmean(timings) * 1000, 4) if timings else 0.0,
+        "alloc_blocks_per_page": round(blocks / max(1, len(pages)), 1),
+        "alloc_peak_kib_per_page": round(peak / 1024 / max(1, len(pages)), 1),
+    }
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], max_regression: float) -> List[str]:
+    failures: List[str] = []
+    for name, res in results.items():
+        base = baseline.get(name)
+        if not base:
+            continue
+        for metric in ("p50_ms", "alloc_blocks_per_page"):
+            old, new = base.get(metric), res.get(metric)
+            if not old or new is None:
+                continue
+            ratio = (new - old) / old
+            if ratio > max_regression:
+                failures.append(f"{name}: {metric} {old} -> {new} (+{ratio:.0%} > {max_regression:.0%})")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.parsers")
+    ap.add_argument("--only", help="substring filter on parser name")
+    ap.add_argument("--rounds", type=int, default=20, help="timing passes over the corpus")
+    ap.add_argument("--limit", type=int, default=500, help="max pages per parser")
+    ap.add_argument("--captures", action="store_true", help="use the capture store instead of benchmarks/corpus")
+    ap.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    ap.add_argument("--save-baseline", action="store_true")
+    ap.add_argument("--max-regression", type=float, default=0.25, help="allowed relative slowdown (0.25 = 25%%)")
+    ap.add_argument("--json", type=Path, help="also write results to this file")
+    args = ap.parse_args(argv)
+
+    results: Dict[str, dict] = {}
+    for name, (loader, dirs) in PARSERS.items():
+        if args.only and args.only not in name:
+            continue
+        try:
+            fn = loader()
+        except ImportError as e:
+            print(f"[BENCH] skip {name}: {e}")
+            continue
+        pages = load_corpus(dirs, args.captures, args.limit)
+        if not pages:
+            print(f"[BENCH] skip {name}: empty corpus")
+            continue
+        res = bench_one(fn, pages, args.rounds)
+        results[name] = res
+        print(
+            f"[BENCH] {name:<40} pages={res['pages']:<4} {res['pages_per_sec']:>9}/s "
+            f"p50={res['p50_ms']:.3f}ms p99={res['p99_ms']:.3f}ms "
+            f"allocs={res['alloc_blocks_per_page']} blocks/{res['alloc_peak_kib_per_page']} KiB per page"
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps(results, indent=2), encoding="utf-8")
+
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(results, indent=2, sort_keys=True), encoding="utf-8")
+        print(f"[BENCH] baseline saved -> {args.baseline}")
+        return 0
+
+    if args.baseline.exists():
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        failures = compare(results, baseline, args.max_regression)
+        if failures:
+            for f in failures:
+                print(f"[BENCH] REGRESSION {f}")
+            return 1
+        print("[BENCH] no regressions vs baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+"""
+Timing for SKU extraction from uploads (app.services.sku_file).
+
+Writes a synthetic .xlsx (a sheet without SKU header, then a sheet with a title
+row, the "Код в Zeron" header and extra columns; SKUs mixed as numbers and shared
+strings) and the same list as .csv, checks both give the expected SKUs and
+times them. With openpyxl installed the old full-workbook read is timed too.
+
+  python -m benchmarks.sku_file_extract                 # 100k rows
+  python -m benchmarks.sku_file_extract --rows 300000 --cols 12
+"""
+from __future__ import annotations
+
+import io
+import importlib.util
+import time
+import random
+import zipfile
+import argparse
+from typing import List
+from xml.sax.saxutils import escape
+
+from app.services.sku_file import extract_skus, _openpyxl_skus
+
+_CT = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet2.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '<Override PartName="/xl/sharedStrings.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+_WORKBOOK = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"><sheets>'
+    '<sheet name="Info" sheetId="1" r:id="rId1"/><sheet name="SKU" sheetId="2" r:id="rId2"/>'
+    '</sheets></workbook>'
+)
+_WB_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>'
+    '<Relationship Id="rId2" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet2.xml"/>'
+    '<Relationship Id="rId3" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/sharedStrings" Target="sharedStrings.xml"/>'
+    '</Relationships>'
+)
+_SHEET_HEAD = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+_SHEET_TAIL = '</sheetData></worksheet>'
+
+
+def _col(n: int) -> str:
+    s = ""
+    while n:
+        n, r = divmod(n - 1, 26)
+        s = chr(65 + r) + s
+    return s
+
+
+def synthetic_skus(rows: int, seed: int = 7) -> List[str]:
+    rnd = random.Random(seed)
+    skus = []
+    for i in range(rows):
+        # mostly numeric Zeron codes, some alphanumeric, some repeated
+        if i and rnd.random() < 0.02:
+            skus.append(skus[rnd.randrange(i)])
+        elif rnd.random() < 0.1:
+            skus.append(f"A{rnd.randrange(10 ** 6):06d}")
+        else:
+            skus.append(str(10_000_000 + rnd.randrange(90_000_000)))
+    return skus
+
+
+def build_xlsx(skus: List[str], cols: int = 6) -> bytes:
+    strings: List[str] = []
+    index = {}
+
+    def ss(text: str) -> int:
+        if text not in index:
+            index[text] = len(strings)
+            strings.append(text)
+        return index[text]
+
+    def s_cell(ref: str, text: str) -> str:
+        return f'<c r="{ref}" t="s"><v>{ss(text)}</v></c>'
+
+    info = _SHEET_HEAD + "".join(
+        f'<row r="{r}">{s_cell(f"A{r}", f"Бележка {r}")}<c r="B{r}"><v>{r}</v></c></row>' for r in range(1, 30)
+    ) + _SHEET_TAIL
+
+    sku_col = 2
+    parts = [_SHEET_HEAD, f'<row r="1">{s_cell("A1", "Списък артикули")}</row>']
+    header = "".join(
+        s_cell(f"{_col(c)}3", "Код в Zeron" if c == sku_col else f"Колона {c}") for c in range(1, cols + 1)
+    )
+    parts.append(f'<row r="3">{header}</row>')
+    for i, sku in enumerate(skus):
+        r = i + 4
+        cells = []
+        for c in range(1, cols + 1):
+            ref = f"{_col(c)}{r}"
+            if c == sku_col:
+                cells.append(f'<c r="{ref}"><v>{sku}</v></c>' if sku.isdigit() else s_cell(ref, sku))
+            elif c == 1:
+                cells.append(s_cell(ref, f"Продукт {i}"))
+            else:
+                cells.append(f'<c r="{ref}"><v>{(i * c) % 997 / 10}</v></c>')
+        parts.append(f'<row r="{r}">{"".join(cells)}</row>')
+    parts.append(_SHEET_TAIL)
+
+    shared = (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        f'<sst xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" count="{len(strings)}" uniqueCount="{len(strings)}">'
+        + "".join(f"<si><t>{escape(s)}</t></si>" for s in strings) + "</sst>"
+    )
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as z:
+        z.writestr("[Content_Types].xml", _CT)
+        z.writestr("_rels/.rels", _ROOT_RELS)
+        z.writestr("xl/workbook.xml", _WORKBOOK)
+        z.writestr("xl/_rels/workbook.xml.rels", _WB_RELS)
+        z.writestr("xl/worksheets/sheet1.xml", info)
+        z.writestr("xl/worksheets/sheet2.xml", "".join(parts))
+        z.writestr("xl/sharedStrings.xml", shared)
+    return buf.getvalue()
+
+
+def build_csv(skus: List[str], cols: int = 6) -> bytes:
+    lines = ["Списък артикули", ";".join("Код в Zeron" if c == 2 else f"Колона {c}" for c in range(1, cols + 1))]
+    for i, sku in enumerate(skus):
+        lines.append(";".join(sku if c == 2 else f"Продукт {i}" if c == 1 else str(i * c % 997) for c in range(1, cols + 1)))
+    return ("\n".join(lines) + "\n").encode("cp1251")
+
+
+def _time(label: str, fn, expected: List[str]):
+    t0 = time.perf_counter()
+    got = fn()
+    dt = time.perf_counter() - t0
+    print(f"{label:<28} {dt:7.3f}s  skus={len(got)}  {'OK' if got == expected else 'MISMATCH'}")
+    return got == expected
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=100_000)
+    ap.add_argument("--cols", type=int, default=6)
+    args = ap.parse_args(argv)
+
+    skus = synthetic_skus(args.rows)
+    expected = list(dict.fromkeys(skus))
+    xlsx = build_xlsx(skus, args.cols)
+    csv_data = build_csv(skus, args.cols)
+    print(f"rows={args.rows} unique={len(expected)} xlsx={len(xlsx) / 1e6:.1f} MB csv={len(csv_data) / 1e6:.1f} MB")
+
+    ok = _time("xlsx (streamed)", lambda: extract_skus(xlsx, "skus.xlsx"), expected)
+    ok &= _time("csv", lambda: extract_skus(csv_data, "skus.csv"), expected)
+    if importlib.util.find_spec("openpyxl") is None:
+        print("openpyxl not installed: full-workbook baseline skipped")
+    else:
+        ok &= _time("xlsx (openpyxl read_only)",
+                    lambda: list(dict.fromkeys(_openpyxl_skus(io.BytesIO(xlsx)))), expected)
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+"""
+Golden-file check + timing for the Zeron price-group selection.
+
+benchmarks/zeron_golden/corpus.xml is a Zeron response: synthetic articles from
+benchmarks.zeron_standin, articles with 40 price groups, and hand-written edge
+cases (explicit Discount, ties, all-equal prices, AllowBetterPrices 2/3
+without a matching PriceGroupType, ...). expected.json holds the row chosen per InvCode. Any
+change to app.services.zeron_select must keep them identical.
+
+  python -m benchmarks.zeron_selection                  # check golden + time
+  python -m benchmarks.zeron_selection --groups 300     # wide articles (many price groups)
+  python -m benchmarks.zeron_selection --regen          # ONLY after an intended selection change
+"""
+from __future__ import annotations
+
+import sys
+import json
+import time
+import random
+import argparse
+from pathlib import Path
+from typing import Dict, List, Optional
+from xml.sax.saxutils import escape
+
+from benchmarks.zeron_standin import synthetic_tables
+
+GOLDEN_DIR = Path(__file__).resolve().parent / "zeron_golden"
+CORPUS_FILE = GOLDEN_DIR / "corpus.xml"
+EXPECTED_FILE = GOLDEN_DIR / "expected.json"
+
+
+def _row(sku: str, code: int, ptype: str, price: str, abp: str, discount: Optional[str] = None) -> dict:
+    r = {
+        "InvCode": sku, "InvName": f"Edge {sku}", "Barcode": "3800000000000",
+        "PriceGroupCode": str(code), "PriceGroupType": ptype, "Price": price,
+        "CurrencyCode": " BGN ", "AllowBetterPrices": abp, "GroupID": "7",
+        "Trademark": "EDGE", "SuppItemCode": f"S-{sku}",
+    }
+    if discount is not None:
+        r["Discount"] = discount
+    return r
+
+
+def edge_cases() -> List[dict]:
+    rows: List[dict] = []
+    # AllowBetterPrices 0: lowest PriceGroupCode wins, base price = max of ALL groups
+    rows += [_row("E-ABP0", 30, "10", "9.99", "0"), _row("E-ABP0", 20, "20", "12.50", "0"), _row("E-ABP0", 10, "30", "19.90", "1")]
+    # explicit Discount keeps its own Price
+    rows += [_row("E-DISC", 11, "10", "20.00", "0", "10"), _row("E-DISC", 12, "10", "30.00", "1")]
+    # AllowBetterPrices 2: PriceGroupType 10/20 of any row, lowest discounted price
+    rows += [_row("E-ABP2", 1, "10", "15.00", "2"), _row("E-ABP2", 2, "20", "14.00", "1"), _row("E-ABP2", 3, "30", "5.00", "1")]
+    # AllowBetterPrices 2 without type 10/20: nothing selected
+    rows += [_row("E-ABP2-NONE", 1, "30", "15.00", "2"), _row("E-ABP2-NONE", 2, "30", "13.00", "1")]
+    # AllowBetterPrices 3: types 20/30
+    rows += [_row("E-ABP3", 1, "10", "4.00", "1"), _row("E-ABP3", 2, "20", "8.00", "3"), _row("E-ABP3", 3, "30", "7.00", "1")]
+    # AllowBetterPrices 3 without type 20/30: nothing selected
+    rows += [_row("E-ABP3-NONE", 1, "10", "4.00", "3")]
+    # AllowBetterPrices 1: type 10 keeps its price, others get base price
+    rows += [_row("E-ABP1", 1, "10", "9.00", "1"), _row("E-ABP1", 2, "20", "8.00", "1"), _row("E-ABP1", 3, "30", "10.00", "1")]
+    # ties: first row in document order wins
+    rows += [_row("E-TIE", 5, "20", "6.00", "1"), _row("E-TIE", 4, "30", "6.00", "1"), _row("E-TIE", 6, "10", "6.00", "1")]
+    # all prices equal, no discount computed
+    rows += [_row("E-FLAT", 2, "20", "3.30", "0"), _row("E-FLAT", 1, "20", "3.30", "0")]
+    # single row, unknown AllowBetterPrices: nothing selected
+    rows += [_row("E-UNKNOWN", 1, "10", "1.00", "9")]
+    return rows
+
+
+def render(rows: List[dict]) -> str:
+    parts = ["<Response><Destination><Operation><Success>true</Success><DataSet>"]
+    for r in rows:
+        parts.append("<Table>" + "".join(f"<{k}>{escape(v)}</{k}>" for k, v in r.items()) + "</Table>")
+    parts.append("</DataSet></Operation></Destination></Response>")
+    return "".join(parts)
+
+
+def build_corpus(articles: int = 150) -> str:
+    rows: List[dict] = []
+    for i in range(articles):
+        rows += synthetic_tables(f"G{i:06d}")
+    return render(rows + wide_rows(20, 40) + edge_cases())
+
+
+def wide_rows(articles: int, groups: int) -> List[dict]:
+    """Articles with `groups` price-group rows each (the quadratic case)."""
+    r = random.Random(42)
+    rows: List[dict] = []
+    for i in range(articles):
+        for g in range(groups):
+            rows.append(_row(f"W{i:05d}", g, r.choice(["10", "20", "30"]),
+                             f"{r.uniform(1, 100):.2f}", r.choice(["1", "1", "2", "3"])))
+    return rows
+
+
+def _select_all(rows_by_code: Dict[str, List[dict]]):
+    from app.services.zeron_select import select_entry
+    return [select_entry([dict(e) for e in entries]) for entries in rows_by_code.values()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from app.services.zeron_select import parse_selected
+
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.zeron_selection")
+    ap.add_argument("--regen", action="store_true", help="rewrite corpus.xml + expected.json from the current code")
+    ap.add_argument("--articles", type=int, default=2000, help="articles in the timing run")
+    ap.add_argument("--groups", type=int, default=50, help="price-group rows per article in the timing run")
+    args = ap.parse_args(argv)
+
+    if args.regen:
+        GOLDEN_DIR.mkdir(parents=True, exist_ok=True)
+        CORPUS_FILE.write_text(build_corpus(), encoding="utf-8")
+        got = parse_selected(CORPUS_FILE.read_bytes())
+        EXPECTED_FILE.write_text(json.dumps(got, ensure_ascii=False, indent=1, sort_keys=True), encoding="utf-8")
+        print(f"[GOLDEN] wrote {CORPUS_FILE.name} + {EXPECTED_FILE.name} ({len(got)} articles)")
+        return 0
+
+    expected = json.loads(EXPECTED_FILE.read_text(encoding="utf-8"))
+    got = json.loads(json.dumps(parse_selected(CORPUS_FILE.read_bytes()), ensure_ascii=False))
+    bad = sorted(k for k in set(expected) | set(got) if expected.get(k) != got.get(k))
+    for k in bad[:20]:
+        print(f"[GOLDEN] {k}: expected {expected.get(k)} got {got.get(k)}")
+    print(f"[GOLDEN] {len(expected)} articles, {len(bad)} mismatches")
+
+    rows = wide_rows(args.articles, args.groups)
+    by_code: Dict[str, List[dict]] = {}
+    for r in rows:
+        by_code.setdefault(r["InvCode"], []).append(r)
+    t0 = time.perf_counter()
+    _select_all(by_code)
+    dt = time.perf_counter() - t0
+    print(f"[BENCH] select: {len(by_code)} articles x {args.groups} groups in {dt:.3f}s ({len(rows) / dt:,.0f} rows/s)")
+    return 1 if bad else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
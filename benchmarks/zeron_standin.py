@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Local Zeron DataExchange stand-in (no credentials, no VPN).
+
+Answers the POSTed <InvList> with deterministic synthetic price-group rows
+per InvCode (several groups, mixed AllowBetterPrices / PriceGroupType), in
+the response shape the ERP importer parses. Latency, 5xx failures and SKUs
+unknown to the ERP can be injected to exercise parallelism, retries and
+partial-failure reporting (tests/ use serve() with fail_skus / flaky for
+deterministic failures).
+
+  python -m benchmarks.zeron_standin --port 8765 --latency-ms 300 --fail-rate 0.1
+  ZERON_URL=http://127.0.0.1:8765/ uvicorn app.main:app ...
+
+`synthetic_tables(skus)` / `render_response(skus)` are reused by other
+benchmarks to build large offline ERP files.
+"""
+from __future__ import annotations
+
+import re
+import sys
+import time
+import random
+import hashlib
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable, Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+_INV_RE = re.compile(r"<InvCode>\s*([^<]+?)\s*</InvCode>")
+
+
+def _rng(sku: str) -> random.Random:
+    return random.Random(int(hashlib.sha1(sku.encode("utf-8")).hexdigest()[:12], 16))
+
+
+def synthetic_tables(sku: str) -> List[dict]:
+    """2-6 price-group rows for one SKU, stable across runs."""
+    r = _rng(sku)
+    base = round(r.uniform(1.0, 900.0), 2)
+    barcode = "380" + str(r.randrange(10 ** 9, 10 ** 10))
+    rows = []
+    for g in range(r.randint(2, 6)):
+        abp = r.choice(["0", "1", "1", "2", "3"])
+        rows.append({
+            "InvCode": sku,
+            "InvName": f"Артикул {sku}",
+            "Barcode": barcode,
+            "Measure": "бр.",
+            "PriceGroupCode": str(10 + g),
+            "PriceGroupType": r.choice(["10", "20", "30"]),
+            "Price": f"{base * r.uniform(0.7, 1.0):.2f}",
+            "CurrencyCode": "BGN ",
+            "FromDate": "2024-01-01T00:00:00",
+            "AllowBetterPrices": abp,
+            "InBroschure": r.choice(["0", "1"]),
+            "OnStock": str(r.randint(0, 200)),
+            "BlockedDelivery": "0",
+            "GroupID": str(r.randint(1, 400)),
+            "Trademark": r.choice(["BOSCH", "MAKITA", "GARDENA", "STANLEY", "DEWALT"]),
+            "SuppItemCode": f"SUP-{sku}",
+        })
+        if r.random() < 0.2:
+            rows[-1]["Discount"] = str(r.choice([5, 10, 15, 20]))
+    return rows
+
+
+def iter_response_parts(skus: List[str], missing_rate: float = 0.0) -> Iterator[str]:
+    yield "<Response><Destination><Operation><Success>true</Success><DataSet>"
+    for sku in skus:
+        if missing_rate and _rng(sku + "#missing").random() < missing_rate:
+            continue  # not known to the ERP
+        for row in synthetic_tables(sku):
+            yield "<Table>" + "".join(f"<{k}>{escape(v)}</{k}>" for k, v in row.items()) + "</Table>"
+    yield "</DataSet></Operation></Destination></Response>"
+
+
+def render_response(skus: List[str], missing_rate: float = 0.0) -> str:
+    return "".join(iter_response_parts(skus, missing_rate))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    latency = 0.0
+    fail_rate = 0.0
+    missing_rate = 0.0
+    fail_skus: frozenset = frozenset()
+    flaky = 0
+    stats = {"requests": 0, "failed": 0, "skus": 0, "in_flight": 0, "max_in_flight": 0}
+    _lock = threading.Lock()
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0)).decode("utf-8", errors="replace")
+        skus = _INV_RE.findall(body)
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["skus"] += len(skus)
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+            # the first `flaky` requests fail, whatever they ask for
+            flaky = self.stats["requests"] <= self.flaky
+        try:
+            if self.latency:
+                time.sleep(self.latency * random.uniform(0.5, 1.5))
+            if flaky or (self.fail_skus and self.fail_skus.intersection(skus)) or (
+                    self.fail_rate and random.random() < self.fail_rate):
+                with self._lock:
+                    self.stats["failed"] += 1
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            out = render_response(skus, self.missing_rate).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/xml; charset=utf-8")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+        finally:
+            with self._lock:
+                self.stats["in_flight"] -= 1
+
+    def log_message(self, fmt, *args):  # quiet; counters are printed on exit
+        pass
+
+
+def serve(port: int = 8765, latency_ms: float = 0.0, fail_rate: float = 0.0,
+          missing_rate: float = 0.0, host: str = "127.0.0.1",
+          fail_skus: Iterable[str] = (), flaky: int = 0) -> ThreadingHTTPServer:
+    """
+    Start the stand-in in a background thread; returns the server (call
+    .shutdown(); port 0 picks a free one, see .server_address). Requests
+    containing one of `fail_skus` always get 503, the first `flaky` requests
+    too; counters are in .RequestHandlerClass.stats.
+    """
+    handler = type("Handler", (_Handler,), {
+        "latency": latency_ms / 1000.0, "fail_rate": fail_rate, "missing_rate": missing_rate,
+        "fail_skus": frozenset(fail_skus), "flaky": int(flaky),
+        "stats": {"requests": 0, "failed": 0, "skus": 0, "in_flight": 0, "max_in_flight": 0},
+    })
+    httpd = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    ap = argparse.ArgumentParser(prog="python -m benchmarks.zeron_standin")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8765)
+    ap.add_argument("--latency-ms", type=float, default=0.0, help="mean response delay")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="share of requests answered with 503")
+    ap.add_argument("--missing-rate", type=float, default=0.0, help="share of SKUs unknown to the ERP")
+    args = ap.parse_args(argv)
+
+    httpd = serve(args.port, args.latency_ms, args.fail_rate, args.missing_rate, args.host)
+    print(f"[ZERON-STANDIN] listening on http://{args.host}:{args.port}/ (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.shutdown()
+        print(f"[ZERON-STANDIN] {httpd.RequestHandlerClass.stats}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
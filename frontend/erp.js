@@ -22,7 +22,7 @@ erpForm.addEventListener("submit", async (e) => {
 
   const file = erpFile.files[0];
   if (!file) {
-    setMessage("Моля, избери Excel файл (.xlsx или .xls).", "err");
+    setMessage("Моля, избери Excel (.xlsx, .xls) или CSV файл.", "err");
     return;
   }
 
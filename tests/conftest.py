@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+Tests run against a throw-away SQLite database: DATABASE_URL (and the Zeron
+cache) must point there before app.db is imported.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+_TMP = Path(tempfile.mkdtemp(prefix="pc_tests_"))
+os.environ["DATABASE_URL"] = f"sqlite:///{_TMP / 'test.db'}"
+os.environ["ZERON_CACHE_PATH"] = str(_TMP / "zeron_cache.sqlite3")
+os.environ["ZERON_CACHE_TTL"] = "0"
+
+
+@pytest.fixture
+def db():
+    """Fresh tables for one test; yields app.db.get_session."""
+    from app.db import Base, engine, init_db, get_session
+    init_db()
+    yield get_session
+    Base.metadata.drop_all(bind=engine)
+
+
+@pytest.fixture
+def zeron_standin():
+    """start(**serve_kwargs) -> (url, server) of a local Zeron stand-in (benchmarks.zeron_standin) on a free port."""
+    from benchmarks.zeron_standin import serve
+    servers = []
+
+    def start(**kwargs):
+        httpd = serve(0, **kwargs)
+        servers.append(httpd)
+        return f"http://127.0.0.1:{httpd.server_address[1]}/", httpd
+
+    yield start
+    for httpd in servers:
+        httpd.shutdown()
+        httpd.server_close()
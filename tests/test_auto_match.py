@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+from sqlalchemy import event, select
+
+pytest.importorskip("pydantic")
+
+from app.db import engine  # noqa: E402
+from app.models import CompetitorSite, Match, Product  # noqa: E402
+from app.scrapers.base import BaseScraper, SearchResult  # noqa: E402
+from app.services.matching import _search_queries, auto_match_for_site  # noqa: E402
+
+
+class FakeScraper(BaseScraper):
+    """Finds every barcode ending in an even digit; remembers what was searched."""
+
+    def __init__(self, site_code: str, fail: bool = False):
+        self.site_code = site_code
+        self.fail = fail
+        self.barcodes = []
+        self.item_numbers = []
+
+    async def search_by_barcode(self, barcode):
+        if self.fail:
+            raise RuntimeError("site down")
+        self.barcodes.append(barcode)
+        return SearchResult(competitor_sku=f"C-{barcode}") if int(barcode[-1]) % 2 == 0 else None
+
+    async def search_by_item_number(self, item_number, brand=None):
+        self.item_numbers.append((item_number, brand))
+        return None
+
+
+def _seed(db, n, matched_every=7, site_codes=("praktiker",)):
+    with db() as s:
+        sites = [CompetitorSite(code=c, name=c, base_url=f"https://{c}.bg") for c in site_codes]
+        s.add_all(sites)
+        s.add_all(Product(sku=f"S{i:05d}", name=f"N{i}", barcode=f"B{i:05d}") for i in range(1, n + 1))
+        s.flush()
+        for site in sites:
+            s.add_all(
+                Match(product_id=pid, site_id=site.id, competitor_sku=f"OLD{pid}")
+                for pid in range(matched_every, n + 1, matched_every)
+            )
+        s.commit()
+
+
+def test_keyset_batches_cover_every_unmatched_product_once(db):
+    """1203 products over three 500-row batches: matches made in a batch never shift the next one."""
+    _seed(db, 1203)
+    unmatched = [f"B{i:05d}" for i in range(1203, 0, -1) if i % 7]
+
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "FROM products" in statement and "NOT (EXISTS" in statement:
+            statements.append(statement)
+
+    scraper = FakeScraper("praktiker")
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        with db() as s:
+            attempted, found = asyncio.run(auto_match_for_site(s, scraper))
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert sorted(scraper.barcodes, reverse=True) == unmatched  # each once, none skipped
+    assert attempted == len(unmatched)
+    assert found == sum(1 for b in unmatched if int(b[-1]) % 2 == 0)
+    # first batch without a cursor, then "products.id < ?" until an empty page ends the run
+    assert len(statements) == 4
+    assert "products.id <" not in statements[0]
+    assert all("products.id <" in st for st in statements[1:])
+    with db() as s:
+        assert s.query(Match).count() == 1203 // 7 + found
+
+
+def test_limit_stops_inside_a_batch_at_the_newest_products(db):
+    _seed(db, 1203)
+    scraper = FakeScraper("praktiker")
+    with db() as s:
+        attempted, _ = asyncio.run(auto_match_for_site(s, scraper, limit=600))
+    assert attempted == 600
+    expected = [f"B{i:05d}" for i in range(1203, 0, -1) if i % 7][:600]
+    assert sorted(scraper.barcodes, reverse=True) == expected
+
+    # next run: the misses are backed off, so only products not searched yet are due
+    again = FakeScraper("praktiker")
+    with db() as s:
+        asyncio.run(auto_match_for_site(s, again, limit=50))
+    assert set(again.barcodes).isdisjoint(expected)
+    with db() as s:
+        site_id = s.execute(select(CompetitorSite.id)).scalar_one()
+        assert s.query(Match).filter(Match.site_id == site_id).count() >= 1203 // 7
+
+
+def test_mashinibg_searches_item_number_before_barcode(db):
+    with db() as s:
+        s.add(CompetitorSite(code="mashinibg", name="mashinibg", base_url="https://onlinemashini.bg"))
+        s.add_all([
+            Product(sku="M1", name="Бормашина", barcode="B00011", item_number="GSB 13", brand="Bosch"),
+            Product(sku="M2", name="Винт", barcode="B00022", item_number=" ", brand="Bosch"),
+        ])
+        s.commit()
+        m1 = s.execute(select(Product).where(Product.sku == "M1")).scalar_one()
+        assert _search_queries("mashinibg", m1) == {"barcode": "B00011", "item_number": "GSB 13 Bosch"}
+        assert _search_queries("praktiker", m1) == {"barcode": "B00011"}
+
+    scraper = FakeScraper("mashinibg")
+    with db() as s:
+        attempted, found = asyncio.run(auto_match_for_site(s, scraper))
+    # item number first (a miss), then the barcode fallback; no item number -> barcode only
+    assert scraper.item_numbers == [("GSB 13", "Bosch")]
+    assert sorted(scraper.barcodes) == ["B00011", "B00022"]
+    assert (attempted, found) == (2, 1)
+    with db() as s:
+        m = s.execute(select(Match)).scalar_one()
+        assert (m.competitor_sku, m.competitor_barcode) == ("C-B00022", "B00022")
+
+
+class BrokenScraper(FakeScraper):
+    def is_pdp_url(self, url):
+        raise RuntimeError("broken parser")
+
+
+def test_auto_all_runs_sites_and_reports_progress(db, monkeypatch):
+    pytest.importorskip("fastapi")
+    pytest.importorskip("httpx")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.routers import matching as matching_router
+    from app.scrapers.base import ScraperRegistry
+    from app.services import matching
+
+    _seed(db, 30, site_codes=("praktiker", "mrbricolage", "praktis", "unknown"))
+    reg = ScraperRegistry()
+    reg.register("praktiker", FakeScraper("praktiker"))
+    reg.register("mrbricolage", BrokenScraper("mrbricolage"))
+    reg.register("praktis", FakeScraper("praktis"))
+    monkeypatch.setattr(matching_router, "registry", reg)
+    monkeypatch.setattr(matching, "AUTO_PROGRESS", {})
+    monkeypatch.setattr(matching_router, "AUTO_PROGRESS", matching.AUTO_PROGRESS)
+
+    app = FastAPI()
+    app.include_router(matching_router.router, prefix="/api")
+    client = TestClient(app)
+
+    results = {r["site_code"]: r for r in client.post("/api/matches/auto_all").json()}
+    unmatched = [f"B{i:05d}" for i in range(1, 31) if i % 7]
+    hits = sum(1 for b in unmatched if int(b[-1]) % 2 == 0)
+    assert set(results) == {"praktiker", "mrbricolage"}  # praktis is ours, unknown has no scraper
+    assert (results["praktiker"]["attempted"], results["praktiker"]["found"]) == (len(unmatched), hits)
+    assert (results["mrbricolage"]["attempted"], results["mrbricolage"]["found"]) == (0, 0)
+    assert reg.get("praktis").barcodes == []
+
+    progress = client.get("/api/matches/auto_all/progress").json()
+    assert set(progress) == {"praktiker", "mrbricolage", "unknown"}
+    assert progress["unknown"]["state"] == "skipped"  # not left "queued"
+    p = progress["praktiker"]
+    assert (p["state"], p["attempted"], p["found"], p["backed_off"]) == ("done", len(unmatched), hits, 0)
+    assert progress["mrbricolage"]["state"] == "failed"
+    assert progress["mrbricolage"]["error"] == "broken parser"
+
+    # second run: every miss is backed off and reported as such
+    client.post("/api/matches/auto_all")
+    p = client.get("/api/matches/auto_all/progress").json()["praktiker"]
+    assert (p["state"], p["attempted"], p["found"], p["backed_off"]) == ("done", 0, 0, len(unmatched) - hits)
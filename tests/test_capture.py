@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import time
+
+import pytest
+
+from app.scrapers import capture
+from app.scrapers.capture import CaptureMiss, CaptureStore
+
+URL = "https://praktiker.bg/search?text=4006381333931"
+
+
+def test_put_latest_round_trip(tmp_path):
+    store = CaptureStore(tmp_path)
+    store.put("praktiker", URL, "<html>стара</html>")
+    sha = store.put("praktiker", URL, "<html>нова</html>", kind="search")
+    store.put("praktiker", URL + "&p=2", "<html>нова</html>")
+
+    page = store.latest("praktiker", URL)
+    assert (page.sha, page.kind) == (sha, "search")
+    assert store.read(page) == "<html>нова</html>"
+    assert store.latest("mrbricolage", URL) is None
+    # same content is stored once
+    assert store.stats() == {"praktiker/search": {"captures": 3, "urls": 2, "blobs": 2}}
+
+
+def test_replay_serves_stored_page_without_network(tmp_path, monkeypatch):
+    pytest.importorskip("selectolax")
+    httpx = pytest.importorskip("httpx")
+    pytest.importorskip("tenacity")
+    from app.scrapers.praktiker import PraktikerScraper
+
+    async def no_network(*args, **kwargs):
+        raise AssertionError("network access in replay mode")
+
+    class NoBucket:
+        async def take(self, n=1.0):
+            raise AssertionError("rate limiting in replay mode")
+
+    store = CaptureStore(tmp_path)
+    store.put("praktiker", URL, "<html>captured</html>")
+    monkeypatch.setattr(capture, "store", store)
+    monkeypatch.setattr(capture, "CAPTURE_ENABLED", True)
+    monkeypatch.setattr(httpx.AsyncClient, "send", no_network)
+    scraper = PraktikerScraper()
+    scraper._bucket = NoBucket()
+
+    async def run():
+        t0 = time.perf_counter()
+        pages = await asyncio.gather(*(scraper._throttled(URL, "search") for _ in range(20)))
+        return pages, time.perf_counter() - t0
+
+    with capture.replay_mode():
+        assert capture.replaying()
+        pages, elapsed = asyncio.run(run())
+        with pytest.raises(CaptureMiss):
+            asyncio.run(scraper._throttled(URL + "&p=9", "search"))
+    assert not capture.replaying()
+
+    assert pages == ["<html>captured</html>"] * 20
+    assert elapsed < 1.0  # no jitter sleeps
+    # replayed pages are not captured again
+    assert store.stats()["praktiker/search"]["captures"] == 1
@@ -0,0 +1,44 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+from app.models import CompetitorCatalogItem, CompetitorSite, Match, PriceSnapshot, Product
+from app.services.catalog import CATALOG_FRESH_HOURS, catalog_fresh_match_ids, resolve_catalog_matches
+
+U = "https://t.example/p/"
+
+
+def test_fresh_match_ids_equal_resolved_matches(db):
+    now = datetime.utcnow()
+    old = now - timedelta(hours=CATALOG_FRESH_HOURS + 1)
+    with db() as s:
+        s.add_all([CompetitorSite(id=1, code="t", name="T", base_url="https://t.example"),
+                   CompetitorSite(id=2, code="o", name="O", base_url="https://o.example")])
+        s.add_all(Product(id=i, sku=f"S{i}", name=f"N{i}") for i in range(1, 9))
+        s.add_all([
+            Match(id=1, product_id=1, site_id=1, competitor_sku="C1"),                   # 1) by SKU
+            Match(id=2, product_id=2, site_id=1, competitor_barcode="B2", pdp_url=U + "2"),  # 2) by pdp_url
+            Match(id=3, product_id=3, site_id=1, competitor_barcode="B3"),               # 3) snapshot URL, barcode key
+            Match(id=4, product_id=4, site_id=1, competitor_sku="C4"),                   # 3) snapshot URL, SKU key
+            Match(id=5, product_id=5, site_id=1, competitor_sku="C5"),                   # catalogue row is stale
+            Match(id=6, product_id=6, site_id=1, competitor_sku="C6"),                   # not in the catalogue
+            Match(id=7, product_id=7, site_id=2, competitor_sku="C1"),                   # other site
+        ])
+        s.add_all([
+            CompetitorCatalogItem(site_id=1, competitor_sku="C1", url=U + "1", seen_at=now),
+            CompetitorCatalogItem(site_id=1, competitor_sku=None, url=U + "2", seen_at=now),
+            CompetitorCatalogItem(site_id=1, competitor_sku=None, url=U + "3", seen_at=now),
+            CompetitorCatalogItem(site_id=1, competitor_sku=None, url=U + "4", seen_at=now),
+            CompetitorCatalogItem(site_id=1, competitor_sku="C5", url=U + "5", seen_at=old),
+        ])
+        s.add_all([
+            PriceSnapshot(site_id=1, competitor_barcode="B3", url=U + "3"),
+            PriceSnapshot(site_id=1, competitor_sku="C4", url=U + "4"),
+            PriceSnapshot(site_id=1, competitor_sku="C6", url=U + "6"),
+            PriceSnapshot(site_id=2, competitor_sku="C1", url=U + "1"),
+        ])
+        s.commit()
+
+        since = now - timedelta(hours=CATALOG_FRESH_HOURS)
+        resolved = {m.id for m, _ in resolve_catalog_matches(s, 1, since)}
+        assert resolved == {1, 2, 3, 4}
+        assert catalog_fresh_match_ids(s, 1) == resolved
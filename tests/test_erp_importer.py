@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy import event
+
+pytest.importorskip("httpx")
+
+from app.models import Product  # noqa: E402
+from app.services import erp_importer  # noqa: E402
+from app.services.erp_importer import ErpImporter, ImportResult, ItemsXmlSource  # noqa: E402
+
+XML = (
+    "<items>"
+    "<item><sku>A1</sku><barcode>4006381333931</barcode><name>Боя</name><price_regular>12,50</price_regular></item>"
+    "<item><sku>A2</sku><name>Лак</name><price_regular>3.10</price_regular><price_promo>2.90</price_promo></item>"
+    "</items>"
+)
+
+
+def test_items_feed_created_then_unchanged(db):
+    first = ErpImporter().run_sync(ItemsXmlSource(XML))
+    assert (first.rows, first.created, first.unchanged) == (2, 2, 0)
+    again = ErpImporter().run_sync(ItemsXmlSource(XML))
+    assert (again.created, again.updated, again.unchanged) == (0, 0, 2)
+    with db() as s:
+        assert {p.sku: p.price_regular for p in s.query(Product)} == {"A1": 12.5, "A2": 3.1}
+
+
+def test_legacy_feed_upserts_off_the_event_loop(db, monkeypatch):
+    """app.erp.parse_erp_xml_and_upsert: the caller's session is not touched, the loop is not blocked."""
+    from app.erp import parse_erp_xml_and_upsert
+
+    threads = set()
+    real = erp_importer.bulk_upsert_products
+
+    def upsert(*args, **kwargs):
+        threads.add(threading.get_ident())
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(erp_importer, "bulk_upsert_products", upsert)
+    used = []
+    with db() as s:
+        event.listen(s, "do_orm_execute", lambda state: used.append(state))
+        assert asyncio.run(parse_erp_xml_and_upsert(XML, s)) == (2, 0)
+        assert used == []
+        assert s.query(Product).count() == 2  # committed by the import
+    assert threads and threading.get_ident() not in threads
+
+
+def test_as_dict_caps_changed_skus(monkeypatch):
+    monkeypatch.setattr(erp_importer, "CHANGED_SKUS_SAMPLE", 3)
+    result = ImportResult(source="items", changed_skus=[f"S{i}" for i in range(9, -1, -1)])
+    out = result.as_dict()
+    assert out["changed_count"] == 10
+    assert out["changed_skus"] == ["S0", "S1", "S2"]
+    assert len(result.changed_skus) == 10  # listeners still get every SKU
+
+
+def test_items_feed_detaches_processed_items(monkeypatch):
+    roots = []
+    real = erp_importer.ET.iterparse
+
+    def tracking(source, events=("end",)):
+        for ev, el in real(source, events=("start", "end")):
+            if not roots:
+                roots.append(el)  # first start event: the document root
+            if ev in events:
+                yield ev, el
+
+    monkeypatch.setattr(erp_importer.ET, "iterparse", tracking)
+    xml = "<items>" + "".join(f"<item><sku>S{i}</sku><price_regular>{i}</price_regular></item>" for i in range(5000)) + "</items>"
+    attached = []
+    for n, row in enumerate(ItemsXmlSource(xml).rows()):
+        assert row["sku"] == f"S{n}"
+        attached.append(len(roots[0]))
+    assert len(attached) == 5000
+    # only the parser's read-ahead is ever attached to <items>, never the processed items
+    assert max(attached) < 1000
+    assert len(roots[0]) == 0
@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+from sqlalchemy import event, select
+
+pytest.importorskip("fastapi")
+pytest.importorskip("httpx")
+
+from app.db import engine  # noqa: E402
+from app.models import Product  # noqa: E402
+from app.routers import erp  # noqa: E402
+from app.services import erp_importer  # noqa: E402
+from app.services.zeron_client import ZeronFetchResult  # noqa: E402
+
+
+def test_failed_windows_do_not_grow_the_window_query(db, monkeypatch):
+    """2500 due products, Zeron answers one SKU per window: >2100 skipped ids, small queries."""
+    with db() as s:
+        s.add_all(Product(sku=f"S{i:05d}", name=f"N{i}") for i in range(2500))
+        s.commit()
+
+    calls = []
+
+    async def fake_fetch(skus, force_refresh=False):
+        calls.append(len(skus))
+        res = ZeronFetchResult()
+        res.data = {skus[0]: {"sku": skus[0], "name": "X", "price": 1.0}}
+        res.failed_chunks.append({"skus": list(skus[1:]), "error": "timeout"})
+        return res
+
+    monkeypatch.setattr(erp_importer, "fetch_zeron_for_skus_async", fake_fetch)
+    monkeypatch.setattr(erp, "_REFRESH_STOP", {"stop": False})
+
+    params = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT") and "erp_refreshed_at" in statement:
+            params.append(len(parameters or ()))
+
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        asyncio.run(erp._refresh_pass(window=1000, max_age_h=20, force_refresh=False))
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert calls == [1000, 1000, 500]
+    assert erp.REFRESH_PROGRESS["failed_skus"] == 2497
+    assert max(params) < 20
+    with db() as s:
+        not_refreshed = s.execute(select(Product.id).where(Product.erp_refreshed_at.is_(None))).all()
+    # failed SKUs stay due for the next pass
+    assert len(not_refreshed) == 2497
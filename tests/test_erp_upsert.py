@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+from sqlalchemy import event, select, update
+from sqlalchemy.dialects import mssql
+
+from app.db import engine
+from app.models import Product
+from app.services.erp_upsert import bulk_upsert_products, _stage_ddl
+
+
+def _rows():
+    return [
+        {"sku": "A1", "name": "Бормашина", "barcode": "4006381333931", "price_regular": 10.5},
+        {"sku": "A2", "name": "Ъглошлайф", "price_regular": 20.0, "price_promo": 18.0},
+        {"sku": "A3", "name": "Винт", "brand": "X"},
+    ]
+
+
+def _writes():
+    """Records INSERT / UPDATE statements sent to the database."""
+    seen = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("INSERT", "UPDATE")):
+            seen.append(statement)
+
+    return seen, record
+
+
+def test_counts_and_reupsert_rewrites_nothing(db):
+    stats = bulk_upsert_products(_rows(), chunk_size=2)
+    assert (stats["created"], stats["updated"], stats["unchanged"]) == (3, 0, 0)
+    assert sorted(stats["changed_skus"]) == ["A1", "A2", "A3"]
+
+    rows = _rows()
+    rows[1]["name"] = "Ъглошлайф 125"
+    rows.append({"sku": "A4", "name": "Нов"})
+    stats = bulk_upsert_products(rows, chunk_size=2)
+    assert (stats["created"], stats["updated"], stats["unchanged"]) == (1, 1, 2)
+    assert sorted(stats["changed_skus"]) == ["A2", "A4"]
+
+    with db() as s:
+        before = dict(s.execute(select(Product.sku, Product.updated_at)).all())
+
+    seen, record = _writes()
+    event.listen(engine, "before_cursor_execute", record)
+    try:
+        stats = bulk_upsert_products(rows, chunk_size=2)
+    finally:
+        event.remove(engine, "before_cursor_execute", record)
+
+    assert (stats["created"], stats["updated"], stats["unchanged"]) == (0, 0, 4)
+    assert stats["changed_skus"] == []
+    assert seen == []
+    with db() as s:
+        assert dict(s.execute(select(Product.sku, Product.updated_at)).all()) == before
+        p = s.execute(select(Product).where(Product.sku == "A2")).scalar_one()
+        assert (p.name, p.price_promo) == ("Ъглошлайф 125", 18.0)
+
+
+def test_missing_keys_keep_stored_values(db):
+    bulk_upsert_products(_rows())
+    stats = bulk_upsert_products([{"sku": "A1", "price_regular": 11.0}])
+    assert stats["updated"] == 1
+    with db() as s:
+        p = s.execute(select(Product).where(Product.sku == "A1")).scalar_one()
+        assert (p.name, p.barcode, p.gtin14, p.price_regular) == ("Бормашина", "4006381333931", "04006381333931", 11.0)
+
+
+def test_mssql_stage_is_sized_like_the_model():
+    ddl = _stage_ddl(mssql.dialect())
+    assert "sku NVARCHAR(64)" in ddl
+    assert "brand NVARCHAR(128)" in ddl
+    assert "erp_hash NVARCHAR(40)" in ddl
+    # only the Text column (products.name) is unbounded
+    assert ddl.count("MAX") == 1 and "name NVARCHAR(MAX)" in ddl
+
+
+def test_price_only_change_is_changed(db):
+    bulk_upsert_products(_rows())
+    rows = _rows()
+    rows[0]["price_regular"] = 9.99
+    stats = bulk_upsert_products(rows)
+    assert (stats["updated"], stats["unchanged"], stats["price_changes"]) == (1, 2, 1)
+    assert stats["changed_skus"] == ["A1"]
+
+
+def test_null_erp_hash_is_backfilled_not_changed(db):
+    """Products stored before erp_hash existed: same values -> hash only, not in the delta."""
+    bulk_upsert_products(_rows())
+    with db() as s:
+        s.execute(update(Product).values(erp_hash=None))
+        before = dict(s.execute(select(Product.sku, Product.updated_at)).all())
+        s.commit()
+
+    stats = bulk_upsert_products(_rows())
+    assert (stats["created"], stats["updated"], stats["unchanged"]) == (0, 0, 3)
+    assert stats["changed_skus"] == []
+    with db() as s:
+        assert dict(s.execute(select(Product.sku, Product.updated_at)).all()) == before
+        assert None not in s.execute(select(Product.erp_hash)).scalars().all()
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+import pytest
+from sqlalchemy import event
+
+pytest.importorskip("pydantic")
+
+from app.db import engine  # noqa: E402
+from app.models import CompetitorSite, Match, Product  # noqa: E402
+from app.schemas import MatchSuggestionConfirm  # noqa: E402
+from app.services.fuzzy_match import _product_rows  # noqa: E402
+from app.services.matching import UnresolvableSuggestion, confirm_suggestion  # noqa: E402
+
+
+class _Scraper:
+    def is_pdp_url(self, url):
+        return "/p/" in (url or "")
+
+
+@pytest.fixture
+def site(db):
+    with db() as s:
+        s.add(CompetitorSite(code="t", name="T", base_url="https://t.example"))
+        s.add(Product(id=1, sku="A", name="Боя", barcode="4006381333931"))
+        s.commit()
+        yield s
+
+
+def _confirm(s, **kw):
+    return confirm_suggestion(s, MatchSuggestionConfirm(product_id=1, site_code="t", **kw), _Scraper())
+
+
+def test_confirm_by_competitor_sku(site):
+    out = _confirm(site, competitor_sku="C-1", competitor_url="https://t.example/p/1")
+    m = site.get(Match, out.id)
+    assert (m.competitor_sku, m.competitor_barcode, m.pdp_url) == ("C-1", None, "https://t.example/p/1")
+
+
+def test_confirm_without_keys_needs_pdp_url(site):
+    with pytest.raises(UnresolvableSuggestion):
+        _confirm(site, competitor_url="https://t.example/search?q=boya")
+    assert site.query(Match).count() == 0
+
+    out = _confirm(site, competitor_url="https://t.example/p/7")
+    m = site.get(Match, out.id)
+    # never our own EAN as the competitor key
+    assert (m.competitor_sku, m.competitor_barcode, m.pdp_url) == (None, None, "https://t.example/p/7")
+
+
+def test_product_rows_chunks_large_id_lists(db):
+    with db() as s:
+        s.add(CompetitorSite(id=1, code="t", name="T", base_url="https://t.example"))
+        s.add_all(Product(id=i, sku=f"S{i}", name=f"N{i}") for i in range(1, 3001))
+        s.commit()
+        params = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            params.append(len(parameters or ()))
+
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            rows = _product_rows(s, 1, list(range(3000, 0, -1)) + [99999])
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+    assert [r[0] for r in rows] == list(range(1, 3001))
+    assert max(params) < 2100
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from app.services.gtin import backfill_gtin14, gtin_index, gtin_query, to_gtin14
+
+
+@pytest.mark.parametrize("raw", ["96385074", "9638 5074", "00000096385074", "000000000096385074"])
+def test_spellings_of_one_ean8_map_to_one_gtin(raw):
+    assert to_gtin14(raw) == "00000096385074"
+
+
+@pytest.mark.parametrize("raw", ["4006381333931", "04006381333931", "400-6381-333931"])
+def test_ean13(raw):
+    assert to_gtin14(raw) == "04006381333931"
+
+
+@pytest.mark.parametrize("raw", [
+    "4006381333932",        # wrong check digit: not "corrected"
+    "96385075",
+    "9638507",              # 7 digits (no check digit)
+    "963850741",            # 9-11 digits
+    "9638507412",
+    "96385074123",
+    "боя 9638507",          # free text with digits
+    "ABC96385074",
+    "00000000",
+    "",
+    None,
+])
+def test_not_a_gtin(raw):
+    assert to_gtin14(raw) is None
+
+
+def test_gtin_query_only_for_exact_barcodes():
+    assert gtin_query(" 4006381333931 ") == "04006381333931"
+    assert gtin_query("боя 96385074") is None
+    assert gtin_query("4006381333932") is None
+    assert gtin_query("96385") is None
+
+
+def test_backfill_corrects_values_from_older_rules(db):
+    from app.models import Product
+    with db() as s:
+        s.add_all([
+            Product(sku="A", name="a", barcode="4006381333931", gtin14=None),
+            Product(sku="B", name="b", barcode="4006381333932", gtin14="04006381333931"),  # old "corrected" typo
+            Product(sku="C", name="c", barcode="96385074", gtin14="00000096385074"),
+        ])
+        s.commit()
+        assert backfill_gtin14(s) == 2
+        got = {p.sku: p.gtin14 for p in s.query(Product)}
+        assert got == {"A": "04006381333931", "B": None, "C": "00000096385074"}
+        gtin_index.invalidate()
+        assert gtin_index.product_ids(s, "4006381333931") == [s.query(Product).filter_by(sku="A").one().id]
@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+import time
+
+import pytest
+
+for _mod in ("httpx", "selectolax", "tenacity", "cloudscraper"):
+    pytest.importorskip(_mod)
+
+from app.scrapers import mashinibg  # noqa: E402
+
+
+class _Response:
+    status_code = 200
+    cookies = {}
+    text = ""
+
+    def raise_for_status(self):
+        pass
+
+
+class _Session:
+    def __init__(self):
+        self.headers = {}
+        self.cookies = _Cookies()
+        self.closed = False
+
+    def get(self, url, timeout=None):
+        return _Response()
+
+    def close(self):
+        self.closed = True
+
+
+class _Cookies(dict):
+    def get_dict(self):
+        return dict(self)
+
+
+def test_session_aged_out_while_idle_is_not_reused(monkeypatch, tmp_path):
+    monkeypatch.setattr(mashinibg.cloudscraper, "create_scraper", _Session)
+    monkeypatch.setattr(mashinibg, "COOKIE_DIR", tmp_path)
+    pool = mashinibg._SessionPool(1)
+
+    first = pool._acquire()
+    pool._release(first)
+    assert pool._acquire() is first
+    pool._release(first)
+
+    first.created = time.monotonic() - mashinibg.SESSION_MAX_AGE - 1  # expired while idle
+    second = pool._acquire()
+    assert second is not first
+    assert first.session.closed
+    assert pool.stats["recycled"] == 1
+    assert pool.stats["created"] == 2
+
+
+def test_session_that_failed_warm_up_is_discarded(monkeypatch, tmp_path):
+    blocked = {"on": True}
+
+    class _Challenged(_Response):
+        status_code = 403
+
+    class _Blockable(_Session):
+        def get(self, url, timeout=None):
+            return _Challenged() if blocked["on"] else _Response()
+
+    sessions = []
+
+    def create():
+        sessions.append(_Blockable())
+        return sessions[-1]
+
+    monkeypatch.setattr(mashinibg.cloudscraper, "create_scraper", create)
+    monkeypatch.setattr(mashinibg, "COOKIE_DIR", tmp_path)
+    pool = mashinibg._SessionPool(1)
+
+    pool.warm_one()
+    assert pool._idle.empty()
+    with pytest.raises(RuntimeError):
+        pool.fetch("https://www.onlinemashini.bg/x")
+    assert all(s.closed for s in sessions)
+    assert (pool.stats["warm_failures"], pool.stats["created"]) == (2, 0)
+
+    blocked["on"] = False  # the slot was given back: the next session is created normally
+    pool.fetch("https://www.onlinemashini.bg/x")
+    assert pool.stats["created"] == 1
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from datetime import timedelta
+
+import pytest
+from sqlalchemy import select
+
+from app.models import CompetitorSite, MatchAttempt, Product
+from app.services.match_attempts import BACKOFF_DAYS, AttemptLog, backoff_for
+
+
+@pytest.fixture
+def ids(db):
+    with db() as s:
+        site = CompetitorSite(code="praktiker", name="Praktiker", base_url="https://praktiker.bg")
+        product = Product(sku="S1", name="Боя", barcode="4006381333931")
+        s.add_all([site, product])
+        s.commit()
+        return site.id, product.id
+
+
+def _record_miss(db, ids):
+    with db() as s:
+        AttemptLog(s, ids[0], [ids[1]]).record(ids[1], "barcode", "4006381333931", found=False)
+        s.commit()
+
+
+def test_recent_miss_is_skipped(db, ids):
+    _record_miss(db, ids)
+    with db() as s:
+        log = AttemptLog(s, ids[0], [ids[1]])
+        assert not log.due(ids[1], "barcode", "4006381333931")
+        assert log.is_backed_off(ids[1], {"barcode": "4006381333931", "item_number": None})
+        # a different barcode is a new query: searched right away
+        assert log.due(ids[1], "barcode", "5901234123457")
+        assert AttemptLog(s, ids[0], [ids[1]], respect_backoff=False).due(ids[1], "barcode", "4006381333931")
+
+
+def test_miss_older_than_backoff_is_due(db, ids):
+    _record_miss(db, ids)
+    with db() as s:
+        a = s.execute(select(MatchAttempt)).scalar_one()
+        a.attempted_at -= timedelta(days=BACKOFF_DAYS[0] + 1)
+        a.next_attempt_at -= timedelta(days=BACKOFF_DAYS[0] + 1)
+        s.commit()
+    with db() as s:
+        log = AttemptLog(s, ids[0], [ids[1]])
+        assert log.due(ids[1], "barcode", "4006381333931")
+
+
+def test_second_miss_backs_off_longer_and_success_clears(db, ids):
+    _record_miss(db, ids)
+    with db() as s:
+        log = AttemptLog(s, ids[0], [ids[1]])
+        log.record(ids[1], "barcode", "4006381333931", found=False)
+        a = log._rows[(ids[1], "barcode")]
+        assert a.failures == 2
+        assert a.next_attempt_at - log.now == backoff_for(2)
+        log.record(ids[1], "barcode", "4006381333931", found=True)
+        s.commit()
+
+    with db() as s:
+        log = AttemptLog(s, ids[0], [ids[1]])
+        a = log._rows[(ids[1], "barcode")]
+        assert (a.outcome, a.failures, a.next_attempt_at) == ("found", 0, None)
+        assert log.due(ids[1], "barcode", "4006381333931")
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+pytest.importorskip("pydantic")
+
+from app.db import engine  # noqa: E402
+from app.models import CompetitorSite, Match, PriceSnapshot, Product  # noqa: E402
+from app.services.matching import get_matches_for_product_ids  # noqa: E402
+
+
+def _seed(s):
+    now = datetime.utcnow()
+    site = CompetitorSite(code="praktiker", name="Praktiker", base_url="https://praktiker.bg")
+    other = CompetitorSite(code="mrbricolage", name="Mr. Bricolage", base_url="https://mr-bricolage.bg")
+    s.add_all([site, other])
+    products = [Product(sku=f"P{i}", name=f"Продукт {i}", barcode=f"38000{i}") for i in range(1, 6)]
+    s.add_all(products)
+    s.flush()
+    p1, p2, p3, p4, p5 = products
+    s.add_all([
+        Match(product_id=p1.id, site_id=site.id, competitor_sku="K1"),
+        Match(product_id=p2.id, site_id=site.id, competitor_barcode="G2"),
+        Match(product_id=p3.id, site_id=site.id, competitor_sku="K3", competitor_barcode="G3"),
+        Match(product_id=p4.id, site_id=site.id, competitor_sku="K4"),   # not on the page
+        Match(product_id=p5.id, site_id=other.id, competitor_sku="K1"),  # other site
+    ])
+    s.add_all([
+        PriceSnapshot(site_id=site.id, competitor_sku="K1", name="K1 old", url="u/k1-old", ts=now - timedelta(days=2)),
+        PriceSnapshot(site_id=site.id, competitor_sku="K1", name="K1 new", url="u/k1", ts=now - timedelta(days=1)),
+        PriceSnapshot(site_id=other.id, competitor_sku="K1", name="K1 elsewhere", ts=now),
+        PriceSnapshot(site_id=site.id, competitor_barcode="G2", name="G2", url="u/g2", ts=now - timedelta(hours=3)),
+        # K3 has no sku snapshot: the barcode one fills in
+        PriceSnapshot(site_id=site.id, competitor_barcode="G3", name="G3 by barcode", url="u/g3", ts=now),
+        PriceSnapshot(site_id=site.id, competitor_sku="K4", name="K4", ts=now),
+    ])
+    # history of keys that are not on the page
+    s.add_all(
+        PriceSnapshot(site_id=site.id, competitor_sku=f"X{i % 50}", competitor_barcode=f"Y{i % 50}",
+                      name="x", ts=now - timedelta(minutes=i))
+        for i in range(500)
+    )
+    s.commit()
+    return site, [p1.id, p2.id, p3.id]
+
+
+def test_page_lookup_returns_latest_snapshot_per_key(db):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if "max(price_snapshots.ts)" in statement:
+            statements.append(statement)
+
+    with db() as s:
+        site, page = _seed(s)
+        event.listen(engine, "before_cursor_execute", record)
+        try:
+            rows = get_matches_for_product_ids(s, "praktiker", page)
+        finally:
+            event.remove(engine, "before_cursor_execute", record)
+
+    got = {r.product_sku: (r.competitor_sku, r.competitor_barcode, r.competitor_name, r.competitor_url) for r in rows}
+    assert got == {
+        "P1": ("K1", None, "K1 new", "u/k1"),
+        "P2": (None, "G2", "G2", "u/g2"),
+        "P3": ("K3", "G3", "G3 by barcode", "u/g3"),
+    }
+    assert all(r.site_code == "praktiker" for r in rows)
+
+    # one round trip; both group-bys are restricted to the page's keys
+    assert len(statements) == 1
+    assert "price_snapshots.competitor_sku IN (SELECT" in statements[0]
+    assert "price_snapshots.competitor_barcode IN (SELECT" in statements[0]
+
+
+def test_empty_page(db):
+    with db() as s:
+        _seed(s)
+        assert get_matches_for_product_ids(s, "praktiker", []) == []
+        assert get_matches_for_product_ids(s, "praktiker", [999]) == []
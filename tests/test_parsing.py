@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+import asyncio
+from concurrent.futures import Future
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+
+import pytest
+
+for _mod in ("httpx", "selectolax", "tenacity", "cloudscraper"):
+    pytest.importorskip(_mod)
+
+from app.scrapers import mashinibg, mrbricolage, praktiker  # noqa: E402
+from app.scrapers.parsing import ParsePool  # noqa: E402
+
+CORPUS = Path(__file__).resolve().parent.parent / "benchmarks" / "corpus"
+
+# the parsers scrapers hand to parse(), with their saved pages
+CASES = [
+    (praktiker.parse_search_page, "praktiker_search"),
+    (praktiker.parse_pdp_page, "praktiker_pdp"),
+    (mrbricolage.parse_search_page, "mrbricolage_search"),
+    (mashinibg._parse_search_card, "mashinibg_search"),
+    (mashinibg._parse_pdp, "mashinibg_pdp"),
+]
+
+
+def _calls():
+    return [
+        (fn, path.read_text(encoding="utf-8"))
+        for fn, corpus in CASES
+        for path in sorted((CORPUS / corpus).glob("*.html"))
+    ]
+
+
+def _run_all(pool, calls):
+    async def go():
+        return await asyncio.gather(*(pool.run(fn, html) for fn, html in calls))
+    try:
+        return asyncio.run(go())
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.parametrize("mode", ["thread", "inline"])
+def test_pool_matches_direct_parsing(mode):
+    calls = _calls()
+    assert len(calls) > 10
+    expected = [fn(html) for fn, html in calls]
+    pool = ParsePool(mode=mode, workers=2, batch_size=4, batch_wait_ms=5)
+    assert _run_all(pool, calls) == expected
+    assert pool.stats["calls"] == len(calls)
+    assert pool.stats["inline_fallbacks"] == 0
+    if mode == "thread":
+        # full batches flush at batch_size, the remainder on the timer
+        assert pool.stats["batches"] == -(-len(calls) // 4)
+    else:
+        assert pool.stats["batches"] == 0
+
+
+def test_timer_flushes_a_partial_batch():
+    pool = ParsePool(mode="thread", batch_size=100, batch_wait_ms=20)
+    assert _run_all(pool, [(len, "abc"), (len, "de")]) == [3, 2]
+    assert pool.stats["batches"] == 1
+
+
+def test_errors_stay_with_their_call():
+    pool = ParsePool(mode="thread", batch_size=2)
+
+    async def go():
+        return await asyncio.gather(pool.run(int, "x"), pool.run(int, "7"), return_exceptions=True)
+
+    bad, good = asyncio.run(go())
+    pool.shutdown()
+    assert isinstance(bad, ValueError) and good == 7
+
+
+class _BrokenExecutor:
+    def __init__(self, on_submit):
+        self.on_submit = on_submit
+        self.shut = False
+
+    def submit(self, fn, *args):
+        if self.on_submit:
+            raise BrokenProcessPool("pool is broken")
+        f = Future()
+        f.set_exception(BrokenProcessPool("worker died"))
+        return f
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut = True
+
+
+@pytest.mark.parametrize("on_submit", [True, False], ids=["submit", "result"])
+def test_broken_process_pool_falls_back_to_inline(on_submit):
+    calls = _calls()[:6]
+    pool = ParsePool(mode="process", batch_size=6)
+    broken = _BrokenExecutor(on_submit)
+    pool._executor = broken
+    assert _run_all(pool, calls) == [fn(html) for fn, html in calls]
+    assert pool.stats["inline_fallbacks"] == 6
+    assert broken.shut and pool._executor is None
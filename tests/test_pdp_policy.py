@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from app.models import CompetitorSite, PriceSnapshot
+from app.scrapers import pdp_policy
+from app.scrapers.pdp_policy import PdpPolicy
+from app.services.comparison import _seed_pdp_policy
+
+
+def test_reasons_in_order(monkeypatch):
+    policy = PdpPolicy("praktiker", sample_rate=0.5)
+    policy.seed(["K1", None, ""])
+    monkeypatch.setattr(pdp_policy.random, "random", lambda: 0.1)  # every sample draw hits
+
+    assert policy.decide("K1", has_price=True, has_label=True) == (False, "card_complete")
+    # a missing price wins over label history and sampling
+    assert policy.decide("K1", has_price=False, has_label=False) == (True, "missing_price")
+    assert policy.decide("K1", has_price=True, has_label=False) == (True, "label_history")
+    assert policy.decide("K2", has_price=True, has_label=False) == (True, "sample")
+
+    monkeypatch.setattr(pdp_policy.random, "random", lambda: 0.9)
+    assert policy.decide("K2", has_price=True, has_label=False) == (False, "no_label_expected")
+
+    stats = policy.stats()
+    assert (stats["pdp_made"], stats["pdp_avoided"], stats["label_keys_tracked"]) == (3, 1, 1)
+    assert stats["reasons"] == {"missing_price": 1, "label_history": 1, "sample": 1, "no_label_expected": 1}
+
+
+def test_seed_observe_and_ttl(monkeypatch):
+    policy = PdpPolicy("mrbricolage", sample_rate=0.0, label_ttl_days=1)
+    assert not policy.seeded
+    policy.seed(["K1"])
+    assert policy.seeded
+
+    policy.observe("K2", card_label=None, pdp_label="Промо")   # PDP-only label: remember
+    policy.observe("K1", card_label=None, pdp_label=None)      # PDP without label: forget
+    assert policy.decide("K1", True, False) == (False, "no_label_expected")
+    assert policy.decide("K2", True, False) == (True, "label_history")
+
+    now = pdp_policy.time.monotonic()
+    monkeypatch.setattr(pdp_policy.time, "monotonic", lambda: now + 86400 + 1)
+    assert policy.decide("K2", True, False) == (False, "no_label_expected")
+    assert policy.stats()["label_keys_tracked"] == 0
+
+
+def test_from_env(monkeypatch):
+    monkeypatch.setenv("PRAKTIKER_PDP_SAMPLE_RATE", "2")
+    monkeypatch.setenv("PRAKTIKER_PDP_LABEL_TTL_DAYS", "7")
+    policy = PdpPolicy.from_env("praktiker")
+    assert (policy.sample_rate, policy.label_ttl) == (1.0, 7 * 86400.0)
+
+
+def test_seeded_from_recent_labelled_snapshots(db):
+    with db() as s:
+        site = CompetitorSite(code="praktiker", name="Praktiker", base_url="https://praktiker.bg")
+        other = CompetitorSite(code="mrbricolage", name="Mr. Bricolage", base_url="https://mr-bricolage.bg")
+        s.add_all([site, other])
+        s.flush()
+        old = datetime.utcnow() - timedelta(days=31)
+        s.add_all([
+            PriceSnapshot(site_id=site.id, competitor_sku="L1", competitor_barcode="B1", competitor_label="Промо"),
+            PriceSnapshot(site_id=site.id, competitor_sku="N1", competitor_label=None),
+            PriceSnapshot(site_id=site.id, competitor_sku="OLD", competitor_label="Промо", ts=old),
+            PriceSnapshot(site_id=other.id, competitor_sku="X1", competitor_label="Промо"),
+        ])
+        s.commit()
+
+        policy = PdpPolicy("praktiker", sample_rate=0.0)
+        _seed_pdp_policy(s, site.id, SimpleNamespace(pdp_policy=policy))
+        assert policy.seeded
+        assert {k for k in ("L1", "B1", "N1", "OLD", "X1") if policy._label_likely(k)} == {"L1", "B1"}
+
+        # seeded once per process: later snapshots are learnt from PDP outcomes instead
+        s.add(PriceSnapshot(site_id=site.id, competitor_sku="L2", competitor_label="Промо"))
+        s.commit()
+        _seed_pdp_policy(s, site.id, SimpleNamespace(pdp_policy=policy))
+        assert not policy._label_likely("L2")
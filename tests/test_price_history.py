@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select, update
+
+pytest.importorskip("fastapi")
+pytest.importorskip("openpyxl")
+
+from app.models import Product, ProductPriceHistory  # noqa: E402
+from app.routers.email import _apply_changed_24h  # noqa: E402
+from app.services.erp_upsert import bulk_upsert_products  # noqa: E402
+
+ROWS = [
+    {"sku": "P1", "name": "Боя", "price_regular": 20.0, "price_promo": 18.0},
+    {"sku": "P2", "name": "Лак", "price_regular": 5.0},
+]
+
+
+def _history(s):
+    return s.execute(
+        select(Product.sku, ProductPriceHistory.price_promo, ProductPriceHistory.prev_price_promo)
+        .join(Product, Product.id == ProductPriceHistory.product_id)
+        .order_by(ProductPriceHistory.id)
+    ).all()
+
+
+def test_promo_change_writes_one_history_row(db):
+    bulk_upsert_products(ROWS)
+    with db() as s:
+        first = _history(s)
+        # first price of a new product; backdated so only the change below is "recent"
+        s.execute(update(ProductPriceHistory).values(ts=datetime.utcnow() - timedelta(days=3)))
+        s.commit()
+    assert [sku for sku, _, _ in first] == ["P1", "P2"]
+
+    changed = [dict(ROWS[0], price_promo=16.0), ROWS[1]]
+    stats = bulk_upsert_products(changed)
+    assert stats["price_changes"] == 1
+    stats = bulk_upsert_products(changed)  # same prices again: no history
+    assert stats["price_changes"] == 0
+
+    with db() as s:
+        assert _history(s)[len(first):] == [("P1", 16.0, 18.0)]
+        rows = [{"product_sku": "P1"}, {"product_sku": "P2"}, {"product_sku": "X"}]
+        assert _apply_changed_24h(s, rows) == [{"product_sku": "P1"}]
+
+
+def test_unchanged_price_writes_no_history(db):
+    bulk_upsert_products(ROWS)
+    stats = bulk_upsert_products([dict(ROWS[1], name="Лак мат")])
+    assert (stats["updated"], stats["price_changes"]) == (1, 0)
+    with db() as s:
+        assert len(_history(s)) == 2
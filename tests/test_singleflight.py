@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+from app.scrapers.singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_fetch():
+    flight = SingleFlight("t")
+    calls = []
+
+    async def fetch(url):
+        calls.append(url)
+        await asyncio.sleep(0.01)
+        return url.upper()
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", fetch, "a") for _ in range(5)))
+
+    assert asyncio.run(main()) == ["A"] * 5
+    assert calls == ["a"]
+    assert flight.stats()["saved"] == 4
+
+
+def test_follower_gets_result_when_leader_is_cancelled():
+    flight = SingleFlight("t")
+    calls = []
+
+    async def fetch(url):
+        calls.append(url)
+        await asyncio.sleep(0.05)
+        return url.upper()
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", fetch, "a"))
+        await asyncio.sleep(0)
+        followers = [asyncio.create_task(flight.do("k", fetch, "a")) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*followers)
+
+    assert asyncio.run(main()) == ["A"] * 3
+    assert calls == ["a", "a"]  # one follower took over, the others followed it
+    assert flight.stats()["in_flight"] == 0
+
+
+def test_cancelled_follower_does_not_cancel_leader():
+    flight = SingleFlight("t")
+
+    async def fetch(url):
+        await asyncio.sleep(0.03)
+        return url.upper()
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", fetch, "a"))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", fetch, "a"))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == "A"
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+import io
+import zipfile
+
+import pytest
+
+from app.services import sku_file
+from app.services.sku_file import extract_skus
+
+openpyxl = pytest.importorskip("openpyxl")
+
+_WORKBOOK = (
+    '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+    '<sheets><sheet name="SKU" sheetId="1" r:id="rId1"/></sheets></workbook>'
+)
+_WB_RELS = (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+    '</Relationships>'
+)
+_CT = (
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+_ROOT_RELS = (
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="xl/workbook.xml" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+
+
+def _openpyxl_book(rows) -> bytes:
+    wb = openpyxl.Workbook()
+    for row in rows:
+        wb.active.append(row)
+    buf = io.BytesIO()
+    wb.save(buf)
+    return buf.getvalue()
+
+
+def _raw_book(sheet_data: str) -> bytes:
+    """Minimal xlsx with one hand-written sheet (no sharedStrings.xml)."""
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("[Content_Types].xml", _CT)
+        zf.writestr("_rels/.rels", _ROOT_RELS)
+        zf.writestr("xl/workbook.xml", _WORKBOOK)
+        zf.writestr("xl/_rels/workbook.xml.rels", _WB_RELS)
+        zf.writestr(
+            "xl/worksheets/sheet1.xml",
+            '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+            f"<sheetData>{sheet_data}</sheetData></worksheet>",
+        )
+    return buf.getvalue()
+
+
+@pytest.fixture
+def fallback(monkeypatch):
+    """Records whether extract_skus had to use openpyxl."""
+    calls = []
+    real = sku_file._openpyxl_skus
+
+    def spy(f):
+        calls.append(f)
+        return real(f)
+
+    monkeypatch.setattr(sku_file, "_openpyxl_skus", spy)
+    return calls
+
+
+def test_simple_workbook(fallback):
+    data = _openpyxl_book([["Име", "Код"], ["Боя", 12345], ["Лак", "00123"], ["Винт", 100000.0], ["Гайка", "777"]])
+    assert extract_skus(data, "list.xlsx") == ["12345", "00123", "100000", "777"]
+    assert fallback == []
+
+
+def test_header_below_first_row_and_duplicates(fallback):
+    data = _openpyxl_book([
+        ["Справка за цени"], [], [None, None, "Код в Zeron", "Цена"],
+        [None, None, "A-1", 3.5], [None, None, 42, 1], [None, None, "A-1", 2], [None, None, 35566672.0, 9],
+    ])
+    assert extract_skus(data, "list.xlsx") == ["A-1", "42", "35566672"]
+    assert fallback == []
+
+
+def test_shared_and_inline_strings(fallback):
+    data = _raw_book(
+        '<row r="1"><c r="A1" t="inlineStr"><is><t>SKU</t></is></c></row>'
+        '<row r="2"><c r="A2" t="inlineStr"><is><t>00077</t></is></c></row>'
+        '<row r="3"><c r="A3" t="str"><v>X&amp;Y</v></c></row>'
+        '<row r="4"><c r="A4"><v>12.5</v></c></row>'
+        '<row r="5"><c r="A5"><v>1.0</v></c></row>'
+        '<row r="6"><c r="B6"><v>999</v></c></row>'
+    )
+    assert extract_skus(data, "inline.xlsx") == ["00077", "X&Y", "12.5", "1"]
+    assert fallback == []
+
+    # openpyxl writes text as shared strings; leading zeros survive there too
+    data = _openpyxl_book([["Skus"], ["0042"], ["0042"], ["Б-7"]])
+    assert extract_skus(data, "shared.xlsx") == ["0042", "Б-7"]
+    assert fallback == []
+
+
+def test_cells_without_r_use_openpyxl(fallback):
+    data = _raw_book(
+        '<row><c t="inlineStr"><is><t>Код</t></is></c></row>'
+        '<row><c><v>555</v></c></row>'
+        '<row><c t="inlineStr"><is><t>0100</t></is></c></row>'
+    )
+    assert extract_skus(data, "no_refs.xlsx") == ["555", "0100"]
+    assert len(fallback) == 1
+
+
+def test_semicolon_csv_windows_1251():
+    data = "Име;Код;Цена\nБоя;00123;1,50\nЛак;35566672.0;2\n;;\nВинт;777;3\n".encode("cp1251")
+    assert extract_skus(data, "list.csv") == ["00123", "35566672", "777"]
+
+
+def test_no_sku_column():
+    with pytest.raises(ValueError):
+        extract_skus(_openpyxl_book([["Име", "Цена"], ["Боя", 1]]), "list.xlsx")
+    with pytest.raises(ValueError):
+        extract_skus(b"name,price\nx,1\n", "list.csv")
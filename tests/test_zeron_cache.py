@@ -0,0 +1,90 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from app.services import zeron_cache, zeron_client  # noqa: E402
+from app.services.erp_importer import build_zeron_payload, parse_zeron_response  # noqa: E402
+from app.services.zeron_cache import ZeronCache  # noqa: E402
+
+SKUS = [f"C{i:04d}" for i in range(30)]
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    c = ZeronCache(tmp_path / "zeron_cache.sqlite3", ttl=60)
+    monkeypatch.setattr(zeron_client, "zeron_cache", c)
+    return c
+
+
+def _fetch(url, ns="db/1001/op", **kwargs):
+    return asyncio.run(zeron_client.fetch_chunks(
+        SKUS, build_zeron_payload, parse_zeron_response, url=url, chunk_size=10, cache_ns=ns, **kwargs
+    ))
+
+
+def test_hits_skip_http_and_namespaces_are_isolated(cache, zeron_standin):
+    url, server = zeron_standin()
+    stats = server.RequestHandlerClass.stats
+
+    first = _fetch(url)
+    assert (stats["requests"], first.cache_hits, first.cache_misses) == (3, 0, 30)
+
+    again = _fetch(url)
+    assert stats["requests"] == 3  # every SKU (with or without data) came from the cache
+    assert (again.cache_hits, again.cache_misses, again.requests) == (30, 0, 0)
+    assert again.data == first.data
+
+    other = _fetch(url, ns="db/2002/op")
+    assert (stats["requests"], other.cache_hits) == (6, 0)
+
+
+def test_force_refresh_bypasses_the_cache(cache, zeron_standin):
+    url, server = zeron_standin()
+    _fetch(url)
+    res = _fetch(url, force_refresh=True)
+    assert server.RequestHandlerClass.stats["requests"] == 6
+    assert res.cache_hits == 0
+    assert cache.forced == 1
+
+
+def test_entries_expire_after_ttl(cache, monkeypatch):
+    cache.put_many("ns", {"A": {"sku": "A", "price": 1.0}}, no_data=["B"])
+    assert cache.get_many("ns", ["A", "B", "C"]) == {"A": {"sku": "A", "price": 1.0}, "B": None}
+    assert cache.get_many("other", ["A"]) == {}
+
+    now = zeron_cache.time.time()
+    monkeypatch.setattr(zeron_cache.time, "time", lambda: now + cache.ttl + 1)
+    assert cache.get_many("ns", ["A", "B"]) == {}
+    assert cache.stats()["fresh_entries"] == 0
+
+
+def test_disabled_cache_stores_nothing(tmp_path):
+    c = ZeronCache(tmp_path / "off.sqlite3", ttl=0)
+    c.put_many("ns", {"A": {"sku": "A"}})
+    assert c.get_many("ns", ["A"]) == {}
+    assert not (tmp_path / "off.sqlite3").exists()
+
+
+def test_stats_and_clear_endpoints(cache, monkeypatch):
+    pytest.importorskip("fastapi")
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.routers import erp
+
+    monkeypatch.setattr(erp, "zeron_cache", cache)
+    cache.put_many("ns", {"A": {"sku": "A"}}, no_data=["B"])
+    cache.get_many("ns", ["A", "B", "C", "D"])
+
+    app = FastAPI()
+    app.include_router(erp.router, prefix="/api")
+    client = TestClient(app)
+
+    stats = client.get("/api/erp/zeron_cache").json()
+    assert (stats["entries"], stats["fresh_entries"], stats["ttl_s"]) == (2, 2, 60)
+    assert (stats["lookups"], stats["hits"], stats["negative_hits"], stats["hit_rate"]) == (4, 2, 1, 0.5)
+
+    assert client.delete("/api/erp/zeron_cache").json() == {"ok": True, "removed": 2}
+    assert client.get("/api/erp/zeron_cache").json()["entries"] == 0
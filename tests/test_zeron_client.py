@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+import asyncio
+
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from app.services import zeron_client  # noqa: E402
+from app.services.erp_importer import build_zeron_payload, parse_zeron_response  # noqa: E402
+from benchmarks.zeron_standin import render_response  # noqa: E402
+
+SKUS = [f"S{i:05d}" for i in range(50)]
+# SKUs the stand-in answers with a selectable price row
+WITH_DATA = sorted(parse_zeron_response(render_response(SKUS)))
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(zeron_client, "ZERON_BACKOFF_BASE", 0.0)
+
+
+def _fetch(url, skus=SKUS, **kwargs):
+    kwargs.setdefault("chunk_size", 10)
+    return asyncio.run(zeron_client.fetch_chunks(skus, build_zeron_payload, parse_zeron_response, url=url, **kwargs))
+
+
+def test_chunks_run_in_parallel_over_one_client(zeron_standin, monkeypatch):
+    url, server = zeron_standin(latency_ms=80)
+    clients = []
+    real_client = httpx.AsyncClient
+
+    def counting_client(*args, **kwargs):
+        clients.append(kwargs)
+        return real_client(*args, **kwargs)
+
+    monkeypatch.setattr(zeron_client.httpx, "AsyncClient", counting_client)
+    res = _fetch(url, parallel=4)
+
+    assert len(clients) == 1
+    assert sorted(res.data) == WITH_DATA
+    assert (res.chunks, res.requests, res.failed_chunks) == (5, 5, [])
+    assert 1 < server.RequestHandlerClass.stats["max_in_flight"] <= 4
+
+
+def test_transient_5xx_is_retried(zeron_standin):
+    url, server = zeron_standin(flaky=1)
+    res = _fetch(url, parallel=1, retries=3)
+
+    assert sorted(res.data) == WITH_DATA
+    assert res.failed_chunks == []
+    assert res.requests == res.chunks + 1
+    assert server.RequestHandlerClass.stats["failed"] == 1
+
+
+def test_failing_chunk_is_reported_and_others_are_kept(zeron_standin):
+    url, server = zeron_standin(fail_skus={"S00013"})
+    res = _fetch(url, parallel=4, retries=2)
+
+    bad = SKUS[10:20]
+    assert res.failed_skus == bad
+    assert "503" in res.failed_chunks[0]["error"]
+    assert sorted(res.data) == [s for s in WITH_DATA if s not in bad]
+    assert res.requests == 4 + 2  # the failing chunk was tried `retries` times
+    assert res.summary()["failed_skus"] == 10
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+import json
+from itertools import zip_longest
+
+from app.services.zeron_select import iter_selected, parse_selected
+from app.services.zeron_xml import TableStream
+from benchmarks.zeron_selection import CORPUS_FILE, EXPECTED_FILE, render
+
+
+def _interleaved_corpus() -> str:
+    """Golden corpus with the rows of all articles interleaved (each article's own row order kept)."""
+    by_code = {}
+    for row in TableStream(CORPUS_FILE.read_bytes()):
+        by_code.setdefault(row["InvCode"], []).append(row)
+    rows = [r for batch in zip_longest(*by_code.values()) for r in batch if r is not None]
+    assert rows[0]["InvCode"] != rows[1]["InvCode"]
+    return render(rows)
+
+
+def test_parse_selected_does_not_depend_on_row_order():
+    expected = json.loads(EXPECTED_FILE.read_text(encoding="utf-8"))
+    got = json.loads(json.dumps(parse_selected(_interleaved_corpus()), ensure_ascii=False))
+    assert got == expected
+
+
+def test_iter_selected_matches_golden_for_grouped_rows():
+    expected = json.loads(EXPECTED_FILE.read_text(encoding="utf-8"))
+    got = json.loads(json.dumps({i["sku"]: i for i in iter_selected(CORPUS_FILE.read_bytes())}, ensure_ascii=False))
+    assert got == expected
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+import io
+from xml.etree import ElementTree as ET
+
+from app.services.zeron_xml import TableStream, open_xml_upload
+
+ROWS = [("1001", "Боя за стени 2,5 л"), ("1002", "Лак за дърво")]
+
+
+def _export(encoding=None, bom=False) -> bytes:
+    decl = f'<?xml version="1.0" encoding="{encoding}"?>' if encoding else ""
+    body = "".join(f"<Table><ItemCode>{c}</ItemCode><Name>{n}</Name><Empty> </Empty></Table>" for c, n in ROWS)
+    text = f"{decl}<DataSet><Success>true</Success><Data>{body}</Data></DataSet>"
+    data = text.encode(encoding or "utf-8")
+    return (b"\xef\xbb\xbf" + data) if bom else data
+
+
+def _read(data: bytes):
+    stream = TableStream(open_xml_upload(io.BytesIO(data)))
+    rows = [(r["ItemCode"], r["Name"], r["Empty"]) for r in stream]
+    return stream, rows
+
+
+def test_cp1251_without_declaration_is_decoded():
+    data = _export().decode("utf-8").encode("cp1251")
+    stream, rows = _read(data)
+    assert rows == [(c, n, None) for c, n in ROWS]
+    assert stream.ok and stream.tables == 2
+
+
+def test_declared_encoding_bom_and_plain_utf8():
+    for data in (_export("windows-1251"), _export(bom=True), _export()):
+        _, rows = _read(data)
+        assert rows == [(c, n, None) for c, n in ROWS]
+
+
+def test_rows_are_detached_while_streaming(monkeypatch):
+    parents = []
+    real = ET.iterparse
+
+    def tracking(source, events=None):
+        for ev, el in real(source, events=events):
+            if ev == "start" and el.tag == "Data":
+                parents.append(el)
+            yield ev, el
+
+    monkeypatch.setattr(ET, "iterparse", tracking)
+    body = "".join(f"<Table><ItemCode>{i}</ItemCode></Table>" for i in range(5000))
+    stream = TableStream(f"<DataSet><Data>{body}</Data><Success>false</Success>"
+                         f"<ErrorMessage> bad user </ErrorMessage></DataSet>")
+    attached = []
+    for n, row in enumerate(stream):
+        assert row == {"ItemCode": str(n)}
+        attached.append(len(parents[0]))
+    assert stream.tables == 5000
+    # processed rows never stay on <Data>: only the parser's read-ahead is attached
+    assert max(attached) < 1000 and len(parents[0]) == 0
+    assert not stream.ok and stream.error_message == "bad user"